@@ -2,10 +2,13 @@ import os
 from flask import Flask, g, request, redirect, url_for, session, render_template, send_from_directory, abort
 from flask_babel import get_locale as babel_get_locale
 from .config import Config
-from .extensions import db, migrate, login_manager, babel
+from .extensions import db, migrate, login_manager, babel, tenant_engines, company_cache
+from .tenancy import bind_tenant
+from .tenant_schema import ensure_schema
+from .sqlite_profile import apply_sqlite_profile
 from itsdangerous import URLSafeSerializer, BadSignature
 
-def create_app(config_class: type = Config) -> Flask:
+def create_app(config_class: type = Config, warm_up: bool = False) -> Flask:
     app = Flask(__name__, static_folder="static", template_folder="templates")
     app.config.from_object(config_class)
 
@@ -42,6 +45,9 @@ def create_app(config_class: type = Config) -> Flask:
     migrate.init_app(app, db)
     login_manager.init_app(app)
     babel.init_app(app, locale_selector=select_locale)
+    tenant_engines.init_app(app)
+    tenant_engines.start_reaper()
+    company_cache.init_app(app)
 
     # Login Manager
     login_manager.login_view = "auth.login"
@@ -49,6 +55,9 @@ def create_app(config_class: type = Config) -> Flask:
 
     # --- Import Models after db init ---
     from .models import User, Company  # noqa: WPS433
+    from . import accounting, data_version, kpis  # noqa: F401  (register the snapshot/version flush hooks)
+    from .posting import worker as posting_worker
+    posting_worker.init_app(app)
 
     @login_manager.user_loader
     def load_user(user_id: str):
@@ -82,11 +91,10 @@ def create_app(config_class: type = Config) -> Flask:
     @app.before_request
     def inject_company_theme():
         from flask import session as flask_session
-        from .models import Company
         company_id = flask_session.get("company_id")
         theme = None
         if company_id:
-            company = Company.query.get(company_id)
+            company = company_cache.get(company_id)
             if company:
                 theme = {
                     "name": company.name,
@@ -120,50 +128,30 @@ def create_app(config_class: type = Config) -> Flask:
 
         Strategy:
         - Read company id from session (or subdomain header in future)
-        - Load Company from master DB
-        - Reflect/ensure SQLAlchemy has an engine for that URI
-        - Re-bind db.engines[None] to the tenant engine for this app context
+        - Load Company from the in-process cache (master DB on miss/expiry)
+        - Get the tenant engine from the bounded engine registry
+        - Route the default bind to it via flask.g, so concurrent requests in the
+          same worker never see each other's tenant (db.engines is left untouched)
         """
         from flask import session as flask_session
-        from sqlalchemy import create_engine
         company_id = flask_session.get("company_id")
-        # Ensure master bind exists
-        engines = db.engines  # type: ignore[attr-defined]
-        engines["master"]  # ensure master engine is initialized
         if not company_id:
-            # No tenant selected → restore global default engine
-            global_engine = engines.get("__global__")
-            if global_engine is not None:
-                engines[None] = global_engine
+            # No tenant selected → default engine from SQLALCHEMY_DATABASE_URI
+            bind_tenant(None)
             return
-        company = Company.query.get(company_id)
+        company = company_cache.get(company_id)
         if not company or not company.is_active or company.is_archived:
-            # Invalid tenant selection → restore global default engine
-            global_engine = engines.get("__global__")
-            if global_engine is not None:
-                engines[None] = global_engine
+            # Invalid tenant selection → default engine from SQLALCHEMY_DATABASE_URI
+            bind_tenant(None)
             return
-        uri = company.db_uri
-        # Create or reuse an engine for this tenant under bind key = company.subdomain
-        bind_key = company.subdomain
-        if bind_key not in engines:
-            engines[bind_key] = create_engine(uri, pool_pre_ping=True)
-        # Point the default engine to this tenant for ORM operations
-        engines[None] = engines[bind_key]
-        # Ensure all tenant-bound tables exist (first-run convenience)
+        # Create or reuse an engine for this tenant (keyed by company.subdomain)
+        tenant_engine = tenant_engines.for_company(company)
+        # Point the default bind to this tenant for ORM operations in this request
+        bind_tenant(tenant_engine)
+        # Ensure all tenant-bound tables exist (first-run convenience). Memoized per
+        # engine, so only the first request of a worker for this tenant inspects it.
         try:
-            from sqlalchemy import inspect as sa_inspect
-            inspector = sa_inspect(engines[None])
-            # Heuristic: if no 'users' table, create all
-            if not inspector.has_table('users'):
-                prev = None
-                try:
-                    prev = engines.get(None)
-                    engines[None] = engines[bind_key]
-                    db.create_all()
-                finally:
-                    if prev is not None:
-                        engines[None] = prev
+            ensure_schema(tenant_engine)
         except Exception:
             pass
 
@@ -180,29 +168,21 @@ def create_app(config_class: type = Config) -> Flask:
 
     # --- Initialize master tables if not present ---
     with app.app_context():
+        # SQLite profile (WAL, busy_timeout, ...) for the master and default engines;
+        # tenant engines get it from the engine registry
+        for engine in db.engines.values():
+            apply_sqlite_profile(engine, app.config.get("SQLITE_PRAGMAS") or {}, app.config.get("SQLITE_OPTIMIZE_ON_CLOSE", True))
+
         try:
             # Create only master-bound tables (e.g., Company)
-            db.create_all(bind="master")
+            db.create_all(bind_key="master")
         except Exception:
             pass
 
         # Ensure default tenant tables exist on first run (when no company bound)
         # This prevents "no such table: users" before any migrations run
         try:
-            from sqlalchemy import inspect as sa_inspect
-            inspector = sa_inspect(db.engines[None])  # ensure default engine exists
-            if not inspector.has_table('users'):
-                db.create_all()
-        except Exception:
-            pass
-
-        # Capture and cache the global default engine so we can restore it
-        # on requests where no tenant is selected. Do this after ensuring the
-        # default engine has been realized by SQLAlchemy.
-        try:
-            engines = db.engines  # type: ignore[attr-defined]
-            _ = engines[None]
-            engines["__global__"] = engines[None]
+            ensure_schema(db.engine)
         except Exception:
             pass
 
@@ -243,6 +223,11 @@ def create_app(config_class: type = Config) -> Flask:
     def not_found(_e):
         return render_template("404.html"), 404
 
+    # Optional warm-up (gunicorn workers use gunicorn.conf.py instead, after fork)
+    if warm_up:
+        from .warmup import warm_up as run_warm_up
+        run_warm_up(app)
+
     return app
 
 
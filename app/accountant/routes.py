@@ -1,7 +1,28 @@
 from flask import Blueprint, render_template, abort, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from flask_babel import gettext as _
+from ..accounting import (
+    PeriodClosedError,
+    account_balances,
+    balances_by_type,
+    close_period,
+    closed_periods,
+    forget_default_accounts,
+    iter_ledger,
+    ledger_page,
+    parse_cursor,
+)
+from .. import bulk_payments, exports, posting
 from ..extensions import db
+from ..data_version import conditional_get
+from ..reporting import (
+    AGING_SORTS,
+    DashboardMetrics,
+    ar_aging_by_tenant,
+    ar_aging_page,
+    ar_aging_totals,
+    monthly_series,
+)
 from ..models import (
     Payment,
     Invoice,
@@ -16,14 +37,14 @@ from ..models import (
     MaintenanceRequest,
     Complaint,
 )
-from flask import current_app, send_file
+from flask import Response, current_app, send_file, stream_with_context
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
-from openpyxl import Workbook
+import csv
 import io
 import os
 from datetime import date, timedelta
-from sqlalchemy import text
+from sqlalchemy.orm import joinedload
 
 
 accountant_bp = Blueprint("accountant", __name__)
@@ -44,219 +65,68 @@ def accountant_required(func):
 @accountant_bp.route("/")
 @login_required
 @accountant_required
+@conditional_get
 def dashboard():
     """Accountant dashboard with KPIs, monthly chart, and alerts."""
-    # Payments listing (all)
-    payments = Payment.query.order_by(Payment.due_date.asc()).all()
-
-    # KPI cards
-    total_income = (
-        db.session.query(db.func.coalesce(db.func.sum(Payment.amount), 0))
-        .filter(Payment.status == "paid")
-        .scalar()
-        or 0
-    )
-
-    # Expenses total (if table exists)
-    total_expenses = 0
-    try:
-        total_expenses = (
-            db.session.query(db.func.coalesce(db.func.sum(Expense.amount), 0)).scalar() or 0
-        )
-    except Exception:
-        total_expenses = 0
-
-    net_profit = float(total_income) - float(total_expenses)
-
-    # Unpaid count
-    unpaid_count = db.session.query(db.func.count()).select_from(Payment).filter(Payment.status != "paid").scalar() or 0
-
-    # Alerts: due soon (within 7 days) and overdue
     today = date.today()
-    in_7 = today + timedelta(days=7)
-    due_soon = (
-        db.session.query(Payment)
-        .filter(Payment.status != "paid", Payment.due_date >= today, Payment.due_date <= in_7)
-        .order_by(Payment.due_date.asc())
-        .all()
-    )
-    overdue = (
-        db.session.query(Payment)
-        .filter(Payment.status != "paid", Payment.due_date < today)
-        .order_by(Payment.due_date.asc())
-        .all()
-    )
+    # Payments listing (all); the table links to each payment's invoice
+    payments = Payment.query.options(joinedload(Payment.invoice)).order_by(Payment.due_date.asc()).all()
 
-    # Monthly income/expenses/profit for last 12 months
-    def add_months(year: int, month: int, delta: int) -> tuple[int, int]:
-        total = year * 12 + (month - 1) + delta
-        y = total // 12
-        m = (total % 12) + 1
-        return y, m
-
-    def first_of_month(y: int, m: int) -> date:
-        return date(y, m, 1)
-
-    def next_month_start(y: int, m: int) -> date:
-        y2, m2 = add_months(y, m, 1)
-        return date(y2, m2, 1)
-
-    y0, m0 = today.year, today.month
-    month_ranges: list[tuple[date, date]] = []
-    month_labels: list[str] = []
-    for k in range(11, -1, -1):
-        yk, mk = add_months(y0, m0, -k)
-        start = first_of_month(yk, mk)
-        end = next_month_start(yk, mk)
-        month_ranges.append((start, end))
-        month_labels.append(f"{yk:04d}-{mk:02d}")
-
-    monthly_income: list[float] = []
-    for start, end in month_ranges:
-        total = (
-            db.session.query(db.func.coalesce(db.func.sum(Payment.amount), 0))
-            .filter(
-                Payment.status == "paid",
-                db.or_(
-                    db.and_(Payment.paid_date != None, Payment.paid_date >= start, Payment.paid_date < end),  # noqa: E711
-                    db.and_(Payment.paid_date == None, Payment.due_date >= start, Payment.due_date < end),  # noqa: E711
-                ),
-            )
-            .scalar()
-            or 0
-        )
-        try:
-            monthly_income.append(float(total))
-        except Exception:
-            monthly_income.append(0.0)
+    # Alerts: due soon (within 7 days) and overdue, taken from the listing above
+    in_7 = today + timedelta(days=7)
+    due_soon = [p for p in payments if p.status != "paid" and today <= p.due_date <= in_7]
+    overdue = [p for p in payments if p.status != "paid" and p.due_date < today]
 
-    monthly_expenses: list[float] = []
-    for start, end in month_ranges:
-        try:
-            total = (
-                db.session.query(db.func.coalesce(db.func.sum(Expense.amount), 0))
-                .filter(Expense.spent_at >= start, Expense.spent_at < end)
-                .scalar()
-                or 0
-            )
-            monthly_expenses.append(float(total))
-        except Exception:
-            monthly_expenses.append(0.0)
-
-    monthly_profit = [round((monthly_income[i] - monthly_expenses[i]), 2) for i in range(len(month_ranges))]
-
-    # -----------------------
-    # Additional KPIs & charts for dashboard cards
-    # -----------------------
-
-    # Properties/Units occupancy breakdown
-    units_total = (
-        (db.session.query(db.func.count(Apartment.id)).scalar() or 0)
-        + (
-            db.session.query(db.func.count(Property.id))
-            .filter(Property.property_type == "apartment")
-            .scalar()
-            or 0
-        )
-    )
-    units_available = (
-        (db.session.query(db.func.count(Apartment.id)).filter(Apartment.status == "available").scalar() or 0)
-        + (
-            db.session.query(db.func.count(Property.id))
-            .filter(Property.property_type == "apartment", Property.status == "available")
-            .scalar()
-            or 0
-        )
-    )
-    units_occupied = (
-        (db.session.query(db.func.count(Apartment.id)).filter(Apartment.status == "occupied").scalar() or 0)
-        + (
-            db.session.query(db.func.count(Property.id))
-            .filter(Property.property_type == "apartment", Property.status == "occupied")
-            .scalar()
-            or 0
-        )
+    # KPI cards: one conditional-aggregation round trip
+    metrics = DashboardMetrics(today=today).load(
+        "payments", "payment_alerts", "expenses", "units", "contracts", "maintenance", "complaints"
     )
 
-    # Maintenance and complaints counts
-    maint_new = db.session.query(db.func.count(MaintenanceRequest.id)).filter(MaintenanceRequest.status == "new").scalar() or 0
-    maint_in_progress = (
-        db.session.query(db.func.count(MaintenanceRequest.id)).filter(MaintenanceRequest.status == "in_progress").scalar() or 0
-    )
-    maint_resolved = db.session.query(db.func.count(MaintenanceRequest.id)).filter(MaintenanceRequest.status == "resolved").scalar() or 0
-    maint_closed = db.session.query(db.func.count(MaintenanceRequest.id)).filter(MaintenanceRequest.status == "closed").scalar() or 0
-
-    comp_new = db.session.query(db.func.count(Complaint.id)).filter(Complaint.status == "new").scalar() or 0
-    comp_reviewing = db.session.query(db.func.count(Complaint.id)).filter(Complaint.status == "reviewing").scalar() or 0
-    comp_resolved = db.session.query(db.func.count(Complaint.id)).filter(Complaint.status == "resolved").scalar() or 0
-    comp_closed = db.session.query(db.func.count(Complaint.id)).filter(Complaint.status == "closed").scalar() or 0
-
-    # Contracts status counts
-    contract_status_rows = (
-        db.session.query(Contract.status, db.func.count(Contract.id))
-        .group_by(Contract.status)
-        .all()
-    )
-    contracts_by_status = {k or "unknown": int(v or 0) for k, v in contract_status_rows}
-    contracts_total = sum(contracts_by_status.values())
-    contracts_active = contracts_by_status.get("active", 0)
-
-    # Payments counts
-    paid_count = db.session.query(db.func.count(Payment.id)).filter(Payment.status == "paid").scalar() or 0
-    overdue_count = (
-        db.session.query(db.func.count(Payment.id))
-        .filter(Payment.status != "paid", Payment.due_date < today)
-        .scalar()
-        or 0
-    )
-    upcoming_count = (
-        db.session.query(db.func.count(Payment.id))
-        .filter(Payment.status != "paid", Payment.due_date >= today, Payment.due_date <= (today + timedelta(days=14)))
-        .scalar()
-        or 0
-    )
+    # Monthly income/expenses/profit for last 12 months (one grouped query)
+    series = monthly_series(12, today)
 
     # Recent items
     recent_properties = Property.query.order_by(Property.created_at.desc()).limit(5).all()
-    recent_contracts = Contract.query.order_by(Contract.created_at.desc()).limit(5).all()
-    recent_payments = Payment.query.order_by(Payment.created_at.desc()).limit(5).all()
+    recent_contracts = (
+        Contract.query.options(joinedload(Contract.property)).order_by(Contract.created_at.desc()).limit(5).all()
+    )
+    recent_payments = sorted(payments, key=lambda p: (p.created_at, p.id), reverse=True)[:5]
 
     return render_template(
         "accountant/dashboard.html",
         payments=payments,
-        total_paid=total_income,
-        total_income=total_income,
-        total_expenses=total_expenses,
-        net_profit=net_profit,
-        unpaid_count=unpaid_count,
+        total_paid=metrics["total_income"],
+        total_income=metrics["total_income"],
+        total_expenses=metrics["total_expenses"],
+        net_profit=metrics["net_profit"],
+        unpaid_count=metrics["unpaid_count"],
         today=today,
         due_soon=due_soon,
         overdue=overdue,
-        month_labels=month_labels,
-        monthly_income=monthly_income,
-        monthly_expenses=monthly_expenses,
-        monthly_profit=monthly_profit,
+        month_labels=series["labels"],
+        monthly_income=series["income"],
+        monthly_expenses=series["expenses"],
+        monthly_profit=series["profit"],
         # occupancy chart
         occupancy_labels=[_("Available"), _("Occupied")],
-        occupancy_values=[units_available, units_occupied],
+        occupancy_values=[metrics["units_available"], metrics["units_occupied"]],
         # kpis for cards
-        units_total=units_total,
-        units_available=units_available,
-        units_occupied=units_occupied,
-        contracts_total=contracts_total,
-        contracts_active=contracts_active,
-        contracts_by_status=contracts_by_status,
-        paid_count=paid_count,
-        overdue_count=overdue_count,
-        upcoming_count=upcoming_count,
-        maint_new=maint_new,
-        maint_in_progress=maint_in_progress,
-        maint_resolved=maint_resolved,
-        maint_closed=maint_closed,
-        comp_new=comp_new,
-        comp_reviewing=comp_reviewing,
-        comp_resolved=comp_resolved,
-        comp_closed=comp_closed,
+        units_total=metrics["units_total"],
+        units_available=metrics["units_available"],
+        units_occupied=metrics["units_occupied"],
+        contracts_total=metrics["contracts_total"],
+        contracts_active=metrics["contracts_active"],
+        paid_count=metrics["paid_count"],
+        overdue_count=metrics["overdue_count"],
+        upcoming_count=metrics["upcoming_count"],
+        maint_new=metrics["maint_new"],
+        maint_in_progress=metrics["maint_in_progress"],
+        maint_resolved=metrics["maint_resolved"],
+        maint_closed=metrics["maint_closed"],
+        comp_new=metrics["comp_new"],
+        comp_reviewing=metrics["comp_reviewing"],
+        comp_resolved=metrics["comp_resolved"],
+        comp_closed=metrics["comp_closed"],
         # recents
         recent_properties=recent_properties,
         recent_contracts=recent_contracts,
@@ -422,13 +292,11 @@ def tenant_detail(tenant_id: int):
 
             p.paid_date = _date.today()
         db.session.add(p)
+        if p.status == "paid":
+            # Cash receipt is posted from the outbox, committed with the payment
+            db.session.flush()
+            posting.enqueue("payment", p.id)
         db.session.commit()
-        # If paid, try to post cash receipt journal entry
-        try:
-            if p.status == "paid":
-                _post_payment_cash_receipt(p)
-        except Exception:
-            pass
         flash(_("Payment recorded for tenant"), "success")
         return redirect(url_for("accountant.tenant_detail", tenant_id=tenant.id))
 
@@ -464,20 +332,31 @@ def mark_payment(payment_id: int):
     new_status = request.form.get("status")
     if new_status in {"paid", "unpaid"}:
         payment.status = new_status
+        # Journal posting for the status change goes through the outbox
+        posting.enqueue("payment" if new_status == "paid" else "payment_reverse", payment.id)
         db.session.commit()
-        # Auto-post journal for payment status changes
-        try:
-            if new_status == "paid":
-                _post_payment_cash_receipt(payment)
-            else:
-                _reverse_payment_cash_receipt(payment)
-        except Exception:
-            # Do not fail user flow on posting errors
-            pass
         flash(_("Payment status updated"), "success")
     return redirect(url_for("accountant.dashboard"))
 
 
+@accountant_bp.route("/payments/mark-paid", methods=["POST"])
+@login_required
+@accountant_required
+def mark_payments_paid():
+    payment_ids = request.form.getlist("payment_ids", type=int)
+    due_through = _date_arg("due_through", request.form)
+    if not payment_ids and due_through is None:
+        flash(_("Select payments to mark as paid"), "warning")
+        return redirect(url_for("accountant.payments_list", status="unpaid"))
+    try:
+        result = bulk_payments.mark_paid(payment_ids=payment_ids or None, due_through=due_through)
+    except PeriodClosedError as exc:
+        flash(str(exc), "danger")
+    else:
+        flash(_("%(count)s payments marked as paid", count=result.updated), "success")
+    return redirect(url_for("accountant.payments_list", status="unpaid"))
+
+
 @accountant_bp.route("/payments/<int:payment_id>/invoice")
 @login_required
 @accountant_required
@@ -513,12 +392,9 @@ def generate_invoice(payment_id: int):
     else:
         inv = Invoice(payment_id=payment.id, file_path=f"invoices/{file_name}")
         db.session.add(inv)
+    # Post AR and Rental Income for invoice (idempotent, via the outbox)
+    posting.enqueue("invoice", payment.id)
     db.session.commit()
-    # Post AR and Rental Income for invoice (idempotent)
-    try:
-        _post_invoice_revenue(payment)
-    except Exception:
-        pass
     return redirect(url_for("accountant.dashboard"))
 
 
@@ -537,16 +413,11 @@ def download_invoice(payment_id: int):
 @login_required
 @accountant_required
 def export_payments_excel():
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Payments"
-    ws.append(["ID", "Contract", "Amount", "Due Date", "Paid Date", "Method", "Status"])
-    for p in Payment.query.order_by(Payment.due_date.asc()).all():
-        ws.append([p.id, p.contract_id, float(p.amount), str(p.due_date), str(p.paid_date or ""), p.method or "", p.status])
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name="payments.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    return exports.send_xlsx(
+        "payments.xlsx", "Payments",
+        ["ID", "Contract", "Amount", "Due Date", "Paid Date", "Method", "Status"],
+        exports.payment_rows(),
+    )
 
 
 @accountant_bp.route("/export/pdf")
@@ -581,6 +452,7 @@ def export_payments_pdf():
 @accountant_bp.route("/invoices")
 @login_required
 @accountant_required
+@conditional_get
 def invoices_list():
     # Show payments with optional invoice attached; allow filter has_invoice
     has_invoice = request.args.get("has_invoice")
@@ -597,22 +469,11 @@ def invoices_list():
 @login_required
 @accountant_required
 def export_invoices_excel():
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Invoices"
-    ws.append(["PaymentID", "HasInvoice", "DueDate", "Amount", "Status", "InvoicePath"])
-    rows = (
-        db.session.query(Payment, Invoice)
-        .join(Invoice, Payment.id == Invoice.payment_id, isouter=True)
-        .order_by(Payment.due_date.desc())
-        .all()
+    return exports.send_xlsx(
+        "invoices.xlsx", "Invoices",
+        ["PaymentID", "HasInvoice", "DueDate", "Amount", "Status", "InvoicePath"],
+        exports.invoice_rows(),
     )
-    for p, inv in rows:
-        ws.append([p.id, "yes" if inv else "no", str(p.due_date), float(p.amount), p.status, (inv.file_path if inv else "")])
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name="invoices.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 
 @accountant_bp.route("/invoices/export.pdf")
@@ -653,6 +514,7 @@ def export_invoices_pdf():
 @accountant_bp.route("/payments", methods=["GET", "POST"])
 @login_required
 @accountant_required
+@conditional_get
 def payments_list():
     if request.method == "POST":
         contract_id = request.form.get("contract_id", type=int)
@@ -689,16 +551,11 @@ def payments_list():
 @login_required
 @accountant_required
 def export_expenses_excel():
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Expenses"
-    ws.append(["ID", "Date", "Description", "Category", "Vendor", "Amount"])
-    for e in Expense.query.order_by(Expense.spent_at.desc()).all():
-        ws.append([e.id, str(e.spent_at), e.description, e.category or "", e.vendor or "", float(e.amount)])
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name="expenses.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    return exports.send_xlsx(
+        "expenses.xlsx", "Expenses",
+        ["ID", "Date", "Description", "Category", "Vendor", "Amount"],
+        exports.expense_rows(),
+    )
 
 
 @accountant_bp.route("/expenses/export.pdf")
@@ -745,93 +602,13 @@ def report_unpaid():
 @accountant_required
 def financial_overview():
     """Comprehensive financial overview: totals and last 12 months breakdown."""
-    # --- Totals ---
-    total_income = (
-        db.session.query(db.func.coalesce(db.func.sum(Payment.amount), 0))
-        .filter_by(status="paid")
-        .scalar()
-        or 0
-    )
+    # --- Totals (KPI snapshot; zeros when expenses predate the accounting migration) ---
+    metrics = DashboardMetrics().load("payments", "expenses")
+    total_income = metrics["total_income"]
+    total_expenses = metrics["total_expenses"]
 
-    # Expenses may be in an optional "expenses" table
-    total_expenses = 0
-    monthly_expenses: list[float] = []
-    expenses_date_column = None
-    try:
-        inspector = db.inspect(db.engine)
-        if inspector.has_table("expenses"):
-            # Sum total expenses
-            res = db.session.execute(text("SELECT COALESCE(SUM(amount), 0) FROM expenses"))
-            total_expenses = res.scalar() or 0
-            # Try to detect a usable date column for monthly breakdown
-            cols = inspector.get_columns("expenses")
-            names = {c.get("name") for c in cols}
-            for candidate in ("spent_at", "date", "created_at"):
-                if candidate in names:
-                    expenses_date_column = candidate
-                    break
-    except Exception:
-        total_expenses = 0
-        expenses_date_column = None
-
-    # --- Build last 12 month ranges (ascending) ---
-    def add_months(year: int, month: int, delta: int) -> tuple[int, int]:
-        total = year * 12 + (month - 1) + delta
-        y = total // 12
-        m = (total % 12) + 1
-        return y, m
-
-    def first_of_month(y: int, m: int) -> date:
-        return date(y, m, 1)
-
-    def next_month_start(y: int, m: int) -> date:
-        y2, m2 = add_months(y, m, 1)
-        return date(y2, m2, 1)
-
-    y0, m0 = date.today().year, date.today().month
-    month_ranges: list[tuple[date, date]] = []
-    month_labels: list[str] = []
-    for k in range(11, -1, -1):
-        yk, mk = add_months(y0, m0, -k)
-        start = first_of_month(yk, mk)
-        end = next_month_start(yk, mk)
-        month_ranges.append((start, end))
-        month_labels.append(f"{yk:04d}-{mk:02d}")
-
-    # --- Monthly income ---
-    monthly_income: list[float] = []
-    for start, end in month_ranges:
-        total = (
-            db.session.query(db.func.coalesce(db.func.sum(Payment.amount), 0))
-            .filter(
-                Payment.status == "paid",
-                db.or_(
-                    db.and_(Payment.paid_date != None, Payment.paid_date >= start, Payment.paid_date < end),
-                    db.and_(Payment.paid_date == None, Payment.due_date >= start, Payment.due_date < end),
-                ),
-            )
-            .scalar()
-            or 0
-        )
-        try:
-            monthly_income.append(float(total))
-        except Exception:
-            monthly_income.append(0.0)
-
-    # --- Monthly expenses (if table and date column exist) ---
-    if expenses_date_column is not None:
-        monthly_expenses = []
-        for start, end in month_ranges:
-            q = text(
-                f"SELECT COALESCE(SUM(amount), 0) FROM expenses WHERE {expenses_date_column} >= :start AND {expenses_date_column} < :end"
-            )
-            try:
-                r = db.session.execute(q, {"start": start, "end": end})
-                monthly_expenses.append(float(r.scalar() or 0))
-            except Exception:
-                monthly_expenses.append(0.0)
-    else:
-        monthly_expenses = [0.0 for _ in month_ranges]
+    # --- Last 12 months (one grouped query) ---
+    series = monthly_series(12)
 
     # --- Profits ---
     try:
@@ -839,17 +616,15 @@ def financial_overview():
     except Exception:
         profit_total = 0.0
 
-    monthly_profit = [round((monthly_income[i] - monthly_expenses[i]), 2) for i in range(len(month_ranges))]
-
     return render_template(
         "accountant/financial_overview.html",
         total_income=total_income,
         total_expenses=total_expenses,
         profit_total=profit_total,
-        month_labels=month_labels,
-        monthly_income=monthly_income,
-        monthly_expenses=monthly_expenses,
-        monthly_profit=monthly_profit,
+        month_labels=series["labels"],
+        monthly_income=series["income"],
+        monthly_expenses=series["expenses"],
+        monthly_profit=series["profit"],
     )
 
 
@@ -871,6 +646,7 @@ def accounts():
                 acc = Account(code=code, name=name, type=acc_type)
                 db.session.add(acc)
                 db.session.commit()
+                forget_default_accounts()
                 flash(_("Account created"), "success")
             else:
                 flash(_("Account code already exists"), "warning")
@@ -904,11 +680,9 @@ def expenses():
         if desc and amt > 0:
             exp = Expense(description=desc, amount=amt, category=category or None, vendor=vendor or None, spent_at=spent_at)
             db.session.add(exp)
+            db.session.flush()
+            posting.enqueue("expense", exp.id)
             db.session.commit()
-            try:
-                _post_expense_cash(exp)
-            except Exception:
-                pass
             flash(_("Expense recorded"), "success")
         else:
             flash(_("Invalid expense data"), "danger")
@@ -948,18 +722,57 @@ def journal_new():
                 je.date = _dt.strptime(date_str, "%Y-%m-%d").date()
         except Exception:
             pass
-        db.session.add(je)
-        db.session.flush()
-        jl1 = JournalLine(entry_id=je.id, account_id=int(debit_account_id), debit=amt, credit=0)
-        jl2 = JournalLine(entry_id=je.id, account_id=int(credit_account_id), debit=0, credit=amt)
-        db.session.add_all([jl1, jl2])
-        db.session.commit()
+        try:
+            db.session.add(je)
+            db.session.flush()
+            jl1 = JournalLine(entry_id=je.id, account_id=int(debit_account_id), debit=amt, credit=0)
+            jl2 = JournalLine(entry_id=je.id, account_id=int(credit_account_id), debit=0, credit=amt)
+            db.session.add_all([jl1, jl2])
+            db.session.commit()
+        except PeriodClosedError as exc:
+            db.session.rollback()
+            flash(str(exc), "danger")
+            return render_template("accountant/journal_new.html", accounts=accounts)
         flash(_("Journal entry created"), "success")
         return redirect(url_for("accountant.journal_new"))
 
     return render_template("accountant/journal_new.html", accounts=accounts)
 
 
+# -----------------------
+# Fiscal periods (month close)
+# -----------------------
+
+
+@accountant_bp.route("/periods", methods=["GET", "POST"])
+@login_required
+@accountant_required
+def periods():
+    if request.method == "POST":
+        month = (request.form.get("month") or "").strip()
+        try:
+            close_period(month, closed_by=current_user.username)
+            flash(_("Period %(month)s closed", month=month), "success")
+        except ValueError as exc:
+            db.session.rollback()
+            flash(str(exc), "danger")
+        return redirect(url_for("accountant.periods"))
+
+    return render_template("accountant/periods.html", periods=closed_periods())
+
+
+@accountant_bp.route("/postings", methods=["GET", "POST"])
+@login_required
+@accountant_required
+def postings():
+    if request.method == "POST":
+        count = posting.retry_failed()
+        flash(_("%(count)s postings queued again", count=count), "success")
+        return redirect(url_for("accountant.postings"))
+
+    return render_template("accountant/postings.html", status=posting.status())
+
+
 # -----------------------
 # General Ledger per account
 # -----------------------
@@ -970,34 +783,58 @@ def journal_new():
 @accountant_required
 def ledger():
     account_id = request.args.get("account_id", type=int)
+    start = _date_arg("start")
+    end = _date_arg("end")
     accounts = Account.query.order_by(Account.type.asc(), Account.code.asc()).all()
-    lines = []
-    running = 0.0
-    account = None
-    if account_id:
-        account = Account.query.get(account_id)
-        if account:
-            q = (
-                db.session.query(JournalLine, JournalEntry)
-                .join(JournalEntry, JournalLine.entry_id == JournalEntry.id)
-                .filter(JournalLine.account_id == account_id)
-                .order_by(JournalEntry.date.asc(), JournalEntry.id.asc(), JournalLine.id.asc())
-            )
-            for jl, je in q.all():
-                debit = float(jl.debit or 0)
-                credit = float(jl.credit or 0)
-                if account.type in {"asset", "expense"}:
-                    running += debit - credit
-                else:
-                    running += credit - debit
-                lines.append({
-                    "date": je.date,
-                    "memo": je.memo,
-                    "debit": debit,
-                    "credit": credit,
-                    "balance": round(running, 2),
-                })
-    return render_template("accountant/ledger.html", accounts=accounts, lines=lines, selected_account=account)
+    account = Account.query.get(account_id) if account_id else None
+    page = None
+    if account:
+        # Keyset pages by (date, entry, line); opening balance from monthly checkpoints
+        page = ledger_page(
+            account,
+            start=start,
+            end=end,
+            after=parse_cursor(request.args.get("after")),
+            before=parse_cursor(request.args.get("before")),
+            size=current_app.config.get("LEDGER_PAGE_SIZE", 100),
+        )
+    return render_template(
+        "accountant/ledger.html",
+        accounts=accounts,
+        lines=page["lines"] if page else [],
+        page=page,
+        selected_account=account,
+        start=start,
+        end=end,
+    )
+
+
+@accountant_bp.route("/ledger/export.csv")
+@login_required
+@accountant_required
+def ledger_export_csv():
+    account = Account.query.get_or_404(request.args.get("account_id", type=int))
+    start = _date_arg("start")
+    end = _date_arg("end")
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["Date", "EntryID", "Memo", "Debit", "Credit", "Balance"])
+        for n, row in enumerate(iter_ledger(account, start=start, end=end), start=1):
+            writer.writerow([row["date"], row["key"][1], row["memo"] or "", row["debit"], row["credit"], row["balance"]])
+            if n % 500 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    filename = f"ledger-{account.code}.csv"
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 
 # -----------------------
@@ -1009,27 +846,23 @@ def ledger():
 @login_required
 @accountant_required
 def trial_balance():
-    rows = (
-        db.session.query(
-            JournalLine.account_id,
-            db.func.coalesce(db.func.sum(JournalLine.debit), 0).label("debits"),
-            db.func.coalesce(db.func.sum(JournalLine.credit), 0).label("credits"),
-        )
-        .group_by(JournalLine.account_id)
-        .all()
-    )
+    as_of = _date_arg("as_of")
     data = []
     total_debits = 0.0
     total_credits = 0.0
-    for account_id, debits, credits in rows:
-        acc = Account.query.get(account_id)
-        d = float(debits or 0)
-        c = float(credits or 0)
-        balance = d - c if acc.type in {"asset", "expense"} else c - d
-        data.append({"account": acc, "debits": d, "credits": c, "balance": round(balance, 2)})
+    for row in account_balances(as_of=as_of, with_activity_only=True):
+        d = float(row.debits)
+        c = float(row.credits)
+        data.append({"account": row.account, "debits": d, "credits": c, "balance": round(float(row.balance), 2)})
         total_debits += d
         total_credits += c
-    return render_template("accountant/trial_balance.html", rows=data, total_debits=round(total_debits, 2), total_credits=round(total_credits, 2))
+    return render_template(
+        "accountant/trial_balance.html",
+        rows=data,
+        total_debits=round(total_debits, 2),
+        total_credits=round(total_credits, 2),
+        as_of=as_of,
+    )
 
 
 # -----------------------
@@ -1041,31 +874,13 @@ def trial_balance():
 @login_required
 @accountant_required
 def income_statement():
-    # Income accounts: credit-normal
-    income_rows = (
-        db.session.query(
-            Account,
-            db.func.coalesce(db.func.sum(JournalLine.debit), 0),
-            db.func.coalesce(db.func.sum(JournalLine.credit), 0),
-        )
-        .join(JournalLine, JournalLine.account_id == Account.id)
-        .filter(Account.type == "income")
-        .group_by(Account.id)
-        .all()
-    )
-    expense_rows = (
-        db.session.query(
-            Account,
-            db.func.coalesce(db.func.sum(JournalLine.debit), 0),
-            db.func.coalesce(db.func.sum(JournalLine.credit), 0),
-        )
-        .join(JournalLine, JournalLine.account_id == Account.id)
-        .filter(Account.type == "expense")
-        .group_by(Account.id)
-        .all()
-    )
-    income_total = sum(float(c) - float(d) for _, d, c in income_rows)
-    expense_total = sum(float(d) - float(c) for _, d, c in expense_rows)
+    as_of = _date_arg("as_of")
+    grouped = balances_by_type(account_balances(as_of=as_of, types=("income", "expense"), with_activity_only=True))
+    # Income accounts are credit-normal, expense accounts debit-normal
+    income_rows = [(row.account, row.debits, row.credits) for row in grouped["income"]]
+    expense_rows = [(row.account, row.debits, row.credits) for row in grouped["expense"]]
+    income_total = sum(float(row.balance) for row in grouped["income"])
+    expense_total = sum(float(row.balance) for row in grouped["expense"])
     net_income = round(income_total - expense_total, 2)
     return render_template(
         "accountant/income_statement.html",
@@ -1074,11 +889,12 @@ def income_statement():
         income_total=round(income_total, 2),
         expense_total=round(expense_total, 2),
         net_income=net_income,
+        as_of=as_of,
     )
 
 
 # -----------------------
-# Balance Sheet (as of today)
+# Balance Sheet (as of today, or ?as_of=YYYY-MM-DD)
 # -----------------------
 
 
@@ -1086,26 +902,11 @@ def income_statement():
 @login_required
 @accountant_required
 def balance_sheet():
-    # Aggregate balances by account type
-    def account_balance(acc: Account) -> float:
-        sums = (
-            db.session.query(
-                db.func.coalesce(db.func.sum(JournalLine.debit), 0),
-                db.func.coalesce(db.func.sum(JournalLine.credit), 0),
-            )
-            .filter(JournalLine.account_id == acc.id)
-            .first()
-        )
-        d, c = float(sums[0] or 0), float(sums[1] or 0)
-        return (d - c) if acc.type in {"asset", "expense"} else (c - d)
-
-    assets = Account.query.filter_by(type="asset").order_by(Account.code).all()
-    liabilities = Account.query.filter_by(type="liability").order_by(Account.code).all()
-    equity = Account.query.filter_by(type="equity").order_by(Account.code).all()
-
-    assets_rows = [(acc, round(account_balance(acc), 2)) for acc in assets]
-    liabilities_rows = [(acc, round(account_balance(acc), 2)) for acc in liabilities]
-    equity_rows = [(acc, round(account_balance(acc), 2)) for acc in equity]
+    as_of = _date_arg("as_of")
+    grouped = balances_by_type(account_balances(as_of=as_of, types=("asset", "liability", "equity")))
+    assets_rows = [(row.account, round(float(row.balance), 2)) for row in grouped["asset"]]
+    liabilities_rows = [(row.account, round(float(row.balance), 2)) for row in grouped["liability"]]
+    equity_rows = [(row.account, round(float(row.balance), 2)) for row in grouped["equity"]]
 
     assets_total = round(sum(v for _, v in assets_rows), 2)
     liabilities_total = round(sum(v for _, v in liabilities_rows), 2)
@@ -1118,9 +919,23 @@ def balance_sheet():
         assets_total=assets_total,
         liabilities_total=liabilities_total,
         equity_total=equity_total,
+        as_of=as_of,
     )
 
 
+def _date_arg(name: str, values=None):
+    """``?<name>=YYYY-MM-DD`` of the report views, or of ``values`` (None when missing or invalid)."""
+    raw = ((values if values is not None else request.args).get(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        from datetime import datetime as _dt
+
+        return _dt.strptime(raw, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
 # -----------------------
 # Accounts Receivable Aging
 # -----------------------
@@ -1130,127 +945,30 @@ def balance_sheet():
 @login_required
 @accountant_required
 def ar_aging():
-    from datetime import date as _date
-    today = _date.today()
-    # Unpaid tenant payments
-    payments = (
-        db.session.query(Payment)
-        .filter(Payment.status != "paid")
-        .order_by(Payment.due_date.asc())
-        .all()
+    sort = request.args.get("sort")
+    if sort not in AGING_SORTS:
+        sort = "bucket"
+    descending = request.args.get("dir") != "asc"
+    group = "tenant" if request.args.get("group") == "tenant" else None
+    today = date.today()
+    buckets = ar_aging_totals(today)
+    if group == "tenant":
+        return render_template(
+            "accountant/ar_aging.html", buckets=buckets, tenants=ar_aging_by_tenant(today), group=group,
+        )
+    pagination = ar_aging_page(
+        today,
+        sort=sort,
+        descending=descending,
+        page=request.args.get("page", 1, type=int),
+        per_page=current_app.config.get("AR_AGING_PAGE_SIZE", 50),
+    )
+    return render_template(
+        "accountant/ar_aging.html",
+        rows=pagination.items,
+        pagination=pagination,
+        buckets=buckets,
+        sort=sort,
+        descending=descending,
+        group=group,
     )
-    buckets = {"current": 0.0, "1-30": 0.0, "31-60": 0.0, "61-90": 0.0, ">90": 0.0}
-    rows = []
-    for p in payments:
-        days = (today - (p.due_date or today)).days
-        amt = float(p.amount or 0)
-        if days <= 0:
-            buckets["current"] += amt
-            bucket = "current"
-        elif days <= 30:
-            buckets["1-30"] += amt
-            bucket = "1-30"
-        elif days <= 60:
-            buckets["31-60"] += amt
-            bucket = "31-60"
-        elif days <= 90:
-            buckets["61-90"] += amt
-            bucket = "61-90"
-        else:
-            buckets[">90"] += amt
-            bucket = ">90"
-        tenant_name = getattr(getattr(p.contract, "tenant", None), "username", "-")
-        rows.append({
-            "payment": p,
-            "tenant": tenant_name,
-            "days": days,
-            "bucket": bucket,
-            "amount": amt,
-        })
-    return render_template("accountant/ar_aging.html", rows=rows, buckets=buckets)
-
-
-# -----------------------
-# Helpers for Posting
-# -----------------------
-
-
-def _get_or_create_account(code: str, name: str, acc_type: str) -> Account:
-    acc = Account.query.filter_by(code=code).first()
-    if not acc:
-        acc = Account(code=code, name=name, type=acc_type)
-        db.session.add(acc)
-        db.session.commit()
-    return acc
-
-
-def _default_accounts() -> dict:
-    return {
-        "cash": _get_or_create_account("1000", "Cash", "asset"),
-        "ar": _get_or_create_account("1100", "Accounts Receivable", "asset"),
-        "rent_income": _get_or_create_account("4000", "Rental Income", "income"),
-        "expense_generic": _get_or_create_account("5000", "General Expenses", "expense"),
-    }
-
-
-def _post_invoice_revenue(payment: Payment) -> None:
-    # If already posted for this payment as invoice, skip
-    exists = JournalEntry.query.filter_by(source="invoice", source_id=payment.id).first()
-    if exists:
-        return
-    acc = _default_accounts()
-    je = JournalEntry(date=payment.due_date or date.today(), memo=f"Invoice for payment #{payment.id}", source="invoice", source_id=payment.id)
-    db.session.add(je)
-    db.session.flush()
-    amount = float(payment.amount or 0)
-    db.session.add_all([
-        JournalLine(entry_id=je.id, account_id=acc["ar"].id, debit=amount, credit=0),
-        JournalLine(entry_id=je.id, account_id=acc["rent_income"].id, debit=0, credit=amount),
-    ])
-    db.session.commit()
-
-
-def _post_payment_cash_receipt(payment: Payment) -> None:
-    # If already posted for this payment as cash receipt, skip
-    exists = JournalEntry.query.filter_by(source="payment", source_id=payment.id).first()
-    if exists:
-        return
-    acc = _default_accounts()
-    je = JournalEntry(date=payment.paid_date or date.today(), memo=f"Cash receipt for payment #{payment.id}", source="payment", source_id=payment.id)
-    db.session.add(je)
-    db.session.flush()
-    amount = float(payment.amount or 0)
-    db.session.add_all([
-        JournalLine(entry_id=je.id, account_id=acc["cash"].id, debit=amount, credit=0),
-        JournalLine(entry_id=je.id, account_id=acc["ar"].id, debit=0, credit=amount),
-    ])
-    db.session.commit()
-
-
-def _reverse_payment_cash_receipt(payment: Payment) -> None:
-    exists = JournalEntry.query.filter_by(source="payment", source_id=payment.id).first()
-    if not exists:
-        return
-    acc = _default_accounts()
-    je = JournalEntry(date=date.today(), memo=f"Reversal cash receipt for payment #{payment.id}", source="payment_reverse", source_id=payment.id)
-    db.session.add(je)
-    db.session.flush()
-    amount = float(payment.amount or 0)
-    db.session.add_all([
-        JournalLine(entry_id=je.id, account_id=acc["cash"].id, debit=0, credit=amount),
-        JournalLine(entry_id=je.id, account_id=acc["ar"].id, debit=amount, credit=0),
-    ])
-    db.session.commit()
-
-
-def _post_expense_cash(exp: Expense) -> None:
-    acc = _default_accounts()
-    je = JournalEntry(date=exp.spent_at or date.today(), memo=f"Expense: {exp.description}", source="expense", source_id=exp.id)
-    db.session.add(je)
-    db.session.flush()
-    amount = float(exp.amount or 0)
-    db.session.add_all([
-        JournalLine(entry_id=je.id, account_id=acc["expense_generic"].id, debit=amount, credit=0),
-        JournalLine(entry_id=je.id, account_id=acc["cash"].id, debit=0, credit=amount),
-    ])
-    db.session.commit()
@@ -0,0 +1,625 @@
+from __future__ import annotations
+
+import threading
+import weakref
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, event, func, inspect as sa_inspect, or_, select, union_all
+from sqlalchemy.engine import Engine
+
+from .extensions import db
+from .models import (
+    DEFAULT_ACCOUNTS,
+    Account,
+    AccountMonthBalance,
+    FiscalPeriod,
+    JournalEntry,
+    JournalLine,
+    PeriodClosingBalance,
+)
+from .reporting import add_months, month_bucket, month_key
+from .tenant_schema import ensure_schema, schema_state
+
+
+"""
+Account balances for the accounting reports.
+
+``account_balances`` returns debits, credits and the normal-side balance of every
+account in one round trip. Tenants with the ``account_balances`` table read whole
+months from it (one row per account and month, kept current by the flush hooks
+below) and only sum ``journal_lines`` for the part of the ``as_of`` month; older
+tenants sum ``journal_lines`` directly.
+
+Closed fiscal periods store every account's cumulative sums at their month end
+(``period_closing_balances``); balances after a closed period start from the latest
+such snapshot and only add the months after it. Postings into closed periods are
+rejected with ``PeriodClosedError``.
+
+The general ledger is read in keyset pages ordered by (entry date, entry id, line id);
+the opening balance of a page comes from the closing snapshot and monthly rows plus
+the lines of the cursor's month that sort before it.
+
+The hooks re-aggregate the journal entries a flush touches: their per-account/month
+sums are subtracted before the flush and added back after it, in the same
+transaction. Core/bulk writes must call ``apply_entry_sums`` themselves;
+``flask tenant-rebuild-balances`` recomputes the table.
+"""
+
+DEBIT_NORMAL = {"asset", "expense"}
+
+# Entry ids per IN (...) clause when re-aggregating touched entries
+_CHUNK = 500
+
+Sums = Dict[Tuple[int, str], List[Decimal]]
+
+
+@dataclass(frozen=True)
+class AccountBalance:
+    account: Account
+    debits: Decimal
+    credits: Decimal
+
+    @property
+    def balance(self) -> Decimal:
+        """Balance on the account's normal side (debit for assets/expenses, credit otherwise)."""
+        if self.account.type in DEBIT_NORMAL:
+            return self.debits - self.credits
+        return self.credits - self.debits
+
+    @property
+    def has_activity(self) -> bool:
+        return bool(self.debits or self.credits)
+
+
+def account_balances(
+    as_of: Optional[date] = None,
+    types: Optional[Iterable[str]] = None,
+    with_activity_only: bool = False,
+) -> List[AccountBalance]:
+    """Balances of all accounts (optionally of ``types``) as of ``as_of``, ordered by code."""
+    parts = _balance_parts(month_key(as_of), [JournalEntry.date <= as_of] if as_of is not None else [])
+    parts = union_all(*parts).subquery("parts")
+    sums = (
+        select(
+            parts.c.account_id.label("account_id"),
+            func.sum(parts.c.debits).label("debits"),
+            func.sum(parts.c.credits).label("credits"),
+        )
+        .group_by(parts.c.account_id)
+        .subquery("sums")
+    )
+
+    join = Account.__table__.join(sums, sums.c.account_id == Account.id, isouter=not with_activity_only)
+    query = (
+        select(Account, func.coalesce(sums.c.debits, 0), func.coalesce(sums.c.credits, 0))
+        .select_from(join)
+        .order_by(Account.code.asc())
+    )
+    if types is not None:
+        query = query.where(Account.type.in_(list(types)))
+    return [
+        AccountBalance(account=account, debits=_decimal(debits), credits=_decimal(credits))
+        for account, debits, credits in db.session.execute(query)
+    ]
+
+
+def balances_by_type(balances: Iterable[AccountBalance]) -> Dict[str, List[AccountBalance]]:
+    grouped: Dict[str, List[AccountBalance]] = {t: [] for t in ("asset", "liability", "equity", "income", "expense")}
+    for row in balances:
+        grouped.setdefault(row.account.type, []).append(row)
+    return grouped
+
+
+def _has_table(name: str) -> bool:
+    engine = db.session.get_bind(mapper=JournalLine.__mapper__)
+    state = schema_state(engine)
+    return state is not None and state.has_table(name)
+
+
+def materialized() -> bool:
+    return _has_table(AccountMonthBalance.__tablename__)
+
+
+def _month_start(month: str) -> date:
+    return date(int(month[:4]), int(month[5:7]), 1)
+
+
+def _balance_parts(month: Optional[str], line_filters: list, account_id: Optional[int] = None) -> list:
+    """Selects of (account_id, debits, credits) that together sum every line up to ``month``.
+
+    ``month`` is the month the period of interest ends in (``None``: no bound) and
+    ``line_filters`` cut the lines of that month. Sources, oldest first: the closing
+    balances of the latest period closed before ``month``, whole months after it from
+    ``account_balances`` and the lines of ``month`` itself; tenants without the monthly
+    table read every line after the closed period.
+    """
+    closed = latest_closed(before=month)
+    parts = []
+    if closed is not None:
+        closing = select(
+            PeriodClosingBalance.account_id.label("account_id"),
+            PeriodClosingBalance.debits.label("debits"),
+            PeriodClosingBalance.credits.label("credits"),
+        ).where(PeriodClosingBalance.period_id == closed.id)
+        if account_id is not None:
+            closing = closing.where(PeriodClosingBalance.account_id == account_id)
+        parts.append(closing)
+
+    lines = (
+        select(
+            JournalLine.account_id.label("account_id"),
+            func.coalesce(func.sum(JournalLine.debit), 0).label("debits"),
+            func.coalesce(func.sum(JournalLine.credit), 0).label("credits"),
+        )
+        .join(JournalEntry, JournalEntry.id == JournalLine.entry_id)
+        .where(*line_filters)
+        .group_by(JournalLine.account_id)
+    )
+    if account_id is not None:
+        lines = lines.where(JournalLine.account_id == account_id)
+
+    if materialized():
+        months = AccountMonthBalance
+        stored = select(
+            months.account_id.label("account_id"), months.debits.label("debits"), months.credits.label("credits")
+        )
+        if closed is not None:
+            stored = stored.where(months.month > closed.month)
+        if account_id is not None:
+            stored = stored.where(months.account_id == account_id)
+        if month is None:
+            return parts + [stored]
+        # Whole months from the table, the rest of ``month`` from the lines
+        parts.append(stored.where(months.month < month))
+        parts.append(lines.where(JournalEntry.date >= _month_start(month)))
+        return parts
+    if closed is not None:
+        year, mon = add_months(int(closed.month[:4]), int(closed.month[5:7]), 1)
+        lines = lines.where(JournalEntry.date >= date(year, mon, 1))
+    return parts + [lines]
+
+
+# --- general ledger ---
+
+# Position of a journal line in the ledger: (entry date, entry id, line id)
+LedgerKey = Tuple[date, int, int]
+
+
+def format_cursor(key: LedgerKey) -> str:
+    return f"{key[0].isoformat()}.{key[1]}.{key[2]}"
+
+
+def parse_cursor(raw: Optional[str]) -> Optional[LedgerKey]:
+    """Inverse of ``format_cursor``; ``None`` for missing or malformed cursors."""
+    try:
+        day, entry_id, line_id = (raw or "").split(".")
+        return date.fromisoformat(day), int(entry_id), int(line_id)
+    except ValueError:
+        return None
+
+
+def _position_before(key: LedgerKey):
+    day, entry_id, line_id = key
+    return or_(
+        JournalEntry.date < day,
+        and_(JournalEntry.date == day, or_(
+            JournalEntry.id < entry_id,
+            and_(JournalEntry.id == entry_id, JournalLine.id < line_id),
+        )),
+    )
+
+
+def _position_after(key: LedgerKey):
+    day, entry_id, line_id = key
+    return or_(
+        JournalEntry.date > day,
+        and_(JournalEntry.date == day, or_(
+            JournalEntry.id > entry_id,
+            and_(JournalEntry.id == entry_id, JournalLine.id > line_id),
+        )),
+    )
+
+
+def _signed(account: Account, debits, credits) -> Decimal:
+    debits, credits = _decimal(debits), _decimal(credits)
+    return debits - credits if account.type in DEBIT_NORMAL else credits - debits
+
+
+def opening_balance(account: Account, key: LedgerKey) -> Decimal:
+    """Normal-side balance of ``account`` over all lines sorting before ledger position ``key``."""
+    parts = _balance_parts(month_key(key[0]), [_position_before(key)], account_id=account.id)
+    rows = db.session.execute(union_all(*parts)).all()
+    return _signed(account, sum(_decimal(r.debits) for r in rows), sum(_decimal(r.credits) for r in rows))
+
+
+def _ledger_query(account: Account, start: Optional[date], end: Optional[date]):
+    query = (
+        select(JournalEntry.date, JournalEntry.id, JournalLine.id, JournalEntry.memo, JournalLine.debit, JournalLine.credit)
+        .join(JournalEntry, JournalEntry.id == JournalLine.entry_id)
+        .where(JournalLine.account_id == account.id)
+    )
+    if start is not None:
+        query = query.where(JournalEntry.date >= start)
+    if end is not None:
+        query = query.where(JournalEntry.date <= end)
+    return query
+
+
+_ASC = (JournalEntry.date.asc(), JournalEntry.id.asc(), JournalLine.id.asc())
+_DESC = (JournalEntry.date.desc(), JournalEntry.id.desc(), JournalLine.id.desc())
+
+
+def _ledger_rows(account: Account, rows, balance: Decimal) -> Tuple[List[dict], Decimal]:
+    out = []
+    for day, entry_id, line_id, memo, debit, credit in rows:
+        balance += _signed(account, debit, credit)
+        out.append({
+            "key": (day, entry_id, line_id),
+            "date": day,
+            "memo": memo,
+            "debit": float(debit or 0),
+            "credit": float(credit or 0),
+            "balance": float(balance),
+        })
+    return out, balance
+
+
+def ledger_page(
+    account: Account,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    after: Optional[LedgerKey] = None,
+    before: Optional[LedgerKey] = None,
+    size: int = 100,
+) -> dict:
+    """One keyset page of ``account``'s ledger with a running balance.
+
+    Returns ``{"lines", "opening", "closing", "next", "prev"}``; ``next``/``prev`` are
+    cursors for ``after``/``before`` (``None`` on the last/first page).
+    """
+    query = _ledger_query(account, start, end)
+    if before is not None:
+        rows = db.session.execute(query.where(_position_before(before)).order_by(*_DESC).limit(size + 1)).all()
+        has_prev, has_next = len(rows) > size, True
+        rows = list(reversed(rows[:size]))
+    else:
+        if after is not None:
+            query = query.where(_position_after(after))
+        rows = db.session.execute(query.order_by(*_ASC).limit(size + 1)).all()
+        has_prev, has_next = after is not None, len(rows) > size
+        rows = rows[:size]
+
+    if rows:
+        opening = opening_balance(account, tuple(rows[0][:3]))
+    else:
+        opening = opening_balance(account, (start, 0, 0)) if start is not None else Decimal("0.00")
+    lines, closing = _ledger_rows(account, rows, opening)
+    return {
+        "lines": lines,
+        "opening": float(opening),
+        "closing": float(closing),
+        "next": format_cursor(lines[-1]["key"]) if lines and has_next else None,
+        "prev": format_cursor(lines[0]["key"]) if lines and has_prev else None,
+    }
+
+
+def iter_ledger(account: Account, start: Optional[date] = None, end: Optional[date] = None,
+                batch: int = 1000) -> Iterator[dict]:
+    """All ledger lines of ``account`` in order, streamed from the database ``batch`` rows at a time."""
+    balance = opening_balance(account, (start, 0, 0)) if start is not None else Decimal("0.00")
+    result = db.session.execute(
+        _ledger_query(account, start, end).order_by(*_ASC).execution_options(yield_per=batch)
+    )
+    for partition in result.partitions():
+        rows, balance = _ledger_rows(account, partition, balance)
+        yield from rows
+
+
+# --- fiscal periods ---
+
+
+class PeriodClosedError(Exception):
+    """A posting is dated in (or moves lines out of) a closed period."""
+
+
+def latest_closed(before: Optional[str] = None) -> Optional[FiscalPeriod]:
+    """Latest closed period (strictly before month ``before`` when given), if any."""
+    if not _has_table(FiscalPeriod.__tablename__):
+        return None
+    query = select(FiscalPeriod).order_by(FiscalPeriod.month.desc()).limit(1)
+    if before is not None:
+        query = query.where(FiscalPeriod.month < before)
+    return db.session.execute(query).scalar()
+
+
+def closed_periods() -> List[FiscalPeriod]:
+    """Closed periods, latest first (empty for tenants without the table)."""
+    if not _has_table(FiscalPeriod.__tablename__):
+        return []
+    return list(db.session.execute(select(FiscalPeriod).order_by(FiscalPeriod.month.desc())).scalars())
+
+
+def close_period(month: str, closed_by: Optional[str] = None) -> FiscalPeriod:
+    """Close every open month up to and including ``month`` (``YYYY-MM``) and commit.
+
+    Stores each account's cumulative debits/credits through the end of ``month``;
+    reports dated after it start from these rows. Raises ``ValueError`` for malformed,
+    current/future or already closed months.
+    """
+    if not _has_table(FiscalPeriod.__tablename__):
+        raise ValueError("This company's database has no fiscal periods yet; run the tenant migrations")
+    try:
+        start = _month_start(month)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid month {month!r}; expected YYYY-MM")
+    if len(month) != 7 or month >= month_key(date.today()):
+        raise ValueError(f"Only past months can be closed, not {month}")
+    latest = latest_closed()
+    if latest is not None and month <= latest.month:
+        raise ValueError(f"Periods up to {latest.month} are already closed")
+
+    year, mon = add_months(start.year, start.month, 1)
+    period_end = date.fromordinal(date(year, mon, 1).toordinal() - 1)
+    period = FiscalPeriod(month=month, closed_by=closed_by)
+    period.closing_balances = [
+        PeriodClosingBalance(account_id=row.account.id, debits=row.debits, credits=row.credits)
+        for row in account_balances(as_of=period_end, with_activity_only=True)
+        if row.has_activity
+    ]
+    db.session.add(period)
+    db.session.commit()
+    return period
+
+
+@event.listens_for(db.session, "before_flush")
+def _guard_closed_periods(session, _flush_context, _instances):
+    changed = [obj for obj in (*session.new, *session.dirty, *session.deleted)
+               if isinstance(obj, (JournalEntry, JournalLine))]
+    if not changed:
+        return
+    conn = session.connection(bind_arguments={"mapper": JournalLine.__mapper__})
+    if not ensure_schema(conn.engine).has_table(FiscalPeriod.__tablename__):
+        return
+    closed = conn.execute(select(func.max(FiscalPeriod.month))).scalar()
+    if closed is None:
+        return
+    # New dates of pending entries, plus the stored dates of every entry whose lines change
+    months = {month_key(obj.date) for obj in changed if isinstance(obj, JournalEntry) and obj.date is not None}
+    ids = sorted(_touched_entries(session))
+    for start in range(0, len(ids), _CHUNK):
+        stored = conn.execute(
+            select(func.min(JournalEntry.date)).where(JournalEntry.id.in_(ids[start:start + _CHUNK]))
+        ).scalar()
+        if stored is not None:
+            months.add(month_key(stored))
+    if months and min(months) <= closed:
+        raise PeriodClosedError(f"Period {closed} is closed; post with a later date")
+
+
+# --- default posting accounts ---
+
+# Tenant engine -> {role: account id} of DEFAULT_ACCOUNTS (per worker)
+_default_ids: "weakref.WeakKeyDictionary[Engine, Dict[str, int]]" = weakref.WeakKeyDictionary()
+_default_lock = threading.Lock()
+
+
+def default_account_ids() -> Dict[str, int]:
+    """Role -> account id of ``DEFAULT_ACCOUNTS`` for the bound tenant.
+
+    Cached per tenant engine after one lookup. Missing accounts are added to the
+    session and flushed, so they commit with the posting that needed them; the map is
+    only cached once every account was found in the database.
+    """
+    engine = db.session.get_bind(mapper=Account.__mapper__)
+    ids = _default_ids.get(engine)
+    if ids is not None:
+        return ids
+    codes = [code for code, _name, _type in DEFAULT_ACCOUNTS.values()]
+    found = dict(db.session.execute(select(Account.code, Account.id).where(Account.code.in_(codes))).all())
+    missing = [
+        Account(code=code, name=name, type=acc_type)
+        for code, name, acc_type in DEFAULT_ACCOUNTS.values()
+        if code not in found
+    ]
+    if missing:
+        db.session.add_all(missing)
+        db.session.flush()
+        found.update((account.code, account.id) for account in missing)
+    ids = {role: found[code] for role, (code, _name, _type) in DEFAULT_ACCOUNTS.items()}
+    if not missing:
+        with _default_lock:
+            _default_ids[engine] = ids
+    return ids
+
+
+def forget_default_accounts(engine: Optional[Engine] = None) -> None:
+    """Drop the cached default accounts of ``engine`` (the bound tenant when omitted)."""
+    engine = engine if engine is not None else db.session.get_bind(mapper=Account.__mapper__)
+    with _default_lock:
+        _default_ids.pop(engine, None)
+
+
+# --- materialized table maintenance ---
+
+
+def entry_sums(conn, entry_ids: Iterable[int]) -> Sums:
+    """Per (account, month) debits/credits of the stored lines of ``entry_ids``."""
+    ids = sorted({i for i in entry_ids if i is not None})
+    sums: Sums = defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    bucket = month_bucket(JournalEntry.date, conn.dialect.name)
+    for start in range(0, len(ids), _CHUNK):
+        query = (
+            select(JournalLine.account_id, bucket, func.sum(JournalLine.debit), func.sum(JournalLine.credit))
+            .join(JournalEntry, JournalEntry.id == JournalLine.entry_id)
+            .where(JournalLine.entry_id.in_(ids[start:start + _CHUNK]))
+            .group_by(JournalLine.account_id, bucket)
+        )
+        for account_id, month, debits, credits in conn.execute(query):
+            sums[(account_id, month)][0] += _decimal(debits)
+            sums[(account_id, month)][1] += _decimal(credits)
+    return sums
+
+
+def _upsert(conn, table):
+    """INSERT adding ``debits``/``credits`` onto an existing (account, month) row, if the dialect has one."""
+    name = conn.dialect.name
+    if name in ("sqlite", "postgresql"):
+        if name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.account_id, table.c.month],
+            set_={
+                "debits": table.c.debits + stmt.excluded.debits,
+                "credits": table.c.credits + stmt.excluded.credits,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+    if name in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(table)
+        return stmt.on_duplicate_key_update(
+            debits=table.c.debits + stmt.inserted.debits,
+            credits=table.c.credits + stmt.inserted.credits,
+            updated_at=stmt.inserted.updated_at,
+        )
+    return None
+
+
+def apply_sums(conn, sums: Sums, sign: int = 1) -> None:
+    """Add (``sign=1``) or subtract (``sign=-1``) ``sums`` to the ``account_balances`` rows."""
+    table = AccountMonthBalance.__table__
+    now = datetime.utcnow()
+    rows = [
+        {"account_id": account_id, "month": month, "debits": sign * debits, "credits": sign * credits, "updated_at": now}
+        for (account_id, month), (debits, credits) in sums.items()
+        if (debits or credits) and month is not None
+    ]
+    if not rows:
+        return
+    # One atomic upsert, so concurrent first postings to a month cannot both insert
+    stmt = _upsert(conn, table)
+    if stmt is not None:
+        conn.execute(stmt, rows)
+        return
+    for row in rows:
+        key = (table.c.account_id == row["account_id"]) & (table.c.month == row["month"])
+        result = conn.execute(
+            table.update().where(key).values(
+                debits=table.c.debits + row["debits"], credits=table.c.credits + row["credits"], updated_at=now
+            )
+        )
+        if result.rowcount == 0:
+            conn.execute(table.insert().values(**row))
+
+
+def apply_entry_sums(conn, entry_ids: Iterable[int], sign: int = 1) -> None:
+    """Add the stored lines of ``entry_ids`` to the table (for writes that bypass the ORM)."""
+    apply_sums(conn, entry_sums(conn, entry_ids), sign)
+
+
+def _touched_entries(session) -> Set[int]:
+    """Ids of stored journal entries whose lines a flush adds, changes or removes."""
+    ids: Set[int] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, JournalEntry):
+            ids.add(obj.id)
+        elif isinstance(obj, JournalLine):
+            state = sa_inspect(obj)
+            ids.update(state.attrs.entry_id.history.deleted)
+            ids.add(obj.entry_id)
+            entry = state.dict.get("entry")
+            if entry is not None:
+                ids.add(entry.id)
+    ids.discard(None)
+    return ids
+
+
+def has_snapshot(engine) -> bool:
+    return ensure_schema(engine).has_table(AccountMonthBalance.__tablename__)
+
+
+def _maintained(session) -> Optional[object]:
+    conn = session.connection(bind_arguments={"mapper": JournalLine.__mapper__})
+    return conn if has_snapshot(conn.engine) else None
+
+
+@event.listens_for(db.session, "before_flush")
+def _subtract_stored(session, _flush_context, _instances):
+    ids = _touched_entries(session)
+    session.info["balance_entries"] = ids
+    if ids:
+        conn = _maintained(session)
+        if conn is not None:
+            apply_sums(conn, entry_sums(conn, ids), -1)
+
+
+@event.listens_for(db.session, "after_flush")
+def _add_flushed(session, _flush_context):
+    ids = session.info.pop("balance_entries", set()) | _touched_entries(session)
+    if ids:
+        conn = _maintained(session)
+        if conn is not None:
+            apply_sums(conn, entry_sums(conn, ids), 1)
+
+
+# --- full rebuild / verification ---
+
+
+def compute(conn) -> Sums:
+    """Per (account, month) sums of all journal lines."""
+    bucket = month_bucket(JournalEntry.date, conn.dialect.name)
+    sums: Sums = defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    query = (
+        select(JournalLine.account_id, bucket, func.sum(JournalLine.debit), func.sum(JournalLine.credit))
+        .join(JournalEntry, JournalEntry.id == JournalLine.entry_id)
+        .group_by(JournalLine.account_id, bucket)
+    )
+    for account_id, month, debits, credits in conn.execute(query):
+        sums[(account_id, month)] = [_decimal(debits), _decimal(credits)]
+    return sums
+
+
+def read(conn) -> Sums:
+    table = AccountMonthBalance.__table__
+    sums: Sums = defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    for account_id, month, debits, credits in conn.execute(
+        select(table.c.account_id, table.c.month, table.c.debits, table.c.credits)
+    ):
+        sums[(account_id, month)] = [_decimal(debits), _decimal(credits)]
+    return sums
+
+
+def diff(expected: Sums, actual: Sums) -> dict:
+    """``{"account:month": (expected, actual)}`` for every (debits, credits) pair that differs."""
+    mismatches = {}
+    zero = [Decimal("0.00"), Decimal("0.00")]
+    for key in set(expected) | set(actual):
+        exp = [_decimal(v) for v in expected.get(key, zero)]
+        act = [_decimal(v) for v in actual.get(key, zero)]
+        if exp != act:
+            mismatches[f"{key[0]}:{key[1]}"] = (tuple(exp), tuple(act))
+    return mismatches
+
+
+def rebuild(engine) -> dict:
+    """Replace the table with a fresh computation and return remaining mismatches."""
+    with engine.begin() as conn:
+        sums = compute(conn)
+        conn.execute(AccountMonthBalance.__table__.delete())
+        apply_sums(conn, sums)
+    with engine.connect() as conn:
+        return diff(compute(conn), read(conn))
+
+
+def _decimal(value) -> Decimal:
+    if value is None:
+        return Decimal("0.00")
+    return (value if isinstance(value, Decimal) else Decimal(str(value))).quantize(Decimal("0.01"))
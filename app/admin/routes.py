@@ -3,9 +3,10 @@ from flask_login import login_required, current_user
 from flask_babel import gettext as _
 from ..models import Property, Contract, Payment, User, Apartment
 from ..extensions import db
-from flask import request, redirect, url_for, flash
-from datetime import date, datetime, timedelta
-from sqlalchemy import text
+from ..reporting import DashboardMetrics
+from flask import request, redirect, url_for, flash, session
+from .. import user_directory
+from datetime import date, timedelta
 
 
 admin_bp = Blueprint("admin", __name__)
@@ -30,123 +31,26 @@ def admin_required(func):
 @admin_required
 def dashboard():
     # Super Admin dashboard now moved to /superadmin
-    # Total units = standalone apartments + apartments within buildings (exclude buildings)
-    standalone_apartments_count = Property.query.filter(Property.property_type == "apartment").count()
-    building_apartments_count = Apartment.query.count()
-    properties_count = (standalone_apartments_count or 0) + (building_apartments_count or 0)
-    # Active contracts overall (legacy metric kept)
-    active_contracts = Contract.query.filter_by(status="active").count()
-
-    # Income (paid payments)
-    total_income = (
-        Payment.query.filter_by(status="paid")
-        .with_entities(db.func.coalesce(db.func.sum(Payment.amount), 0))
-        .scalar()
+    # Units = standalone apartments + apartments within buildings (exclude buildings);
+    # unleased units are those without an active contract (building-level contracts
+    # lease every apartment of the building). All cards come from one query.
+    metrics = DashboardMetrics().load(
+        "payments", "expenses", "units", "contracts", "maintenance_overdue", "users"
     )
-
-    # Expenses (optional table). If table doesn't exist, default to 0
-    total_expenses = 0
-    try:
-        inspector = db.inspect(db.engine)
-        if inspector.has_table("expenses"):
-            res = db.session.execute(text("SELECT COALESCE(SUM(amount), 0) FROM expenses"))
-            total_expenses = res.scalar() or 0
-    except Exception:
-        total_expenses = 0
-
-    # Profit = income - expenses
-    profit = (total_income or 0) - (total_expenses or 0)
-
-    # Unleased units: standalone apartments without active contract + building apartments without active contract
-    today = date.today()
-    # Standalone apartments without active contract
-    active_apartment_props_subq = (
-        db.session.query(Contract.property_id)
-        .filter(
-            Contract.status == "active",
-            Contract.start_date <= today,
-            Contract.end_date >= today,
-        )
-        .subquery()
-    )
-    standalone_unleased = (
-        db.session.query(db.func.count(Property.id))
-        .filter(
-            Property.property_type == "apartment",
-            ~Property.id.in_(active_apartment_props_subq),
-        )
-        .scalar()
-    )
-
-    # Building apartments without active contract
-    active_building_apts_subq = (
-        db.session.query(Contract.apartment_id)
-        .filter(
-            Contract.status == "active",
-            Contract.start_date <= today,
-            Contract.end_date >= today,
-            Contract.apartment_id != None,
-        )
-        .subquery()
-    )
-    # Buildings that are fully leased via a building-level contract (no apartment specified)
-    active_leased_buildings_subq = (
-        db.session.query(Contract.property_id)
-        .filter(
-            Contract.status == "active",
-            Contract.start_date <= today,
-            Contract.end_date >= today,
-            Contract.apartment_id == None,
-        )
-        .subquery()
-    )
-    building_apartments_unleased = (
-        db.session.query(db.func.count(Apartment.id))
-        .filter(
-            ~Apartment.id.in_(active_building_apts_subq),
-            ~Apartment.building_id.in_(active_leased_buildings_subq),
-        )
-        .scalar()
-    )
-    unleased_properties = (standalone_unleased or 0) + (building_apartments_unleased or 0)
-
-    # Maintenance requests older than 24 hours (optional table)
-    overdue_maintenance_24h = 0
-    try:
-        # reuse inspector if created above; create if not
-        if 'inspector' not in locals():
-            inspector = db.inspect(db.engine)
-        if inspector.has_table("maintenance_requests"):
-            threshold = datetime.utcnow() - timedelta(hours=24)
-            res = db.session.execute(
-                text(
-                    """
-                    SELECT COUNT(1)
-                    FROM maintenance_requests
-                    WHERE (status IS NULL OR status NOT IN ('resolved','closed','done'))
-                      AND created_at <= :threshold
-                    """
-                ),
-                {"threshold": threshold},
-            )
-            overdue_maintenance_24h = res.scalar() or 0
-    except Exception:
-        overdue_maintenance_24h = 0
-    # Basic counts for employees and tenants
-    total_employees = User.query.filter_by(role="employee").count()
-    total_tenants = User.query.filter_by(role="tenant").count()
+    total_income = metrics["total_income"]
+    total_expenses = metrics["total_expenses"]
 
     return render_template(
         "admin/dashboard.html",
-        properties_count=properties_count,
-        active_contracts=active_contracts,
+        properties_count=metrics["units_total"],
+        active_contracts=metrics["contracts_active"],
         total_income=total_income,
         total_expenses=total_expenses,
-        profit=profit,
-        unleased_properties=unleased_properties,
-        overdue_maintenance_24h=overdue_maintenance_24h,
-        total_employees=total_employees,
-        total_tenants=total_tenants,
+        profit=(total_income or 0) - (total_expenses or 0),
+        unleased_properties=metrics["units_unleased"],
+        overdue_maintenance_24h=metrics["maint_overdue"],
+        total_employees=metrics["total_employees"],
+        total_tenants=metrics["total_tenants"],
     )
 
 
@@ -475,6 +379,11 @@ def create_user(role: str):
             new_user = User(username=username, phone=phone, email=email, role=role)
         new_user.set_password(password)
         db.session.add(new_user)
+        # Keep the master-DB login directory in sync with this tenant's users, using the
+        # phone the row actually stores (employee rows keep none)
+        company_id = session.get("company_id")
+        if company_id:
+            user_directory.record_user(company_id, username, new_user.phone)
         db.session.commit()
 
         if role == "employee":
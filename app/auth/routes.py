@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, abort
 from flask_login import login_user, logout_user, login_required
 from flask_babel import gettext as _
-from ..extensions import db
+from ..extensions import db, tenant_engines
+from ..tenancy import tenant_bound
+from .. import user_directory
 from ..models import User, Company
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
@@ -23,31 +25,27 @@ def login():
             return redirect(url_for("superadmin.dashboard"))  # ← هنا التوجيه الصحيح
 
         # ثانيا: تحقق من المستخدمين داخل الشركات
-        active_companies = (
-            Company.query.filter_by(is_archived=False, is_active=True)
-            .order_by(Company.created_at.asc())
-            .all()
-        )
+        # The master-DB user directory names the company (normally exactly one), so
+        # only that tenant's database is queried. Before the directory has been
+        # backfilled (flask user-directory-backfill) fall back to scanning companies.
+        candidates = user_directory.companies_for_login(username)
+        if not candidates and user_directory.is_empty():
+            candidates = (
+                Company.query.filter_by(is_archived=False, is_active=True)
+                .order_by(Company.created_at.asc())
+                .all()
+            )
         from flask import session as flask_session
-        from sqlalchemy import create_engine
-        engines = db.engines  # type: ignore[attr-defined]
-        previous_default = engines.get(None)
-        try:
-            for c in active_companies:
-                engine = engines.get(c.subdomain)
-                if engine is None:
-                    engine = create_engine(c.db_uri, pool_pre_ping=True)
-                    engines[c.subdomain] = engine
-                engines[None] = engine
+        for c in candidates:
+            with tenant_bound(tenant_engines.for_company(c)):
                 user = User.query.filter_by(username=username).first()
                 if user and user.check_password(password):
                     flask_session["company_id"] = c.id
                     login_user(user)
+                    user_directory.mark_login(c.id, user.username, user.phone)
+                    db.session.commit()
                     flash(_("Welcome back, %(user)s", user=user.username), "success")
                     return redirect(url_for("index"))  # ← هنا مدير الشركة أو باقي المستخدمين
-        finally:
-            if previous_default is not None:
-                engines[None] = previous_default
 
         flash(_("Invalid credentials"), "danger")
 
@@ -86,17 +84,10 @@ def company_setup(token: str):
 
     # If an admin already exists in this company's DB, skip setup
     try:
-        from sqlalchemy import create_engine
-        engines = db.engines  # type: ignore[attr-defined]
-        prev_default = engines.get(None)
-        bind_key = company.subdomain
-        if bind_key not in engines:
-            engines[bind_key] = create_engine(company.db_uri, pool_pre_ping=True)
-        engines[None] = engines[bind_key]
-        if User.query.filter_by(role="admin").first():
+        with tenant_bound(tenant_engines.for_company(company)):
+            admin_exists = User.query.filter_by(role="admin").first() is not None
+        if admin_exists:
             flash(_("Setup already completed for this company. Please log in."), "info")
-            if prev_default is not None:
-                engines[None] = prev_default
             return redirect(url_for("auth.login"))
     except Exception:
         # If any error occurs during check, proceed to form
@@ -117,31 +108,21 @@ def company_setup(token: str):
             return render_template("auth/company_setup.html", company=company)
 
         # Bind tenant DB to create the admin user in that company's database
-        from sqlalchemy import create_engine
-        engines = db.engines  # type: ignore[attr-defined]
-        prev_default = engines.get(None)
-        try:
-            bind_key = company.subdomain
-            if bind_key not in engines:
-                engines[bind_key] = create_engine(company.db_uri, pool_pre_ping=True)
-            engines[None] = engines[bind_key]
-
+        with tenant_bound(tenant_engines.for_company(company)):
             # Create admin user if not exists
             existing = User.query.filter_by(username=username).first()
             if existing:
                 flash(_("Username already exists"), "danger")
                 return render_template("auth/company_setup.html", company=company)
 
-            admin = User(username=username, role="admin", phone=phone)
+            admin = User(username=username, role="admin", phone=phone or None)
             admin.set_password(password)
             db.session.add(admin)
+            user_directory.record_user(company.id, username, phone)
             db.session.commit()
 
             flash(_("Admin account created. You can now log in."), "success")
             return redirect(url_for("auth.login"))
-        finally:
-            if prev_default is not None:
-                engines[None] = prev_default
 
     return render_template("auth/company_setup.html", company=company)
 
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, select
+
+from . import accounting, data_version, kpis, posting
+from .extensions import db
+from .models import DataVersion, JournalEntry, JournalLine, Payment
+from .tenant_schema import ensure_schema
+
+
+"""
+Marking many payments paid in one transaction.
+
+The status change is a single ``UPDATE payments ... WHERE <filter>``. The cash
+receipts are queued in the posting outbox with one bulk INSERT, so they post in
+order with any reversal still queued for the same payment (app/posting.py). Tenants
+whose DB predates the outbox get the journal entries and their lines right away,
+with two bulk INSERTs. Payments that already have a receipt are filtered out with
+one chunked lookup (not one per payment); on SQLite/PostgreSQL the unique
+``(source, source_id)`` index with ``ON CONFLICT DO NOTHING`` also covers a receipt
+posted concurrently. On MySQL that index is not unique, so the lookup alone keeps a
+retried call from posting twice.
+
+These are Core statements, so the ORM flush hooks do not see them: the KPI snapshot,
+``account_balances``, the closed-period check and the data version are applied here
+explicitly, in the same transaction.
+"""
+
+# Payment ids per IN (...) clause
+_CHUNK = 500
+
+
+@dataclass(frozen=True)
+class MarkPaidResult:
+    updated: int
+    posted: int
+    # Receipts left to the outbox worker
+    queued: int = 0
+
+
+def _filters(payment_ids: Optional[Iterable[int]], due_through: Optional[date], contract_id: Optional[int]) -> list:
+    filters = [Payment.status != "paid"]
+    if payment_ids is not None:
+        filters.append(Payment.id.in_(sorted({int(i) for i in payment_ids})))
+    if due_through is not None:
+        filters.append(Payment.due_date <= due_through)
+    if contract_id is not None:
+        filters.append(Payment.contract_id == contract_id)
+    return filters
+
+
+def _mark(conn, filters: list, today: date, now: datetime) -> list:
+    """Set the matching payments paid; return their (id, amount, due_date, paid_date) as written."""
+    payments = Payment.__table__
+    paid_date = func.coalesce(payments.c.paid_date, today)
+    stmt = payments.update().where(*filters).values(status="paid", paid_date=paid_date, updated_at=now)
+    if conn.dialect.update_returning:
+        return conn.execute(
+            stmt.returning(payments.c.id, payments.c.amount, payments.c.due_date, payments.c.paid_date)
+        ).all()
+    rows = conn.execute(
+        select(payments.c.id, payments.c.amount, payments.c.due_date, func.coalesce(payments.c.paid_date, today))
+        .where(*filters)
+    ).all()
+    ids = [row[0] for row in rows]
+    for start in range(0, len(ids), _CHUNK):
+        conn.execute(stmt.where(payments.c.id.in_(ids[start:start + _CHUNK])))
+    return rows
+
+
+def _insert_ignoring_duplicates(conn, table):
+    if conn.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+
+        return insert(table).on_conflict_do_nothing()
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        return insert(table).on_conflict_do_nothing()
+    # MySQL's (source, source_id) index is not unique; _post_receipts skips posted ones itself
+    return table.insert()
+
+
+def _already_posted(conn, payment_ids: List[int]) -> set:
+    entries = JournalEntry.__table__
+    posted = set()
+    for start in range(0, len(payment_ids), _CHUNK):
+        posted.update(conn.execute(
+            select(entries.c.source_id).where(
+                entries.c.source == "payment",
+                entries.c.source_id.in_(payment_ids[start:start + _CHUNK]),
+            )
+        ).scalars())
+    return posted
+
+
+def _post_receipts(conn, rows: list, now: datetime) -> List[int]:
+    """Insert one cash-receipt entry per payment (skipping already posted ones); return the new entry ids."""
+    entries = JournalEntry.__table__
+    posted = _already_posted(conn, [row[0] for row in rows])
+    rows = [row for row in rows if row[0] not in posted]
+    if not rows:
+        return []
+    values = [
+        {
+            "date": paid_date,
+            "memo": f"Cash receipt for payment #{payment_id}",
+            "source": "payment",
+            "source_id": payment_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for payment_id, _amount, _due_date, paid_date in rows
+    ]
+    stmt = _insert_ignoring_duplicates(conn, entries)
+    if conn.dialect.insert_executemany_returning:
+        inserted = conn.execute(stmt.returning(entries.c.id, entries.c.source_id), values).all()
+    else:
+        conn.execute(stmt, values)
+        inserted = []
+        ids = [row[0] for row in rows]
+        for start in range(0, len(ids), _CHUNK):
+            inserted += conn.execute(
+                select(entries.c.id, entries.c.source_id).where(
+                    entries.c.source == "payment",
+                    entries.c.source_id.in_(ids[start:start + _CHUNK]),
+                    entries.c.created_at == now,
+                )
+            ).all()
+    if not inserted:
+        return []
+
+    accounts = accounting.default_account_ids()
+    amounts = {payment_id: amount or 0 for payment_id, amount, _due_date, _paid_date in rows}
+    lines = []
+    for entry_id, payment_id in inserted:
+        amount = amounts[payment_id]
+        lines.append({"entry_id": entry_id, "account_id": accounts["cash"], "debit": amount, "credit": 0,
+                      "created_at": now, "updated_at": now})
+        lines.append({"entry_id": entry_id, "account_id": accounts["ar"], "debit": 0, "credit": amount,
+                      "created_at": now, "updated_at": now})
+    conn.execute(JournalLine.__table__.insert(), lines)
+    return [entry_id for entry_id, _payment_id in inserted]
+
+
+def _kpi_deltas(rows: list):
+    """Snapshot change of ``rows`` going from unpaid to paid."""
+    totals, months = defaultdict(Decimal), defaultdict(Decimal)
+    for _payment_id, amount, due_date, paid_date in rows:
+        old = kpis.contribution(Payment, {"status": "unpaid", "amount": amount, "paid_date": None, "due_date": due_date})
+        new = kpis.contribution(Payment, {"status": "paid", "amount": amount, "paid_date": paid_date, "due_date": due_date})
+        for sign, (part_totals, part_months) in ((-1, old), (1, new)):
+            for key, value in part_totals.items():
+                totals[key] += sign * value
+            for key, value in part_months.items():
+                months[key] += sign * value
+    return totals, months
+
+
+def mark_paid(
+    payment_ids: Optional[Iterable[int]] = None,
+    due_through: Optional[date] = None,
+    contract_id: Optional[int] = None,
+    today: Optional[date] = None,
+) -> MarkPaidResult:
+    """Mark the unpaid payments matching every given filter paid, queue their receipts and commit.
+
+    ``paid_date`` defaults to ``today`` and dates the cash receipt. At least one filter
+    is required. Raises ``accounting.PeriodClosedError`` (nothing written) when a
+    receipt would fall into a closed period.
+    """
+    if payment_ids is None and due_through is None and contract_id is None:
+        raise ValueError("Select payments by id, due date or contract")
+    today = today or date.today()
+    now = datetime.utcnow()
+    conn = db.session.connection(bind_arguments={"mapper": Payment.__mapper__})
+    try:
+        rows = _mark(conn, _filters(payment_ids, due_through, contract_id), today, now)
+        if not rows:
+            db.session.rollback()
+            return MarkPaidResult(updated=0, posted=0)
+        closed = accounting.latest_closed()
+        if closed is not None and min(accounting.month_key(row[3]) for row in rows) <= closed.month:
+            raise accounting.PeriodClosedError(f"Period {closed.month} is closed; post with a later date")
+
+        entry_ids, queued = [], 0
+        if posting.has_outbox():
+            posting.enqueue_all(conn, "payment", [row[0] for row in rows])
+            queued = len(rows)
+        else:
+            entry_ids = _post_receipts(conn, rows, now)
+            if accounting.has_snapshot(conn.engine):
+                accounting.apply_entry_sums(conn, entry_ids)
+        if kpis.has_snapshot(conn.engine):
+            kpis.apply_deltas(conn, *_kpi_deltas(rows))
+        if ensure_schema(conn.engine).has_table(DataVersion.__tablename__):
+            data_version.bump(conn)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return MarkPaidResult(updated=len(rows), posted=len(entry_ids), queued=queued)
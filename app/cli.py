@@ -1,9 +1,14 @@
 from datetime import date, timedelta
 import click
 from flask import Flask
-from .extensions import db
+from .extensions import db, tenant_engines, company_cache
+from .tenancy import tenant_bound
+from .tenant_schema import ensure_schema, head_revision, initialize, provision
+from . import user_directory
 from .models import User, Property, Contract, Payment, Account, Company
 from .tenant_manager import TenantManager
+import json
+import os
 import subprocess
 import sys
 
@@ -118,12 +123,7 @@ def register_cli(app: Flask) -> None:
         if not c:
             click.echo("Company not found")
             return
-        from sqlalchemy import create_engine
-        engine = create_engine(c.db_uri, pool_pre_ping=True)
-        engines = db.engines  # type: ignore[attr-defined]
-        prev = engines.get(None)
-        engines[None] = engine
-        try:
+        with tenant_bound(tenant_engines.for_company(c)):
             # Reuse seed logic inline
             if not User.query.filter_by(username="employee").first():
                 u = User(username="employee", email="employee@example.com", role="employee")
@@ -142,6 +142,8 @@ def register_cli(app: Flask) -> None:
                 p2 = Property(title="Villa B", description="Garden", price=2500.00, status="available")
                 db.session.add_all([p1, p2])
                 db.session.flush()
+            for seeded in ("employee", "tenant", "accountant"):
+                user_directory.record_user(c.id, seeded)
             db.session.commit()
             def _get_or_create_account(code: str, name: str, acc_type: str) -> Account:
                 acc = Account.query.filter_by(code=code).first()
@@ -177,41 +179,32 @@ def register_cli(app: Flask) -> None:
                     db.session.add(payment)
                 db.session.commit()
             click.echo(f"Seed data inserted for {subdomain}")
-        finally:
-            if prev is not None:
-                engines[None] = prev
     # --- Tenancy CLI commands ---
     @app.cli.command("tenant-create")
     @click.option("--name", required=True, help="Company display name")
     @click.option("--subdomain", required=True, help="Unique company subdomain key")
-    @click.option("--db-uri", default=None, help="Optional DB URI; default: per-company SQLite")
+    @click.option("--db-uri", default=None, help="Optional DB URI; default: per-company SQLite (or a schema when TENANCY_MODE=schema)")
     def tenant_create(name: str, subdomain: str, db_uri: str | None):
         tm = TenantManager()
-        spec = tm.build_sqlite_uri(subdomain) if not db_uri else None
+        spec = tm.build_uri(
+            subdomain, app.config.get("TENANCY_MODE", "database"), app.config.get("TENANT_SHARED_DATABASE_URI")
+        ) if not db_uri else None
         uri = db_uri or (spec.uri if spec else None)
         if uri is None:
             click.echo("Failed to build DB URI")
             return
         # Ensure master schema exists (companies table)
         try:
-            db.create_all(bind="master")
+            db.create_all(bind_key="master")
         except Exception:
             pass
         # Create master record (Company is bound to 'master')
         c = Company(name=name, subdomain=subdomain, db_uri=uri)
         db.session.add(c)
         db.session.commit()
-        # Ensure DB exists and create schema
-        from sqlalchemy import create_engine
-        engine = create_engine(uri, pool_pre_ping=True)
-        engines = db.engines  # type: ignore[attr-defined]
-        prev = engines.get(None)
-        engines[None] = engine
-        try:
-            db.create_all()
-        finally:
-            if prev is not None:
-                engines[None] = prev
+        company_cache.invalidate(subdomain=subdomain)
+        # Clone the template (SQLite) or create the schema, stamped at the migration head
+        provision(c)
         click.echo(f"Tenant '{name}' created at {uri}")
 
     @app.cli.command("tenant-export")
@@ -226,6 +219,9 @@ def register_cli(app: Flask) -> None:
         if c.db_uri.startswith("sqlite"):
             tm.export_sqlite(c.db_uri, out)
             click.echo(f"Exported to {out}")
+        elif tm.schema_name(c.db_uri):
+            tm.export_schema(c.db_uri, out)
+            click.echo(f"Exported schema {tm.schema_name(c.db_uri)} to {out} (pg_restore format)")
         else:
             click.echo("Use database-native tools to export non-SQLite DBs")
 
@@ -237,12 +233,260 @@ def register_cli(app: Flask) -> None:
             click.echo("Company not found")
             return
         uri = c.db_uri
+        company_id = c.id
         db.session.delete(c)
         db.session.commit()
+        company_cache.invalidate(company_id=company_id, subdomain=subdomain)
+        # Release pooled connections before removing the database file
+        tenant_engines.discard(subdomain)
         tm = TenantManager()
         if uri.startswith("sqlite"):
             tm.delete_sqlite(uri)
             click.echo("Company and SQLite DB removed")
+        elif tm.schema_name(uri):
+            tm.drop_schema(uri)
+            click.echo(f"Company and schema {tm.schema_name(uri)} removed")
         else:
             click.echo("Company removed. Drop the external DB manually.")
 
+    @app.cli.command("user-directory-backfill")
+    @click.option("--workers", default=8, show_default=True, help="Tenant DBs read in parallel")
+    def user_directory_backfill(workers: int):
+        """Build the master-DB username/phone → company directory from every tenant DB."""
+        db.create_all(bind_key="master")
+        companies = Company.query.order_by(Company.id.asc()).all()
+        summary = user_directory.backfill(companies, max_workers=workers)
+        click.echo(f"Indexed {summary['users']} users from {summary['companies']} companies")
+        for subdomain, error in sorted(summary["failed"].items()):
+            click.echo(f"  failed {subdomain}: {error}")
+
+    @app.cli.command("company-stats-refresh")
+    @click.option("--workers", default=None, type=int, help="Default: COMPANY_STATS_WORKERS")
+    @click.option("--timeout", default=None, type=float, help="Seconds per tenant; default: COMPANY_STATS_TIMEOUT")
+    def company_stats_refresh(workers: int | None, timeout: float | None):
+        """Recollect the superadmin dashboard snapshot for every company (e.g. from cron)."""
+        from . import company_stats
+        db.create_all(bind_key="master")
+        results = company_stats.refresh(
+            Company.query.all(),
+            max_workers=workers or app.config["COMPANY_STATS_WORKERS"],
+            timeout=timeout or app.config["COMPANY_STATS_TIMEOUT"],
+        )
+        failed = {cid: r["error"] for cid, r in results.items() if "error" in r}
+        click.echo(f"Refreshed {len(results) - len(failed)} companies, {len(failed)} failed")
+        for cid, error in sorted(failed.items()):
+            click.echo(f"  company {cid}: {error}")
+
+    @app.cli.command("tenant-template")
+    @click.option("--rebuild", is_flag=True, help="Discard the current template and build it again")
+    def tenant_template(rebuild: bool):
+        """Build the SQLite template new tenants are cloned from."""
+        head = head_revision()
+        if head is None:
+            click.echo("No migration head found")
+            return
+        tm = TenantManager()
+        path = tm.template_path(head)
+        if rebuild and os.path.exists(path):
+            os.remove(path)
+        tm.ensure_sqlite_template(head, lambda engine: initialize(engine, head))
+        click.echo(f"Template at revision {head}: {path}")
+
+    @app.cli.command("tenant-migrate-all")
+    @click.option("--workers", default=None, type=int, help="Worker processes; default: TENANT_MIGRATE_WORKERS")
+    @click.option("--dry-run", is_flag=True, help="Only report pending revisions per tenant")
+    @click.option("--subdomain", "subdomains", multiple=True, help="Only these companies (repeatable)")
+    @click.option("--stamp-unversioned", default=None,
+                  help="Revision to stamp tenants that have tables but no alembic_version before upgrading")
+    def tenant_migrate_all(workers: int | None, dry_run: bool, subdomains: tuple, stamp_unversioned: str | None):
+        """Upgrade every tenant database to the migration head in parallel."""
+        from .tenant_migrations import migrate_all
+        q = Company.query.order_by(Company.subdomain.asc())
+        if subdomains:
+            q = q.filter(Company.subdomain.in_(subdomains))
+        companies = q.all()
+        click.echo(f"{'subdomain':<20}{'status':<13}{'from':<15}{'to':<15}{'pending':>8}{'seconds':>9}")
+
+        def _row(r: dict) -> None:
+            duration = "" if r.get("duration") is None else f"{r['duration']:.2f}"
+            click.echo(
+                f"{r['subdomain']:<20}{r['status']:<13}{r['from'] or '-':<15}{r['to'] or '-':<15}"
+                f"{r['pending']:>8}{duration:>9}"
+            )
+            if r.get("error"):
+                click.echo(f"  error: {r['error']}")
+
+        summary = migrate_all(
+            companies,
+            workers=workers or app.config["TENANT_MIGRATE_WORKERS"],
+            dry_run=dry_run,
+            stamp_unversioned=stamp_unversioned,
+            on_result=_row,
+        )
+        click.echo(json.dumps(summary, indent=2, default=str))
+        if summary["failed"]:
+            sys.exit(1)
+
+    @app.cli.command("tenant-pragmas")
+    @click.option("--subdomain", default=None, help="Only this company (default: all)")
+    def tenant_pragmas(subdomain: str | None):
+        """Report the effective SQLite pragmas of each tenant database."""
+        from .sqlite_profile import PRAGMA_NAMES, read_pragmas
+        q = Company.query.order_by(Company.subdomain.asc())
+        if subdomain:
+            q = q.filter_by(subdomain=subdomain)
+        click.echo("subdomain".ljust(20) + "".join(name.ljust(14) for name in PRAGMA_NAMES))
+        for c in q.all():
+            if not c.db_uri.startswith("sqlite"):
+                click.echo(c.subdomain.ljust(20) + "(not SQLite)")
+                continue
+            try:
+                with tenant_engines.for_company(c).connect() as conn:
+                    values = read_pragmas(conn)
+            except Exception as exc:
+                click.echo(c.subdomain.ljust(20) + f"error: {exc}")
+                continue
+            click.echo(c.subdomain.ljust(20) + "".join(str(values[name]).ljust(14) for name in PRAGMA_NAMES))
+
+    def _rebuild_snapshots(module, subdomain: str | None, check: bool) -> None:
+        """Recompute (or with ``check`` only verify) a per-tenant snapshot kept by ``module``."""
+        q = Company.query.order_by(Company.subdomain.asc())
+        if subdomain:
+            q = q.filter_by(subdomain=subdomain)
+        drifted = 0
+        for c in q.all():
+            try:
+                engine = tenant_engines.for_company(c)
+                if not module.has_snapshot(engine):
+                    click.echo(f"{c.subdomain}: no snapshot tables (run migrations)")
+                    continue
+                if check:
+                    with engine.connect() as conn:
+                        mismatches = module.diff(module.compute(conn), module.read(conn))
+                else:
+                    mismatches = module.rebuild(engine)
+            except Exception as exc:
+                drifted += 1
+                click.echo(f"{c.subdomain}: error: {exc}")
+                continue
+            if mismatches:
+                drifted += 1
+                click.echo(f"{c.subdomain}: {len(mismatches)} mismatches")
+                for key, (expected, actual) in sorted(mismatches.items()):
+                    click.echo(f"  {key}: expected {expected}, snapshot {actual}")
+            else:
+                click.echo(f"{c.subdomain}: ok" if check else f"{c.subdomain}: rebuilt")
+        if drifted:
+            sys.exit(1)
+
+    @app.cli.command("tenant-rebuild-kpis")
+    @click.option("--subdomain", default=None, help="Only this company (default: all)")
+    @click.option("--check", is_flag=True, help="Only compare the snapshot with a fresh computation")
+    def tenant_rebuild_kpis(subdomain: str | None, check: bool):
+        """Recompute the dashboard KPI snapshot (tenant_kpis, monthly_rollups) of each tenant."""
+        from . import kpis
+        _rebuild_snapshots(kpis, subdomain, check)
+
+    @app.cli.command("tenant-rebuild-balances")
+    @click.option("--subdomain", default=None, help="Only this company (default: all)")
+    @click.option("--check", is_flag=True, help="Only compare account_balances with a full recompute")
+    def tenant_rebuild_balances(subdomain: str | None, check: bool):
+        """Recompute the materialized per-account monthly balances (account_balances) of each tenant."""
+        from . import accounting
+        _rebuild_snapshots(accounting, subdomain, check)
+
+    @app.cli.command("payments-mark-paid")
+    @click.option("--subdomain", required=True)
+    @click.option("--id", "payment_ids", type=int, multiple=True, help="Payment id (repeatable)")
+    @click.option("--due-through", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+                  help="Unpaid payments due on or before this date")
+    @click.option("--contract-id", type=int, default=None)
+    def payments_mark_paid(subdomain: str, payment_ids: tuple, due_through, contract_id: int | None):
+        """Mark matching unpaid payments paid and queue (or post) their cash receipts in one transaction."""
+        from . import bulk_payments
+        from .accounting import PeriodClosedError
+
+        if not (payment_ids or due_through or contract_id):
+            raise click.UsageError("Give --id, --due-through and/or --contract-id")
+        c = Company.query.filter_by(subdomain=subdomain).first()
+        if not c:
+            click.echo("Company not found")
+            return
+        engine = tenant_engines.for_company(c)
+        ensure_schema(engine)
+        with tenant_bound(engine):
+            try:
+                result = bulk_payments.mark_paid(
+                    payment_ids=payment_ids or None,
+                    due_through=due_through.date() if due_through else None,
+                    contract_id=contract_id,
+                )
+            except PeriodClosedError as exc:
+                raise click.ClickException(str(exc))
+        click.echo(
+            f"{subdomain}: {result.updated} payments marked paid, {result.posted} cash receipts posted, "
+            f"{result.queued} queued for posting"
+        )
+
+    @app.cli.command("period-close")
+    @click.option("--subdomain", required=True)
+    @click.option("--month", required=True, help="Month to close, YYYY-MM (earlier open months close with it)")
+    def period_close(subdomain: str, month: str):
+        """Close a fiscal period: store closing balances and lock postings up to the month end."""
+        from .accounting import close_period
+
+        c = Company.query.filter_by(subdomain=subdomain).first()
+        if not c:
+            click.echo("Company not found")
+            return
+        engine = tenant_engines.for_company(c)
+        ensure_schema(engine)
+        with tenant_bound(engine):
+            try:
+                period = close_period(month, closed_by="cli")
+            except ValueError as exc:
+                db.session.rollback()
+                raise click.ClickException(str(exc))
+            click.echo(f"{subdomain}: closed {period.month} ({len(period.closing_balances)} account balances)")
+
+    @app.cli.command("posting-worker")
+    @click.option("--subdomain", default=None, help="Only drain this company (default: all active)")
+    @click.option("--once", is_flag=True, help="Drain what is due and exit")
+    @click.option("--interval", type=float, default=5.0, show_default=True, help="Seconds between passes")
+    def posting_worker(subdomain: str | None, once: bool, interval: float):
+        """Drain the journal posting outbox of every active tenant (run one per deployment)."""
+        import time
+        from .posting import drain_tenant
+
+        while True:
+            q = Company.query.filter_by(is_active=True, is_archived=False)
+            if subdomain:
+                q = q.filter_by(subdomain=subdomain)
+            companies = q.order_by(Company.id).all()
+            db.session.remove()
+            for c in companies:
+                try:
+                    engine = tenant_engines.for_company(c)
+                    ensure_schema(engine)
+                    with tenant_bound(engine):
+                        counts = drain_tenant()
+                except Exception as exc:  # keep draining the other tenants
+                    db.session.rollback()
+                    click.echo(f"{c.subdomain}: {exc}", err=True)
+                    continue
+                finally:
+                    db.session.remove()
+                if counts["done"] or counts["retried"] or counts["failed"]:
+                    click.echo(
+                        f"{c.subdomain}: {counts['done']} posted, {counts['retried']} to retry, {counts['failed']} failed"
+                    )
+            if once:
+                return
+            time.sleep(interval)
+
+    @app.cli.command("tenant-engine-stats")
+    def tenant_engine_stats():
+        """Print the tenant engine registry settings and counters for this process."""
+        for key, value in tenant_engines.stats().items():
+            click.echo(f"{key}: {value}")
+
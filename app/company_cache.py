@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class CompanyRecord:
+    """Detached, read-only snapshot of a master-DB Company row."""
+
+    id: int
+    name: str
+    subdomain: str
+    db_uri: str
+    logo_path: Optional[str]
+    primary_color: Optional[str]
+    secondary_color: Optional[str]
+    font_family: Optional[str]
+    is_active: bool
+    is_archived: bool
+
+    @classmethod
+    def from_company(cls, company) -> "CompanyRecord":
+        return cls(
+            id=company.id,
+            name=company.name,
+            subdomain=company.subdomain,
+            db_uri=company.db_uri,
+            logo_path=company.logo_path,
+            primary_color=company.primary_color,
+            secondary_color=company.secondary_color,
+            font_family=company.font_family,
+            is_active=bool(company.is_active),
+            is_archived=bool(company.is_archived),
+        )
+
+
+class CompanyCache:
+    """
+    In-process TTL cache of Company records, keyed by id and by subdomain.
+
+    - Shared by the theming and tenant-binding request hooks
+    - Entries expire after ``ttl`` seconds; writers call ``invalidate()`` explicitly
+    - Each worker process has its own cache, so other workers see edits after ``ttl``
+    """
+
+    def __init__(self, ttl: float = 60.0) -> None:
+        self.ttl = ttl
+        self._by_id: Dict[int, Tuple[float, CompanyRecord]] = {}
+        self._id_by_subdomain: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app) -> None:
+        self.ttl = float(app.config.get("COMPANY_CACHE_TTL", self.ttl))
+        app.extensions["company_cache"] = self
+
+    def get(self, company_id: int) -> Optional[CompanyRecord]:
+        try:
+            company_id = int(company_id)
+        except (TypeError, ValueError):
+            return None
+        record = self._lookup(company_id)
+        if record is not None:
+            return record
+        from .models import Company
+
+        return self._store(Company.query.get(company_id))
+
+    def get_by_subdomain(self, subdomain: str) -> Optional[CompanyRecord]:
+        with self._lock:
+            company_id = self._id_by_subdomain.get(subdomain)
+        if company_id is not None:
+            record = self._lookup(company_id)
+            if record is not None:
+                return record
+        else:
+            with self._lock:
+                self.misses += 1
+        from .models import Company
+
+        return self._store(Company.query.filter_by(subdomain=subdomain).first())
+
+    def put(self, company) -> Optional[CompanyRecord]:
+        """Cache a Company already loaded by the caller (e.g. a full registry scan)."""
+        return self._store(company)
+
+    def invalidate(self, company_id: Optional[int] = None, subdomain: Optional[str] = None) -> None:
+        with self._lock:
+            if subdomain is not None and company_id is None:
+                company_id = self._id_by_subdomain.get(subdomain)
+            if company_id is None:
+                return
+            entry = self._by_id.pop(int(company_id), None)
+            if entry is not None:
+                self._id_by_subdomain.pop(entry[1].subdomain, None)
+            if subdomain is not None:
+                self._id_by_subdomain.pop(subdomain, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_id.clear()
+            self._id_by_subdomain.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._by_id),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # --- internals ---
+
+    def _lookup(self, company_id: int) -> Optional[CompanyRecord]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._by_id.get(company_id)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._by_id.pop(company_id, None)
+                self._id_by_subdomain.pop(entry[1].subdomain, None)
+            self.misses += 1
+            return None
+
+    def _store(self, company) -> Optional[CompanyRecord]:
+        if company is None:
+            return None
+        record = CompanyRecord.from_company(company)
+        with self._lock:
+            self._by_id[record.id] = (time.monotonic(), record)
+            self._id_by_subdomain[record.subdomain] = record.id
+        return record
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import func, inspect as sa_inspect, select
+
+from .extensions import db, tenant_engines
+from .tenant_engines import tenant_schema_of
+from .models import Company, CompanyStats, Contract, Property, User
+from .tenant_schema import schema_state
+
+
+"""
+Cross-tenant statistics for the superadmin dashboard.
+
+Counts are collected concurrently (bounded daemon worker threads, per-tenant time budget) and
+stored in the master-DB ``company_stats`` snapshot table. The dashboard renders from
+the snapshot and asks for stale rows to be refreshed in a background thread.
+"""
+
+_refresh_lock = threading.Lock()
+_refreshing: set = set()
+
+
+def collect(subdomain: str, db_uri: str) -> dict:
+    """Count properties, tenants and contracts in one tenant DB (any dialect)."""
+    engine = tenant_engines.get(subdomain, db_uri)
+    counts = {"properties": 0, "tenants": 0, "contracts": 0}
+    with engine.connect() as conn:
+        state = schema_state(engine)
+        tables = state.tables if state is not None else set(sa_inspect(conn).get_table_names(schema=tenant_schema_of(engine)))
+        if "properties" in tables:
+            counts["properties"] = conn.execute(select(func.count()).select_from(Property.__table__)).scalar() or 0
+        if "users" in tables:
+            users = User.__table__
+            counts["tenants"] = conn.execute(
+                select(func.count()).select_from(users).where(users.c.role == "tenant")
+            ).scalar() or 0
+        if "contracts" in tables:
+            counts["contracts"] = conn.execute(select(func.count()).select_from(Contract.__table__)).scalar() or 0
+    return counts
+
+
+def refresh(companies: Iterable[Company], max_workers: int = 8, timeout: float = 10.0) -> dict:
+    """Collect stats for ``companies`` in parallel and store them in the snapshot table.
+
+    Each tenant gets ``timeout`` seconds from the moment a worker starts on it. A tenant
+    that has not answered by then is recorded with ``error="timeout"`` and keeps its
+    previous counts; its worker is written off and replaced, so the tenants after it
+    still get their full budget. Workers are daemon threads, so one stuck on a hung
+    tenant never keeps the process from exiting.
+    """
+    targets = [(c.id, c.subdomain, c.db_uri) for c in companies]
+    results: dict = {}
+    if not targets:
+        return results
+    todo: "queue.Queue[tuple]" = queue.Queue()
+    for target in targets:
+        todo.put(target)
+    answers: "queue.Queue[tuple]" = queue.Queue()
+    started: dict = {}
+    lock = threading.Lock()
+
+    def work() -> None:
+        while True:
+            try:
+                cid, sub, uri = todo.get_nowait()
+            except queue.Empty:
+                return
+            with lock:
+                started[cid] = time.monotonic()
+            try:
+                answers.put((cid, collect(sub, uri)))
+            except Exception as exc:
+                answers.put((cid, {"error": str(exc)[:255]}))
+
+    def spawn() -> None:
+        threading.Thread(target=work, name="company-stats", daemon=True).start()
+
+    for _ in range(max(1, min(max_workers, len(targets)))):
+        spawn()
+    while len(results) < len(targets):
+        with lock:
+            running = {cid: at for cid, at in started.items() if cid not in results}
+        deadline = min(running.values(), default=time.monotonic()) + timeout
+        try:
+            cid, data = answers.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            now = time.monotonic()
+            for cid, at in running.items():
+                if now - at >= timeout:
+                    results[cid] = {"error": "timeout"}
+                    spawn()
+            continue
+        # A late answer from a tenant already recorded as timed out is dropped
+        results.setdefault(cid, data)
+    _store(results)
+    return results
+
+
+def snapshot(companies: List[Company], max_age: timedelta) -> Tuple[List[dict], List[int]]:
+    """Dashboard rows from the snapshot table, plus ids of missing or stale rows."""
+    now = datetime.utcnow()
+    rows, stale = [], []
+    for c in companies:
+        snap = c.stats_snapshot
+        if snap is None or snap.refreshed_at is None or now - snap.refreshed_at > max_age:
+            stale.append(c.id)
+        rows.append({
+            "company": c,
+            "properties": snap.properties if snap else 0,
+            "tenants": snap.tenants if snap else 0,
+            "contracts": snap.contracts if snap else 0,
+            "refreshed_at": snap.refreshed_at if snap else None,
+            "error": snap.error if snap else None,
+        })
+    return rows, stale
+
+
+def refresh_in_background(app, company_ids: List[int]) -> bool:
+    """Refresh ``company_ids`` on a daemon thread unless a refresh is already running."""
+    with _refresh_lock:
+        pending = [cid for cid in company_ids if cid not in _refreshing]
+        if not pending:
+            return False
+        _refreshing.update(pending)
+
+    def _run() -> None:
+        try:
+            with app.app_context():
+                try:
+                    companies = Company.query.filter(Company.id.in_(pending)).all()
+                    refresh(
+                        companies,
+                        max_workers=app.config.get("COMPANY_STATS_WORKERS", 8),
+                        timeout=app.config.get("COMPANY_STATS_TIMEOUT", 10),
+                    )
+                finally:
+                    db.session.remove()
+        except Exception:
+            app.logger.exception("Background company stats refresh failed")
+        finally:
+            with _refresh_lock:
+                _refreshing.difference_update(pending)
+
+    threading.Thread(target=_run, name="company-stats-refresh", daemon=True).start()
+    return True
+
+
+def _store(results: dict) -> None:
+    now = datetime.utcnow()
+    existing = {s.company_id: s for s in CompanyStats.query.filter(CompanyStats.company_id.in_(list(results)))}
+    for cid, data in results.items():
+        snap = existing.get(cid)
+        if snap is None:
+            snap = CompanyStats(company_id=cid)
+            db.session.add(snap)
+        if "error" in data:
+            snap.error = data["error"]
+        else:
+            snap.properties = data["properties"]
+            snap.tenants = data["tenants"]
+            snap.contracts = data["contracts"]
+            snap.error = None
+        snap.refreshed_at = now
+    db.session.commit()
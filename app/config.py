@@ -24,6 +24,74 @@ class Config:
         os.path.join(os.path.dirname(__file__), "..", "companies")
     )
 
+    # Tenancy mode: "database" (one DB per company, SQLite by default) or "schema"
+    # (one PostgreSQL schema per company inside TENANT_SHARED_DATABASE_URI; all
+    # tenants share a single engine/pool of POOL_SIZE + MAX_OVERFLOW connections)
+    TENANCY_MODE = os.getenv("TENANCY_MODE", "database")
+    TENANT_SHARED_DATABASE_URI = os.getenv("TENANT_SHARED_DATABASE_URI")
+    TENANT_SHARED_POOL_SIZE = int(os.getenv("TENANT_SHARED_POOL_SIZE", "10"))
+    TENANT_SHARED_MAX_OVERFLOW = int(os.getenv("TENANT_SHARED_MAX_OVERFLOW", "20"))
+
+    # Per-company engine registry: max engines kept per worker, and idle seconds
+    # after which an engine's pool is closed until next use (0 disables hibernation)
+    TENANT_ENGINE_MAX_SIZE = int(os.getenv("TENANT_ENGINE_MAX_SIZE", "64"))
+    TENANT_ENGINE_IDLE_TIMEOUT = int(os.getenv("TENANT_ENGINE_IDLE_TIMEOUT", "1800"))
+    # Background reaper: every INTERVAL seconds (0 disables) hibernate idle engines and keep
+    # the pooled connections of all tenants at or below MAX_CONNECTIONS (0 = no cap)
+    TENANT_ENGINE_REAPER_INTERVAL = int(os.getenv("TENANT_ENGINE_REAPER_INTERVAL", "60"))
+    TENANT_ENGINE_MAX_CONNECTIONS = int(os.getenv("TENANT_ENGINE_MAX_CONNECTIONS", "256"))
+
+    # Seconds a worker may serve a cached Company record before re-reading master
+    COMPANY_CACHE_TTL = int(os.getenv("COMPANY_CACHE_TTL", "60"))
+
+    # SQLite profile applied to every SQLite tenant/master connection (empty value skips
+    # a pragma). cache_size < 0 is KiB; busy_timeout is ms. PRAGMA optimize runs on close.
+    SQLITE_PRAGMAS = {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-20000"),
+        "mmap_size": os.getenv("SQLITE_MMAP_SIZE", "268435456"),
+        "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+        "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT", "5000"),
+    }
+    SQLITE_OPTIMIZE_ON_CLOSE = os.getenv("SQLITE_OPTIMIZE_ON_CLOSE", "1") == "1"
+
+    # Clone new SQLite tenants from a pre-built template at the migration head
+    TENANT_TEMPLATE_ENABLED = os.getenv("TENANT_TEMPLATE_ENABLED", "1") == "1"
+
+    # Superadmin dashboard stats snapshot: refresh rows older than MAX_AGE seconds
+    # using up to WORKERS threads and TIMEOUT seconds per tenant
+    COMPANY_STATS_MAX_AGE = int(os.getenv("COMPANY_STATS_MAX_AGE", "300"))
+    COMPANY_STATS_WORKERS = int(os.getenv("COMPANY_STATS_WORKERS", "8"))
+    COMPANY_STATS_TIMEOUT = float(os.getenv("COMPANY_STATS_TIMEOUT", "10"))
+
+    # Worker warm-up (gunicorn.conf.py): preload engines for the N most recently
+    # active companies, compile templates and load translations at worker boot
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "0") == "1"
+    WARMUP_COMPANIES = int(os.getenv("WARMUP_COMPANIES", "20"))
+
+    # Journal lines per page of the general ledger (keyset pagination)
+    LEDGER_PAGE_SIZE = int(os.getenv("LEDGER_PAGE_SIZE", "100"))
+    # Unpaid payments per page of the AR aging report
+    AR_AGING_PAGE_SIZE = int(os.getenv("AR_AGING_PAGE_SIZE", "50"))
+
+    # Journal posting outbox: drained by one `flask posting-worker` process. WORKER_ENABLED
+    # also starts a drain thread in each web process, woken by its own commits, that every
+    # SWEEP_INTERVAL seconds sweeps the tenants that process has served. Failed tasks retry
+    # after RETRY_DELAY * 2^(attempt-1) seconds; claims expire after LEASE seconds.
+    POSTING_WORKER_ENABLED = os.getenv("POSTING_WORKER_ENABLED", "0") == "1"
+    POSTING_SWEEP_INTERVAL = int(os.getenv("POSTING_SWEEP_INTERVAL", "300"))
+    POSTING_BATCH_SIZE = int(os.getenv("POSTING_BATCH_SIZE", "100"))
+    POSTING_MAX_ATTEMPTS = int(os.getenv("POSTING_MAX_ATTEMPTS", "5"))
+    POSTING_RETRY_DELAY = int(os.getenv("POSTING_RETRY_DELAY", "30"))
+    POSTING_LEASE = int(os.getenv("POSTING_LEASE", "120"))
+
+    # Bytes of a finished Excel export kept in memory before spilling to a temp file
+    EXPORT_SPOOL_MAX_SIZE = int(os.getenv("EXPORT_SPOOL_MAX_SIZE", str(8 * 1024 * 1024)))
+
+    # Worker processes used by `flask tenant-migrate-all`
+    TENANT_MIGRATE_WORKERS = int(os.getenv("TENANT_MIGRATE_WORKERS", "4"))
+
     # Base directory to store user uploads; served via /uploads/<filename>
     UPLOAD_FOLDER = os.getenv(
         "UPLOAD_FOLDER",
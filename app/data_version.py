@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import date, datetime
+from functools import wraps
+from typing import Optional
+
+from flask import current_app, g, make_response, request, session
+from flask_babel import get_locale
+from flask_login import current_user
+from sqlalchemy import event, select
+
+from .extensions import db
+from .models import DataVersion
+from .tenant_schema import ensure_schema, schema_state
+
+
+"""
+Per-tenant data version and conditional GET.
+
+``data_versions`` holds one counter per tenant DB. Any ORM flush that writes tenant
+tables bumps it in the same transaction, so a committed change is always visible as
+a new version and a rolled back one never is. ``conditional_get`` turns the counter
+into an ETag (together with user, locale, company theme, date and URL) and answers a
+matching ``If-None-Match`` with 304 before the view runs its queries.
+
+Writes that bypass the ORM (Core/bulk statements) must call ``bump`` themselves.
+"""
+
+
+def bump(conn) -> None:
+    """Increment the data version on ``conn`` (inside its transaction)."""
+    versions = DataVersion.__table__
+    now = datetime.utcnow()
+    result = conn.execute(
+        versions.update().where(versions.c.id == 1).values(version=versions.c.version + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        conn.execute(versions.insert().values(id=1, version=1, updated_at=now))
+
+
+def current_version() -> Optional[int]:
+    """Data version of the bound tenant; ``None`` when its DB predates ``data_versions``."""
+    engine = db.session.get_bind(mapper=DataVersion.__mapper__)
+    state = schema_state(engine)
+    if state is None or not state.has_table(DataVersion.__tablename__):
+        return None
+    return db.session.execute(select(DataVersion.version).where(DataVersion.id == 1)).scalar() or 0
+
+
+def _tenant_object(obj) -> bool:
+    table = getattr(type(obj), "__table__", None)
+    return table is not None and table.metadata is db.metadatas[None] and table is not DataVersion.__table__
+
+
+@event.listens_for(db.session, "after_flush")
+def _bump_on_flush(session, _flush_context):
+    if not any(_tenant_object(obj) for obj in (*session.new, *session.dirty, *session.deleted)):
+        return
+    conn = session.connection(bind_arguments={"mapper": DataVersion.__mapper__})
+    if ensure_schema(conn.engine).has_table(DataVersion.__tablename__):
+        bump(conn)
+
+
+def etag_for(version: int) -> str:
+    theme = g.get("company_theme") or {}
+    parts = (
+        version,
+        current_user.get_id() if current_user.is_authenticated else "",
+        str(get_locale() or ""),
+        session.get("company_id") or "",
+        tuple(sorted(theme.items())),
+        # Pages flag overdue/upcoming items relative to today
+        date.today().isoformat(),
+        request.full_path,
+    )
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def conditional_get(view):
+    """Serve GET/HEAD with an ETag from the tenant data version; 304 when unchanged.
+
+    Apply below ``login_required``/role checks so they run first. Requests with
+    pending flash messages always render (the cached page would not show them).
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method not in ("GET", "HEAD") or session.get("_flashes"):
+            return view(*args, **kwargs)
+        version = current_version()
+        if version is None:
+            return view(*args, **kwargs)
+        etag = etag_for(version)
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
+        return response
+
+    return wrapper
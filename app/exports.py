@@ -0,0 +1,70 @@
+"""Excel exports streamed from the database.
+
+Rows come from a Core ``select`` read ``yield_per`` rows at a time and go straight
+into a write-only openpyxl workbook, which keeps each sheet in a temporary file
+rather than as cell objects in memory. The finished file is written to a
+``SpooledTemporaryFile``. It stays in memory up to ``EXPORT_SPOOL_MAX_SIZE`` bytes
+and moves to disk after that. ``send_file`` then streams it to the client in chunks.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from typing import Iterable, Sequence
+
+from flask import current_app, send_file
+from openpyxl import Workbook
+from sqlalchemy import select
+
+from .extensions import db
+from .models import Expense, Invoice, Payment
+
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Rows fetched per round trip
+_BATCH = 2000
+
+
+def send_xlsx(download_name: str, title: str, header: Sequence[str], rows: Iterable[Sequence]):
+    """Write ``rows`` under ``header`` to a one-sheet workbook and send it as an attachment."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(list(header))
+    for row in rows:
+        ws.append(row)
+    spool = tempfile.SpooledTemporaryFile(max_size=current_app.config.get("EXPORT_SPOOL_MAX_SIZE", 8 * 1024 * 1024))
+    wb.save(spool)
+    spool.seek(0)
+    return send_file(spool, as_attachment=True, download_name=download_name, mimetype=XLSX_MIMETYPE)
+
+
+def _stream(query):
+    return db.session.execute(query.execution_options(yield_per=_BATCH))
+
+
+def payment_rows():
+    query = select(
+        Payment.id, Payment.contract_id, Payment.amount, Payment.due_date, Payment.paid_date, Payment.method, Payment.status
+    ).order_by(Payment.due_date.asc(), Payment.id.asc())
+    for id_, contract_id, amount, due_date, paid_date, method, status in _stream(query):
+        yield [id_, contract_id, float(amount), str(due_date), str(paid_date or ""), method or "", status]
+
+
+def invoice_rows():
+    query = (
+        select(Payment.id, Invoice.id, Payment.due_date, Payment.amount, Payment.status, Invoice.file_path)
+        .join(Invoice, Payment.id == Invoice.payment_id, isouter=True)
+        .order_by(Payment.due_date.desc(), Payment.id.desc())
+    )
+    for payment_id, invoice_id, due_date, amount, status, file_path in _stream(query):
+        has_invoice = invoice_id is not None
+        yield [payment_id, "yes" if has_invoice else "no", str(due_date), float(amount), status, (file_path if has_invoice else "")]
+
+
+def expense_rows():
+    query = select(
+        Expense.id, Expense.spent_at, Expense.description, Expense.category, Expense.vendor, Expense.amount
+    ).order_by(Expense.spent_at.desc(), Expense.id.desc())
+    for id_, spent_at, description, category, vendor, amount in _stream(query):
+        yield [id_, str(spent_at), description, category or "", vendor or "", float(amount)]
@@ -1,19 +1,26 @@
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_babel import Babel
+from .company_cache import CompanyCache
+from .tenancy import TenantSQLAlchemy
+from .tenant_engines import TenantEngineRegistry
 
 
 """
 Application extensions.
 
 db: Single SQLAlchemy instance with multiple binds.
-- Default bind (None) points to the active TENANT database; switched per-request
-  in the app.before_request hook.
+- Default bind (None) points to the active TENANT database; resolved per request
+  from flask.g (see app/tenancy.py), set in the app.before_request hook.
 - Named bind 'master' points to the MASTER database (companies registry).
+
+tenant_engines: Bounded LRU registry of per-company engines, keyed by subdomain.
+company_cache: TTL cache of master-DB Company records used by the request hooks.
 """
 
-db = SQLAlchemy()
+db = TenantSQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
 babel = Babel()
+tenant_engines = TenantEngineRegistry()
+company_cache = CompanyCache()
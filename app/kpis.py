@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, func, inspect as sa_inspect, select
+
+from .extensions import db
+from .models import Complaint, Contract, Expense, MaintenanceRequest, MonthlyRollup, Payment, TenantKpi
+from .reporting import month_key
+from .tenant_schema import ensure_schema
+
+
+"""
+Incrementally maintained dashboard snapshot (tenant DB).
+
+``tenant_kpis`` holds running totals/counters and ``monthly_rollups`` the monthly
+income/expense series. Both are updated in the same transaction as the ORM writes
+that change them: ``before_flush`` records the contribution of rows as they were in
+the database, ``after_flush`` adds the contribution of rows as written, and the
+difference is applied with ``UPDATE ... SET value = value + :delta``.
+
+Bulk ``Query.update()``/Core statements bypass the hooks; callers must use
+``apply_deltas`` themselves or run ``flask tenant-rebuild-kpis``.
+"""
+
+# Attributes each tracked model contributes from (old values are captured for these)
+TRACKED = {
+    Payment: ("amount", "status", "paid_date", "due_date"),
+    Expense: ("amount", "spent_at"),
+    Contract: ("status",),
+    MaintenanceRequest: ("status",),
+    Complaint: ("status",),
+}
+
+Totals = Dict[str, Decimal]
+Months = Dict[Tuple[str, str], Decimal]
+
+
+def _money(value) -> Decimal:
+    if value is None or value == "":
+        return Decimal("0")
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def contribution(cls, values) -> Tuple[Totals, Months]:
+    """What one row with ``values`` (attribute → value) adds to the snapshot."""
+    totals: Totals = defaultdict(Decimal)
+    months: Months = defaultdict(Decimal)
+    if cls is Payment:
+        if values["status"] == "paid":
+            amount = _money(values["amount"])
+            totals["total_income"] += amount
+            totals["paid_count"] += 1
+            month = month_key(values["paid_date"] or values["due_date"])
+            if month:
+                months[(month, "income")] += amount
+        else:
+            totals["unpaid_count"] += 1
+    elif cls is Expense:
+        amount = _money(values["amount"])
+        totals["total_expenses"] += amount
+        month = month_key(values["spent_at"])
+        if month:
+            months[(month, "expenses")] += amount
+    elif cls is Contract:
+        totals["contracts_total"] += 1
+        if values["status"] == "active":
+            totals["contracts_active"] += 1
+    elif cls is MaintenanceRequest:
+        totals[f"maint_{values['status'] or 'new'}"] += 1
+    elif cls is Complaint:
+        totals[f"comp_{values['status'] or 'new'}"] += 1
+    return totals, months
+
+
+def apply_deltas(conn, totals: Totals, months: Months) -> None:
+    """Add ``totals``/``months`` to the snapshot rows on ``conn`` (inside its transaction)."""
+    kpis = TenantKpi.__table__
+    rollups = MonthlyRollup.__table__
+    now = datetime.utcnow()
+    for key, delta in totals.items():
+        if not delta:
+            continue
+        result = conn.execute(
+            kpis.update().where(kpis.c.key == key).values(value=kpis.c.value + delta, updated_at=now)
+        )
+        if result.rowcount == 0:
+            conn.execute(kpis.insert().values(key=key, value=delta, updated_at=now))
+    by_month: Dict[str, Dict[str, Decimal]] = defaultdict(dict)
+    for (month, column), delta in months.items():
+        if delta:
+            by_month[month][column] = delta
+    for month, deltas in by_month.items():
+        result = conn.execute(
+            rollups.update()
+            .where(rollups.c.month == month)
+            .values(updated_at=now, **{col: rollups.c[col] + d for col, d in deltas.items()})
+        )
+        if result.rowcount == 0:
+            conn.execute(rollups.insert().values(month=month, updated_at=now, **deltas))
+
+
+def has_snapshot(engine) -> bool:
+    state = ensure_schema(engine)
+    return state.has_table(TenantKpi.__tablename__) and state.has_table(MonthlyRollup.__tablename__)
+
+
+# --- ORM hooks ---
+
+
+def _merge(target: Tuple[Totals, Months], part: Tuple[Totals, Months], sign: int) -> None:
+    for key, value in part[0].items():
+        target[0][key] += sign * value
+    for key, value in part[1].items():
+        target[1][key] += sign * value
+
+
+def _current_values(obj) -> dict:
+    return {name: getattr(obj, name) for name in TRACKED[type(obj)]}
+
+
+def _stored_values(session, obj) -> dict:
+    """Values of ``obj``'s row as currently stored (before this flush writes it)."""
+    state = sa_inspect(obj)
+    names = TRACKED[type(obj)]
+    values, missing = {}, []
+    for name in names:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        elif not history.added:
+            values[name] = getattr(obj, name)
+        else:
+            # Assigned without the old value being loaded: read it from the row
+            missing.append(name)
+    if missing:
+        cls = type(obj)
+        table = cls.__table__
+        row = session.connection(bind_arguments={"mapper": state.mapper}).execute(
+            select(*[table.c[name] for name in missing]).where(table.c.id == state.identity[0])
+        ).first()
+        for name in missing:
+            values[name] = getattr(row, name) if row is not None else None
+    return values
+
+
+def _tracked(objects):
+    return [obj for obj in objects if type(obj) in TRACKED]
+
+
+@event.listens_for(db.session, "before_flush")
+def _capture_old(session, _flush_context, _instances):
+    # Fresh per flush: deltas of a flush that failed before after_flush must not carry over
+    pending = session.info["kpi_pending"] = (defaultdict(Decimal), defaultdict(Decimal))
+    for obj in _tracked(session.dirty):
+        if session.is_modified(obj, include_collections=False):
+            _merge(pending, contribution(type(obj), _stored_values(session, obj)), -1)
+    for obj in _tracked(session.deleted):
+        if sa_inspect(obj).has_identity:
+            _merge(pending, contribution(type(obj), _stored_values(session, obj)), -1)
+
+
+@event.listens_for(db.session, "after_flush")
+def _apply_new(session, _flush_context):
+    pending = session.info.pop("kpi_pending", None) or (defaultdict(Decimal), defaultdict(Decimal))
+    changed = False
+    for obj in _tracked(session.new):
+        _merge(pending, contribution(type(obj), _current_values(obj)), 1)
+        changed = True
+    for obj in _tracked(session.dirty):
+        if session.is_modified(obj, include_collections=False):
+            _merge(pending, contribution(type(obj), _current_values(obj)), 1)
+            changed = True
+    changed = changed or any(pending[0].values()) or any(pending[1].values())
+    if not changed:
+        return
+    conn = session.connection(bind_arguments={"mapper": sa_inspect(Payment)})
+    if has_snapshot(conn.engine):
+        apply_deltas(conn, pending[0], pending[1])
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _drop_pending(session, _previous_transaction):
+    session.info.pop("kpi_pending", None)
+
+
+# --- full rebuild / verification ---
+
+
+def compute(conn) -> Tuple[Totals, Months]:
+    """Recompute the snapshot from the source tables."""
+    from .reporting import month_bucket
+
+    totals: Totals = defaultdict(Decimal)
+    months: Months = defaultdict(Decimal)
+    dialect_name = conn.dialect.name
+
+    paid = Payment.status == "paid"
+    row = conn.execute(select(
+        func.coalesce(func.sum(db.case((paid, Payment.amount), else_=0)), 0),
+        func.coalesce(func.sum(db.case((paid, 1), else_=0)), 0),
+        func.coalesce(func.sum(db.case((paid, 0), else_=1)), 0),
+    )).one()
+    totals["total_income"], totals["paid_count"], totals["unpaid_count"] = (_money(v) for v in row)
+    totals["total_expenses"] = _money(conn.execute(select(func.coalesce(func.sum(Expense.amount), 0))).scalar())
+    row = conn.execute(select(
+        func.count(Contract.id), func.coalesce(func.sum(db.case((Contract.status == "active", 1), else_=0)), 0)
+    )).one()
+    totals["contracts_total"], totals["contracts_active"] = (_money(v) for v in row)
+    for model, prefix in ((MaintenanceRequest, "maint_"), (Complaint, "comp_")):
+        for status, count in conn.execute(select(model.status, func.count(model.id)).group_by(model.status)):
+            totals[f"{prefix}{status or 'new'}"] += _money(count)
+
+    income_bucket = month_bucket(func.coalesce(Payment.paid_date, Payment.due_date), dialect_name)
+    for month, total in conn.execute(select(income_bucket, func.sum(Payment.amount)).where(paid).group_by(income_bucket)):
+        if month:
+            months[(month, "income")] += _money(total)
+    expense_bucket = month_bucket(Expense.spent_at, dialect_name)
+    for month, total in conn.execute(select(expense_bucket, func.sum(Expense.amount)).group_by(expense_bucket)):
+        if month:
+            months[(month, "expenses")] += _money(total)
+    return totals, months
+
+
+def read(conn) -> Tuple[Totals, Months]:
+    """The snapshot as stored."""
+    kpis = TenantKpi.__table__
+    rollups = MonthlyRollup.__table__
+    totals: Totals = defaultdict(Decimal)
+    months: Months = defaultdict(Decimal)
+    for key, value in conn.execute(select(kpis.c.key, kpis.c.value)):
+        totals[key] = _money(value)
+    for month, income, expenses in conn.execute(select(rollups.c.month, rollups.c.income, rollups.c.expenses)):
+        months[(month, "income")] = _money(income)
+        months[(month, "expenses")] = _money(expenses)
+    return totals, months
+
+
+def diff(expected: Tuple[Totals, Months], actual: Tuple[Totals, Months]) -> dict:
+    """``{key: (expected, actual)}`` for every value that differs (missing counts as 0)."""
+    mismatches = {}
+    for part, (exp, act) in enumerate(zip(expected, actual)):
+        for key in set(exp) | set(act):
+            if _money(exp.get(key)) != _money(act.get(key)):
+                label = key if part == 0 else f"{key[0]}:{key[1]}"
+                mismatches[label] = (_money(exp.get(key)), _money(act.get(key)))
+    return mismatches
+
+
+def rebuild(engine) -> dict:
+    """Replace the snapshot with a fresh computation and return remaining mismatches."""
+    with engine.begin() as conn:
+        totals, months = compute(conn)
+        conn.execute(TenantKpi.__table__.delete())
+        conn.execute(MonthlyRollup.__table__.delete())
+        apply_deltas(conn, totals, months)
+    with engine.connect() as conn:
+        return diff(compute(conn), read(conn))
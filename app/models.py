@@ -128,7 +128,7 @@ class Payment(db.Model, TimestampMixin):
     id = db.Column(db.Integer, primary_key=True)
     contract_id = db.Column(db.Integer, db.ForeignKey("contracts.id"), nullable=False, index=True)
     amount = db.Column(db.Numeric(12, 2), nullable=False)
-    due_date = db.Column(db.Date, nullable=False)
+    due_date = db.Column(db.Date, nullable=False, index=True)
     paid_date = db.Column(db.Date)
     method = db.Column(db.String(50))  # cash, card, transfer
     status = db.Column(db.String(50), nullable=False, default="unpaid")
@@ -181,11 +181,33 @@ class Account(db.Model, TimestampMixin):
         return self.type in {"asset", "expense"}
 
 
+# Chart of accounts every tenant starts with, keyed by the role the posting helpers use
+DEFAULT_ACCOUNTS = {
+    "cash": ("1000", "Cash", "asset"),
+    "ar": ("1100", "Accounts Receivable", "asset"),
+    "rent_income": ("4000", "Rental Income", "income"),
+    "expense_generic": ("5000", "General Expenses", "expense"),
+}
+
+
 class JournalEntry(db.Model, TimestampMixin):
     __tablename__ = "journal_entries"
+    # Invoices, payments and expenses are posted at most once (reversals may repeat).
+    # MySQL has no partial indexes, so it gets a plain index (as in d71f0b3a8c45).
+    __table_args__ = (
+        db.Index(
+            "uq_journal_entries_source",
+            "source",
+            "source_id",
+            unique=True,
+            sqlite_where=db.text("source IN ('invoice', 'payment', 'expense')"),
+            postgresql_where=db.text("source IN ('invoice', 'payment', 'expense')"),
+        ).ddl_if(callable_=lambda ddl, target, bind, **kw: kw["dialect"].name not in ("mysql", "mariadb")),
+        db.Index("uq_journal_entries_source", "source", "source_id").ddl_if(dialect=("mysql", "mariadb")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False, default=date.today)
+    date = db.Column(db.Date, nullable=False, default=date.today, index=True)
     memo = db.Column(db.String(255))
     # Optional linkage to a source object (e.g., payment)
     source = db.Column(db.String(50))
@@ -212,6 +234,44 @@ class JournalLine(db.Model, TimestampMixin):
     account = db.relationship("Account")
 
 
+class AccountMonthBalance(db.Model):
+    """Debits/credits posted to an account per ``YYYY-MM`` of the entry date (maintained by app/accounting.py)."""
+
+    __tablename__ = "account_balances"
+
+    account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)
+    debits = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    credits = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class FiscalPeriod(db.Model, TimestampMixin):
+    """A closed month (``YYYY-MM``); postings dated on or before the latest one are rejected."""
+
+    __tablename__ = "fiscal_periods"
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), unique=True, nullable=False, index=True)
+    closed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    closed_by = db.Column(db.String(120))
+
+    closing_balances = db.relationship("PeriodClosingBalance", back_populates="period", cascade="all, delete-orphan")
+
+
+class PeriodClosingBalance(db.Model):
+    """Cumulative debits/credits of an account through the end of a closed period."""
+
+    __tablename__ = "period_closing_balances"
+
+    period_id = db.Column(db.Integer, db.ForeignKey("fiscal_periods.id"), primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), primary_key=True)
+    debits = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    credits = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    period = db.relationship("FiscalPeriod", back_populates="closing_balances")
+
+
 class Expense(db.Model, TimestampMixin):
     __tablename__ = "expenses"
 
@@ -220,7 +280,7 @@ class Expense(db.Model, TimestampMixin):
     amount = db.Column(db.Numeric(12, 2), nullable=False)
     category = db.Column(db.String(100))
     vendor = db.Column(db.String(100))
-    spent_at = db.Column(db.Date, nullable=False, default=date.today)
+    spent_at = db.Column(db.Date, nullable=False, default=date.today, index=True)
 
 
 class Complaint(db.Model, TimestampMixin):
@@ -234,6 +294,63 @@ class Complaint(db.Model, TimestampMixin):
     notes = db.Column(db.Text)
 
 
+# --- Reporting snapshots (maintained by app/kpis.py) ---
+
+
+class TenantKpi(db.Model):
+    """Running dashboard counter/total, e.g. ``total_income`` or ``maint_new``."""
+
+    __tablename__ = "tenant_kpis"
+
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class MonthlyRollup(db.Model):
+    """Paid income (by paid date, else due date) and expenses (by spent date) per ``YYYY-MM``."""
+
+    __tablename__ = "monthly_rollups"
+
+    month = db.Column(db.String(7), primary_key=True)
+    income = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    expenses = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DataVersion(db.Model):
+    """Single row (``id=1``) whose ``version`` is bumped by every ORM commit touching tenant data."""
+
+    __tablename__ = "data_versions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PostingTask(db.Model, TimestampMixin):
+    """Journal posting waiting in the outbox: ``kind`` (see app/posting.py) of row ``source_id``."""
+
+    __tablename__ = "posting_outbox"
+    __table_args__ = (
+        db.Index("ix_posting_outbox_status_available", "status", "available_at"),
+        # Claims look up earlier unfinished tasks of the same row
+        db.Index("ix_posting_outbox_source", "source_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    source_id = db.Column(db.Integer, nullable=False)
+    # pending -> done, or failed after POSTING_MAX_ATTEMPTS
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    # Not picked up before this time (retry backoff, or the lease of the worker holding it)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim = db.Column(db.String(32))
+    processed_at = db.Column(db.DateTime)
+
+
 # --- Master (global) models ---
 
 class Company(db.Model, TimestampMixin):
@@ -251,3 +368,51 @@ class Company(db.Model, TimestampMixin):
     font_family = db.Column(db.String(100), default="system-ui, -apple-system, Segoe UI, Roboto")
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     is_archived = db.Column(db.Boolean, default=False, nullable=False)
+
+    directory_entries = db.relationship(
+        "UserDirectory",
+        back_populates="company",
+        cascade="all, delete-orphan",
+        lazy="dynamic",
+    )
+    stats_snapshot = db.relationship(
+        "CompanyStats",
+        back_populates="company",
+        cascade="all, delete-orphan",
+        uselist=False,
+    )
+
+
+class UserDirectory(db.Model, TimestampMixin):
+    """Global username → company index so login goes straight to one tenant."""
+
+    __tablename__ = "user_directory"
+    __bind_key__ = "master"
+    __table_args__ = (
+        db.UniqueConstraint("company_id", "username", name="uq_user_directory_company_username"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id"), nullable=False, index=True)
+    username = db.Column(db.String(80), nullable=False, index=True)
+    phone = db.Column(db.String(32), nullable=True, index=True)
+    last_login_at = db.Column(db.DateTime, nullable=True)
+
+    company = db.relationship("Company", back_populates="directory_entries")
+
+
+class CompanyStats(db.Model):
+    """Snapshot of per-company counts for the superadmin dashboard."""
+
+    __tablename__ = "company_stats"
+    __bind_key__ = "master"
+
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id"), primary_key=True)
+    properties = db.Column(db.Integer, nullable=False, default=0)
+    tenants = db.Column(db.Integer, nullable=False, default=0)
+    contracts = db.Column(db.Integer, nullable=False, default=0)
+    # Time the counts were collected; rows older than COMPANY_STATS_MAX_AGE are stale
+    refreshed_at = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+
+    company = db.relationship("Company", back_populates="stats_snapshot")
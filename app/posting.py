@@ -0,0 +1,516 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from flask import current_app, has_request_context, session as flask_session
+from sqlalchemy import case, event, func, select
+
+from .accounting import default_account_ids
+from .extensions import company_cache, db, tenant_engines
+from .models import Expense, JournalEntry, JournalLine, Payment, PostingTask
+from .tenancy import tenant_bound
+from .tenant_schema import ensure_schema, schema_state
+
+
+"""
+Journal posting outbox (tenant DB).
+
+Views call ``enqueue(kind, source_id)`` before committing a payment/invoice/expense
+change, so the ``posting_outbox`` row commits (or rolls back) with it. ``drain`` claims
+pending rows in batches and turns them into ``JournalEntry``/``JournalLine`` rows: a
+batch posts in one transaction, and if anything in it fails each task is retried on
+its own so one bad row does not hold back the others. Failed tasks are retried with
+exponential backoff and end up ``failed`` after ``POSTING_MAX_ATTEMPTS``, visible on
+``/accountant/postings``.
+
+Claims set a per-batch token and push ``available_at`` out by ``POSTING_LEASE``
+seconds, so several workers can drain the same tenant and a crashed worker's tasks
+are picked up again once the lease runs out. Tasks of one payment (or expense) are
+claimed in queue order, each only after the earlier ones are done, so a reversal
+never posts ahead of the receipt it reverses; a failed task holds back the later
+tasks of its row until it is requeued.
+
+``flask posting-worker`` drains every active tenant from one separate process. With
+``POSTING_WORKER_ENABLED=1`` each web process also runs ``worker``, a daemon thread
+woken right after a commit that enqueued something, which only ever visits tenants
+that process has served.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+# --- posting rules (add entries to the session, never commit) ---
+
+
+def _posted(source: str, source_id: int) -> bool:
+    # Entries added earlier in the same (not yet flushed) batch count too
+    for obj in db.session.new:
+        if isinstance(obj, JournalEntry) and obj.source == source and obj.source_id == source_id:
+            return True
+    known = db.session.info.get("posted_sources")
+    if known is not None:
+        return (source, source_id) in known
+    return db.session.execute(
+        select(JournalEntry.id).filter_by(source=source, source_id=source_id).limit(1)
+    ).first() is not None
+
+
+def _add_entry(entry: JournalEntry, lines) -> None:
+    """Add ``entry`` with ``(account_id, debit, credit)`` lines to the session."""
+    for account_id, debit, credit in lines:
+        db.session.add(JournalLine(entry=entry, account_id=account_id, debit=debit, credit=credit))
+    db.session.add(entry)
+
+
+def _invoice(payment_id: int, day: date) -> None:
+    payment = db.session.get(Payment, payment_id)
+    if payment is None or _posted("invoice", payment_id):
+        return
+    acc = default_account_ids()
+    amount = float(payment.amount or 0)
+    _add_entry(
+        JournalEntry(date=payment.due_date or day, memo=f"Invoice for payment #{payment.id}", source="invoice", source_id=payment.id),
+        [(acc["ar"], amount, 0), (acc["rent_income"], 0, amount)],
+    )
+
+
+# Receipts and reversals are queued as the status flips; when the queue is drained
+# only the ones that still match the payment's current status take effect, so
+# paid -> unpaid -> paid leaves the receipt standing instead of reversed
+
+
+def _payment_receipt(payment_id: int, day: date) -> None:
+    payment = db.session.get(Payment, payment_id)
+    if payment is None or payment.status != "paid" or _posted("payment", payment_id):
+        return
+    acc = default_account_ids()
+    amount = float(payment.amount or 0)
+    _add_entry(
+        JournalEntry(date=payment.paid_date or day, memo=f"Cash receipt for payment #{payment.id}", source="payment", source_id=payment.id),
+        [(acc["cash"], amount, 0), (acc["ar"], 0, amount)],
+    )
+
+
+def _payment_reversal(payment_id: int, day: date) -> None:
+    payment = db.session.get(Payment, payment_id)
+    if payment is None or payment.status == "paid" or not _posted("payment", payment_id):
+        return
+    acc = default_account_ids()
+    amount = float(payment.amount or 0)
+    _add_entry(
+        JournalEntry(date=day, memo=f"Reversal cash receipt for payment #{payment.id}", source="payment_reverse", source_id=payment.id),
+        [(acc["cash"], 0, amount), (acc["ar"], amount, 0)],
+    )
+
+
+def _expense(expense_id: int, day: date) -> None:
+    exp = db.session.get(Expense, expense_id)
+    if exp is None or _posted("expense", expense_id):
+        return
+    acc = default_account_ids()
+    amount = float(exp.amount or 0)
+    _add_entry(
+        JournalEntry(date=exp.spent_at or day, memo=f"Expense: {exp.description}", source="expense", source_id=exp.id),
+        [(acc["expense_generic"], amount, 0), (acc["cash"], 0, amount)],
+    )
+
+
+POSTERS: Dict[str, Callable[[int, date], None]] = {
+    "invoice": _invoice,
+    "payment": _payment_receipt,
+    "payment_reverse": _payment_reversal,
+    "expense": _expense,
+}
+
+
+def post(kind: str, source_id: int, day: Optional[date] = None) -> None:
+    """Add the journal entry of ``kind`` for row ``source_id`` (no-op when already posted).
+
+    ``day`` (the day the change was made) dates entries that have no date of their own.
+    """
+    POSTERS[kind](source_id, day or date.today())
+
+
+# --- enqueueing ---
+
+
+def has_outbox() -> bool:
+    engine = db.session.get_bind(mapper=PostingTask.__mapper__)
+    state = schema_state(engine)
+    return state is not None and state.has_table(PostingTask.__tablename__)
+
+
+def enqueue(kind: str, source_id: int) -> None:
+    """Queue a posting in the current transaction; the caller commits.
+
+    Tenants whose DB predates the outbox get the entry added right away instead.
+    """
+    if kind not in POSTERS:
+        raise ValueError(f"Unknown posting kind {kind!r}")
+    if not has_outbox():
+        post(kind, source_id)
+        return
+    db.session.add(PostingTask(kind=kind, source_id=source_id))
+    _wake_after_commit()
+
+
+def enqueue_all(conn, kind: str, source_ids: Iterable[int]) -> None:
+    """``enqueue`` for many rows with one bulk INSERT on ``conn``, for Core bulk writers.
+
+    The caller checks ``has_outbox()`` first and commits.
+    """
+    if kind not in POSTERS:
+        raise ValueError(f"Unknown posting kind {kind!r}")
+    rows = [{"kind": kind, "source_id": source_id} for source_id in source_ids]
+    if rows:
+        conn.execute(PostingTask.__table__.insert(), rows)
+        _wake_after_commit()
+
+
+def _wake_after_commit() -> None:
+    if has_request_context() and flask_session.get("company_id"):
+        db.session.info.setdefault("posting_companies", set()).add(int(flask_session["company_id"]))
+
+
+@event.listens_for(db.session, "after_commit")
+def _wake_worker(session):
+    for company_id in session.info.pop("posting_companies", ()):
+        worker.notify(company_id)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _forget_wakeups(session, _previous_transaction):
+    session.info.pop("posting_companies", None)
+
+
+# --- draining ---
+
+
+def _setting(name: str, default):
+    return type(default)(current_app.config.get(name, default))
+
+
+def _row_of(kind):
+    # invoice, payment and payment_reverse tasks all refer to a Payment
+    return case((kind == "expense", "expense"), else_="payment")
+
+
+def _blocked(table):
+    """True for tasks whose row has an earlier task not done yet (pending, claimed or failed)."""
+    earlier = table.alias("earlier")
+    return select(earlier.c.id).where(
+        earlier.c.source_id == table.c.source_id,
+        _row_of(earlier.c.kind) == _row_of(table.c.kind),
+        earlier.c.id < table.c.id,
+        earlier.c.status != "done",
+    ).exists()
+
+
+def _claim(batch: int, lease: int) -> List[PostingTask]:
+    """Claim up to ``batch`` due tasks (committed) and return them in queue order.
+
+    Blocked tasks (see ``_blocked``) are skipped until the earlier task of their row
+    completes.
+    """
+    table = PostingTask.__table__
+    now = datetime.utcnow()
+    due = (table.c.status == "pending") & (table.c.available_at <= now)
+    ids = list(db.session.execute(
+        select(table.c.id).where(due, ~_blocked(table)).order_by(table.c.id).limit(batch)
+    ).scalars())
+    if not ids:
+        db.session.rollback()
+        return []
+    token = uuid.uuid4().hex
+    db.session.execute(
+        table.update()
+        .where(table.c.id.in_(ids), due)
+        .values(claim=token, available_at=now + timedelta(seconds=lease), attempts=table.c.attempts + 1)
+    )
+    db.session.commit()
+    return list(db.session.execute(
+        select(PostingTask).where(PostingTask.claim == token).order_by(PostingTask.id)
+    ).scalars())
+
+
+def _preload(tasks: List[PostingTask]) -> list:
+    """Load the rows and existing postings of ``tasks`` with one query per table.
+
+    The rows are returned so the caller keeps them in the identity map (``get`` then
+    hits it); the posted ``(source, source_id)`` pairs go to ``session.info`` for
+    ``_posted``.
+    """
+    ids: Dict[type, set] = {}
+    for task in tasks:
+        ids.setdefault(Expense if task.kind == "expense" else Payment, set()).add(task.source_id)
+    rows = []
+    known = set()
+    for model, source_ids in ids.items():
+        source_ids = sorted(source_ids)
+        rows += db.session.execute(select(model).where(model.id.in_(source_ids))).scalars().all()
+        sources = ["expense"] if model is Expense else ["invoice", "payment"]
+        known.update(db.session.execute(
+            select(JournalEntry.source, JournalEntry.source_id)
+            .where(JournalEntry.source.in_(sources), JournalEntry.source_id.in_(source_ids))
+        ).tuples())
+    db.session.info["posted_sources"] = known
+    return rows
+
+
+def _complete(task: PostingTask) -> None:
+    post(task.kind, task.source_id, task.created_at.date() if task.created_at else None)
+    task.status = "done"
+    task.processed_at = datetime.utcnow()
+    task.claim = None
+    task.last_error = None
+
+
+def _fail(task: PostingTask, exc: Exception, max_attempts: int, retry_delay: int) -> str:
+    task.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+    task.claim = None
+    if task.attempts >= max_attempts:
+        task.status = "failed"
+    else:
+        task.available_at = datetime.utcnow() + timedelta(seconds=retry_delay * 2 ** (task.attempts - 1))
+    logger.warning("Posting %s #%s failed (attempt %s): %s", task.kind, task.source_id, task.attempts, task.last_error)
+    return "failed" if task.status == "failed" else "retried"
+
+
+def drain(batch: Optional[int] = None) -> Dict[str, int]:
+    """Post one claimed batch of the bound tenant; returns ``{"done", "retried", "failed"}``."""
+    batch = batch or _setting("POSTING_BATCH_SIZE", 100)
+    max_attempts = _setting("POSTING_MAX_ATTEMPTS", 5)
+    retry_delay = _setting("POSTING_RETRY_DELAY", 30)
+    counts = {"done": 0, "retried": 0, "failed": 0}
+    tasks = _claim(batch, _setting("POSTING_LEASE", 120))
+    if not tasks:
+        return counts
+    try:
+        rows = _preload(tasks)  # noqa: F841  (held for the identity map)
+        # One flush for the batch: a single pass of the balance/KPI/version hooks
+        with db.session.no_autoflush:
+            for task in tasks:
+                _complete(task)
+        db.session.info.pop("posted_sources", None)
+        db.session.commit()
+        counts["done"] = len(tasks)
+        return counts
+    except Exception:
+        db.session.info.pop("posted_sources", None)
+        db.session.rollback()
+    # Something in the batch failed: one transaction per task to isolate it
+    for task in tasks:
+        try:
+            _complete(task)
+            db.session.commit()
+            counts["done"] += 1
+        except Exception as exc:
+            db.session.rollback()
+            counts[_fail(task, exc, max_attempts, retry_delay)] += 1
+            db.session.commit()
+    return counts
+
+
+def drain_tenant(max_batches: int = 50) -> Dict[str, object]:
+    """Drain the bound tenant until nothing is due (at most ``max_batches`` batches).
+
+    Returns the summed counts plus ``next_in``: seconds until the next claimable task
+    is due, ``None`` when nothing is (tasks held back by a failed one do not count).
+    """
+    totals: Dict[str, object] = {"done": 0, "retried": 0, "failed": 0}
+    if not has_outbox():
+        totals["next_in"] = None
+        return totals
+    for _ in range(max_batches):
+        counts = drain()
+        for key, value in counts.items():
+            totals[key] += value
+        if not any(counts.values()):
+            break
+    table = PostingTask.__table__
+    next_at = db.session.execute(
+        select(func.min(table.c.available_at)).where(table.c.status == "pending", ~_blocked(table))
+    ).scalar()
+    db.session.rollback()
+    totals["next_in"] = None if next_at is None else max(0.0, (next_at - datetime.utcnow()).total_seconds())
+    return totals
+
+
+# --- status ---
+
+
+def status(limit: int = 50) -> Optional[dict]:
+    """Queue depth, lag and problem tasks of the bound tenant (``None`` without an outbox)."""
+    if not has_outbox():
+        return None
+    now = datetime.utcnow()
+    pending = PostingTask.status == "pending"
+    row = db.session.execute(select(
+        func.coalesce(func.sum(db.case((pending, 1), else_=0)), 0),
+        func.coalesce(func.sum(db.case((PostingTask.status == "failed", 1), else_=0)), 0),
+        func.min(db.case((pending, PostingTask.created_at))),
+        func.max(PostingTask.processed_at),
+    )).one()
+    pending_count, failed_count, oldest_pending, last_processed = row
+    recent = db.session.execute(
+        select(PostingTask.created_at, PostingTask.processed_at)
+        .where(PostingTask.status == "done")
+        .order_by(PostingTask.id.desc())
+        .limit(100)
+    ).all()
+    delays = [(done - queued).total_seconds() for queued, done in recent if queued and done]
+    problems = list(db.session.execute(
+        select(PostingTask)
+        .where((PostingTask.status == "failed") | (pending & (PostingTask.attempts > 0)))
+        .order_by(PostingTask.id.desc())
+        .limit(limit)
+    ).scalars())
+    return {
+        "pending": int(pending_count),
+        "failed": int(failed_count),
+        "lag_seconds": (now - oldest_pending).total_seconds() if oldest_pending else 0.0,
+        "avg_delay_seconds": sum(delays) / len(delays) if delays else None,
+        "last_processed": last_processed,
+        "problems": problems,
+    }
+
+
+def retry_failed() -> int:
+    """Put every failed task of the bound tenant back in the queue (committed)."""
+    table = PostingTask.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.status == "failed")
+        .values(status="pending", attempts=0, available_at=datetime.utcnow(), claim=None)
+    )
+    _wake_after_commit()
+    db.session.commit()
+    return result.rowcount
+
+
+# --- in-process worker ---
+
+
+class PostingWorker:
+    """
+    Daemon thread draining the outbox of this process's tenants.
+
+    - ``notify(company_id)`` (called after a commit that enqueued) wakes it at once
+    - Tenants with tasks waiting for a retry are revisited when the first one is due
+    - Every ``POSTING_SWEEP_INTERVAL`` seconds it drains the companies this process has
+      an engine for or was notified about, which picks up work left by a crash; other
+      tenants are left to ``flask posting-worker``
+    - Off unless ``POSTING_WORKER_ENABLED=1``; then started on the first request of
+      each process
+    """
+
+    def __init__(self) -> None:
+        self.app = None
+        self.enabled = False
+        self.sweep_interval = 300.0
+        self._due: Dict[int, float] = {}
+        self._notified: set = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pid: Optional[int] = None
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.enabled = bool(app.config.get("POSTING_WORKER_ENABLED", False))
+        self.sweep_interval = float(app.config.get("POSTING_SWEEP_INTERVAL", self.sweep_interval))
+        app.extensions["posting_worker"] = self
+        app.before_request(self.ensure_started)
+
+    def ensure_started(self) -> None:
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # First use, or first use after a fork (threads do not survive fork)
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            threading.Thread(target=self._run, args=(self._stop,), name="posting-worker", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._pid = None
+
+    def notify(self, company_id: int) -> None:
+        if not self.enabled:
+            return
+        self.ensure_started()
+        with self._lock:
+            self._due[company_id] = 0.0
+            self._notified.add(company_id)
+        self._wake.set()
+
+    def _run(self, stop: threading.Event) -> None:
+        next_sweep = time.monotonic()
+        while not stop.is_set():
+            now = time.monotonic()
+            if now >= next_sweep:
+                next_sweep = now + self.sweep_interval
+                for company_id in self._swept_companies():
+                    with self._lock:
+                        self._due.setdefault(company_id, 0.0)
+            with self._lock:
+                ready = [cid for cid, at in self._due.items() if at <= now]
+                for cid in ready:
+                    del self._due[cid]
+            for company_id in ready:
+                next_in = self.drain_company(company_id)
+                if next_in is not None:
+                    with self._lock:
+                        at = time.monotonic() + next_in
+                        self._due[company_id] = min(at, self._due.get(company_id, at))
+            with self._lock:
+                wake_at = min([next_sweep, *self._due.values()])
+            self._wake.wait(max(0.0, wake_at - time.monotonic()))
+            self._wake.clear()
+
+    def _swept_companies(self) -> List[int]:
+        """Companies with an engine in this process's registry, plus those notified here."""
+        with self._lock:
+            ids = set(self._notified)
+        try:
+            with self.app.app_context():
+                try:
+                    for subdomain in tenant_engines.keys():
+                        company = company_cache.get_by_subdomain(subdomain)
+                        if company is not None:
+                            ids.add(company.id)
+                finally:
+                    db.session.remove()
+        except Exception:
+            logger.exception("Posting worker could not list companies")
+        return sorted(ids)
+
+    def drain_company(self, company_id: int) -> Optional[float]:
+        """Drain one tenant; seconds until it has due work again (``None``: queue empty)."""
+        try:
+            with self.app.app_context():
+                try:
+                    company = company_cache.get(company_id)
+                    if company is None or not company.is_active or company.is_archived:
+                        return None
+                    engine = tenant_engines.for_company(company)
+                    ensure_schema(engine)
+                    with tenant_bound(engine):
+                        return drain_tenant()["next_in"]
+                finally:
+                    db.session.remove()
+        except Exception:
+            logger.exception("Posting worker failed for company %s", company_id)
+            return self.sweep_interval
+
+
+worker = PostingWorker()
@@ -0,0 +1,409 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, case, func, literal, or_, select, true, union_all
+from sqlalchemy.orm import contains_eager
+
+from .extensions import db
+from .models import (
+    Apartment, Complaint, Contract, Expense, MaintenanceRequest, MonthlyRollup, Payment, Property, TenantKpi, User,
+)
+from .tenant_schema import schema_state
+
+
+"""
+Shared reporting queries for the accountant views.
+
+Monthly series are computed in the database with one GROUP BY per source on a
+``YYYY-MM`` month bucket, instead of one SUM query per month; dashboard KPI cards
+come from ``DashboardMetrics`` (conditional aggregation, one round trip). Tenants
+with the ``tenant_kpis``/``monthly_rollups`` snapshot (app/kpis.py) read totals and
+the monthly series from it instead of scanning payments and expenses. AR aging
+buckets unpaid payments with a CASE on the due date, in SQL.
+"""
+
+
+def add_months(year: int, month: int, delta: int) -> tuple:
+    total = year * 12 + (month - 1) + delta
+    return total // 12, (total % 12) + 1
+
+
+def month_starts(months: int = 12, today: Optional[date] = None) -> List[date]:
+    """First day of each of the last ``months`` months (ascending, current month last)."""
+    today = today or date.today()
+    starts = []
+    for k in range(months - 1, -1, -1):
+        y, m = add_months(today.year, today.month, -k)
+        starts.append(date(y, m, 1))
+    return starts
+
+
+def month_bucket(column, dialect_name: str):
+    """SQL expression turning a date column into a ``YYYY-MM`` label."""
+    if dialect_name == "sqlite":
+        return func.strftime("%Y-%m", column)
+    if dialect_name in ("mysql", "mariadb"):
+        return func.date_format(column, "%Y-%m")
+    # PostgreSQL and most others
+    return func.to_char(column, "YYYY-MM")
+
+
+def month_key(value) -> Optional[str]:
+    """``YYYY-MM`` label of a date (or ISO date string) in Python, matching ``month_bucket``."""
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return f"{value.year:04d}-{value.month:02d}"
+    return str(value)[:7]
+
+
+def monthly_series(months: int = 12, today: Optional[date] = None) -> dict:
+    """Income, expenses and profit per month for the last ``months`` months.
+
+    Income is paid payments bucketed by ``paid_date`` (``due_date`` when no paid date
+    was recorded); expenses are bucketed by ``spent_at``. Read from ``monthly_rollups``
+    when the tenant has it, otherwise both come back from a single UNION ALL round
+    trip. Returns ``{"labels", "income", "expenses", "profit"}``.
+    """
+    starts = month_starts(months, today)
+    y, m = add_months(starts[-1].year, starts[-1].month, 1)
+    start, end = starts[0], date(y, m, 1)
+    labels = [f"{d.year:04d}-{d.month:02d}" for d in starts]
+
+    engine = db.session.get_bind(mapper=Payment.__mapper__)
+    state = schema_state(engine)
+    if state is not None and state.has_table(MonthlyRollup.__tablename__):
+        totals = {"income": {}, "expense": {}}
+        rows = db.session.execute(
+            select(MonthlyRollup.month, MonthlyRollup.income, MonthlyRollup.expenses)
+            .where(MonthlyRollup.month >= labels[0], MonthlyRollup.month <= labels[-1])
+        )
+        for month, income, expenses in rows:
+            totals["income"][month] = float(income or 0)
+            totals["expense"][month] = float(expenses or 0)
+        return _series(labels, totals)
+
+    dialect_name = engine.dialect.name
+    income_date = func.coalesce(Payment.paid_date, Payment.due_date)
+    income_bucket = month_bucket(income_date, dialect_name)
+    parts = [
+        select(literal("income").label("kind"), income_bucket.label("month"), func.sum(Payment.amount).label("total"))
+        .where(Payment.status == "paid", income_date >= start, income_date < end)
+        .group_by(income_bucket)
+    ]
+    if state is None or state.has_table(Expense.__tablename__):
+        expense_bucket = month_bucket(Expense.spent_at, dialect_name)
+        parts.append(
+            select(literal("expense").label("kind"), expense_bucket.label("month"), func.sum(Expense.amount).label("total"))
+            .where(Expense.spent_at >= start, Expense.spent_at < end)
+            .group_by(expense_bucket)
+        )
+    query = union_all(*parts) if len(parts) > 1 else parts[0]
+
+    totals = {"income": {}, "expense": {}}
+    for kind, month, total in db.session.execute(query):
+        totals[kind][month] = float(total or 0)
+    return _series(labels, totals)
+
+
+def _series(labels: List[str], totals: dict) -> dict:
+    income = [totals["income"].get(label, 0.0) for label in labels]
+    expenses = [totals["expense"].get(label, 0.0) for label in labels]
+    return {
+        "labels": labels,
+        "income": income,
+        "expenses": expenses,
+        "profit": [round(i - e, 2) for i, e in zip(income, expenses)],
+    }
+
+
+class DashboardMetrics:
+    """
+    KPI counters shared by the accountant and admin dashboards.
+
+    Every group is one conditional-aggregation SELECT (``SUM(CASE ...)``) over one
+    table; the requested groups are cross-joined as single-row subqueries, so a
+    dashboard pays one round trip for all of its cards. Groups listed in ``SNAPSHOT``
+    are read from ``tenant_kpis`` when the tenant has it (a handful of primary-key
+    rows instead of a table scan); time-dependent counts (``payment_alerts``,
+    ``maintenance_overdue``) are always computed live. Groups whose table is missing
+    from the tenant DB (older schemas) report zeros.
+
+        metrics = DashboardMetrics().load("payments", "expenses")
+        metrics["total_income"], metrics.as_dict()
+    """
+
+    GROUPS = (
+        "payments", "payment_alerts", "expenses", "units", "contracts",
+        "maintenance", "maintenance_overdue", "complaints", "users",
+    )
+    SNAPSHOT = {
+        "payments": ("total_income", "paid_count", "unpaid_count"),
+        "expenses": ("total_expenses",),
+        "contracts": ("contracts_total", "contracts_active"),
+        "maintenance": ("maint_new", "maint_in_progress", "maint_resolved", "maint_closed"),
+        "complaints": ("comp_new", "comp_reviewing", "comp_resolved", "comp_closed"),
+    }
+    AMOUNTS = ("total_income", "total_expenses")
+
+    def __init__(self, today: Optional[date] = None, upcoming_days: int = 14, maintenance_overdue_hours: int = 24) -> None:
+        self.today = today or date.today()
+        self.upcoming_days = upcoming_days
+        self.maintenance_overdue_hours = maintenance_overdue_hours
+        self.values: dict = {}
+
+    def __getitem__(self, name: str):
+        return self.values[name]
+
+    def as_dict(self) -> dict:
+        return dict(self.values)
+
+    def load(self, *groups: str) -> "DashboardMetrics":
+        groups = groups or self.GROUPS
+        engine = db.session.get_bind(mapper=Payment.__mapper__)
+        state = schema_state(engine)
+        use_snapshot = state is not None and state.has_table(TenantKpi.__tablename__)
+        subqueries, snapshot_keys = [], []
+        for group in groups:
+            if use_snapshot and group in self.SNAPSHOT:
+                snapshot_keys.extend(self.SNAPSHOT[group])
+                continue
+            for table, query in getattr(self, f"_{group}")():
+                if state is None or state.has_table(table):
+                    subqueries.append(query.subquery(f"{group}_{table}"))
+        if snapshot_keys:
+            subqueries.append(self._snapshot(snapshot_keys).subquery("snapshot"))
+        row = {}
+        if subqueries:
+            stmt = select(*[col for sq in subqueries for col in sq.c]).select_from(subqueries[0])
+            for sq in subqueries[1:]:
+                stmt = stmt.join(sq, true())
+            row = dict(db.session.execute(stmt).mappings().one())
+        values = {k: (v if v is not None else 0) for k, v in row.items()}
+        for key in snapshot_keys:
+            if key not in self.AMOUNTS:
+                values[key] = int(values[key])
+        self.values = self._derive(groups, values)
+        return self
+
+    @staticmethod
+    def _snapshot(keys):
+        return select(*[func.max(case((TenantKpi.key == key, TenantKpi.value))).label(key) for key in keys]).where(
+            TenantKpi.key.in_(keys)
+        )
+
+    # --- groups: (table name, aggregate select) pairs ---
+
+    def _payments(self):
+        return [("payments", select(
+            func.coalesce(func.sum(case((Payment.status == "paid", Payment.amount), else_=0)), 0).label("total_income"),
+            _count_if(Payment.status == "paid").label("paid_count"),
+            _count_if(Payment.status != "paid").label("unpaid_count"),
+        ))]
+
+    def _payment_alerts(self):
+        unpaid = Payment.status != "paid"
+        upcoming_end = self.today + timedelta(days=self.upcoming_days)
+        return [("payments", select(
+            _count_if(and_(unpaid, Payment.due_date < self.today)).label("overdue_count"),
+            _count_if(and_(unpaid, Payment.due_date >= self.today, Payment.due_date <= upcoming_end)).label("upcoming_count"),
+        ))]
+
+    def _expenses(self):
+        return [("expenses", select(func.coalesce(func.sum(Expense.amount), 0).label("total_expenses")))]
+
+    def _units(self):
+        # Units = apartments inside buildings + standalone apartment properties
+        active = and_(Contract.status == "active", Contract.start_date <= self.today, Contract.end_date >= self.today)
+        leased_apartments = select(Contract.apartment_id).where(active, Contract.apartment_id.is_not(None))
+        leased_buildings = select(Contract.property_id).where(active, Contract.apartment_id.is_(None))
+        leased_properties = select(Contract.property_id).where(active)
+        standalone = Property.property_type == "apartment"
+        return [
+            ("apartments", select(
+                func.count(Apartment.id).label("apartment_units"),
+                _count_if(Apartment.status == "available").label("apartment_available"),
+                _count_if(Apartment.status == "occupied").label("apartment_occupied"),
+                _count_if(and_(
+                    Apartment.id.not_in(leased_apartments), Apartment.building_id.not_in(leased_buildings)
+                )).label("apartment_unleased"),
+            )),
+            ("properties", select(
+                _count_if(standalone).label("standalone_units"),
+                _count_if(and_(standalone, Property.status == "available")).label("standalone_available"),
+                _count_if(and_(standalone, Property.status == "occupied")).label("standalone_occupied"),
+                _count_if(and_(standalone, Property.id.not_in(leased_properties))).label("standalone_unleased"),
+            )),
+        ]
+
+    def _contracts(self):
+        return [("contracts", select(
+            func.count(Contract.id).label("contracts_total"),
+            _count_if(Contract.status == "active").label("contracts_active"),
+        ))]
+
+    def _maintenance(self):
+        status = MaintenanceRequest.status
+        return [("maintenance_requests", select(
+            _count_if(status == "new").label("maint_new"),
+            _count_if(status == "in_progress").label("maint_in_progress"),
+            _count_if(status == "resolved").label("maint_resolved"),
+            _count_if(status == "closed").label("maint_closed"),
+        ))]
+
+    def _maintenance_overdue(self):
+        threshold = datetime.utcnow() - timedelta(hours=self.maintenance_overdue_hours)
+        status = MaintenanceRequest.status
+        open_request = or_(status.is_(None), status.not_in(("resolved", "closed", "done")))
+        return [("maintenance_requests", select(
+            _count_if(and_(open_request, MaintenanceRequest.created_at <= threshold)).label("maint_overdue"),
+        ))]
+
+    def _complaints(self):
+        return [("complaints", select(
+            _count_if(Complaint.status == "new").label("comp_new"),
+            _count_if(Complaint.status == "reviewing").label("comp_reviewing"),
+            _count_if(Complaint.status == "resolved").label("comp_resolved"),
+            _count_if(Complaint.status == "closed").label("comp_closed"),
+        ))]
+
+    def _users(self):
+        return [("users", select(
+            _count_if(User.role == "employee").label("total_employees"),
+            _count_if(User.role == "tenant").label("total_tenants"),
+        ))]
+
+    @staticmethod
+    def _derive(groups, values: dict) -> dict:
+        defaults = {
+            "payments": ("total_income", "paid_count", "unpaid_count"),
+            "payment_alerts": ("overdue_count", "upcoming_count"),
+            "expenses": ("total_expenses",),
+            "units": ("apartment_units", "apartment_available", "apartment_occupied", "apartment_unleased",
+                      "standalone_units", "standalone_available", "standalone_occupied", "standalone_unleased"),
+            "contracts": ("contracts_total", "contracts_active"),
+            "maintenance": ("maint_new", "maint_in_progress", "maint_resolved", "maint_closed"),
+            "maintenance_overdue": ("maint_overdue",),
+            "complaints": ("comp_new", "comp_reviewing", "comp_resolved", "comp_closed"),
+            "users": ("total_employees", "total_tenants"),
+        }
+        for group in groups:
+            for name in defaults[group]:
+                values.setdefault(name, 0)
+        if "payments" in groups and "expenses" in groups:
+            values["net_profit"] = float(values["total_income"]) - float(values["total_expenses"])
+        if "units" in groups:
+            values["units_total"] = values["apartment_units"] + values["standalone_units"]
+            values["units_available"] = values["apartment_available"] + values["standalone_available"]
+            values["units_occupied"] = values["apartment_occupied"] + values["standalone_occupied"]
+            values["units_unleased"] = values["apartment_unleased"] + values["standalone_unleased"]
+        return values
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+# --- accounts receivable aging ---
+
+# (max days past due, bucket); older payments fall in ">90"
+AGING_LIMITS = ((0, "current"), (30, "1-30"), (60, "31-60"), (90, "61-90"))
+AGING_BUCKETS = tuple(name for _, name in AGING_LIMITS) + (">90",)
+AGING_SORTS = ("bucket", "amount")
+
+
+def aging_bucket(today: date):
+    """CASE labelling an unpaid payment with its aging bucket (days past ``due_date``)."""
+    return case(
+        *[(Payment.due_date >= today - timedelta(days=days), name) for days, name in AGING_LIMITS],
+        else_=AGING_BUCKETS[-1],
+    )
+
+
+def aging_label(days: int) -> str:
+    """Python twin of ``aging_bucket`` for a row already loaded."""
+    for limit, name in AGING_LIMITS:
+        if days <= limit:
+            return name
+    return AGING_BUCKETS[-1]
+
+
+def ar_aging_totals(today: Optional[date] = None) -> dict:
+    """Outstanding amount per aging bucket (every bucket present, 0.0 when empty)."""
+    today = today or date.today()
+    bucket = aging_bucket(today).label("bucket")
+    totals = {name: 0.0 for name in AGING_BUCKETS}
+    query = select(bucket, func.sum(Payment.amount)).where(Payment.status != "paid").group_by(bucket)
+    for name, total in db.session.execute(query):
+        totals[name] = float(total or 0)
+    return totals
+
+
+def ar_aging_page(today: Optional[date] = None, sort: str = "bucket", descending: bool = True,
+                  page: int = 1, per_page: int = 50):
+    """One page of unpaid payments as ``{"payment", "tenant", "days", "bucket", "amount"}`` rows.
+
+    Payments, contracts and tenants come from one joined query (outer joins, so every
+    payment counted by ``ar_aging_totals`` is listed). ``sort="bucket"`` orders
+    by due date (``descending``: most overdue first), ``sort="amount"`` by amount.
+    Returns a Flask-SQLAlchemy ``Pagination`` whose ``items`` are the row dicts.
+    """
+    today = today or date.today()
+    if sort == "amount":
+        order = (Payment.amount.desc() if descending else Payment.amount.asc(), Payment.due_date.asc())
+    else:
+        order = (Payment.due_date.asc() if descending else Payment.due_date.desc(),)
+    query = (
+        select(Payment)
+        .outerjoin(Payment.contract)
+        .outerjoin(Contract.tenant)
+        .options(contains_eager(Payment.contract).contains_eager(Contract.tenant))
+        .where(Payment.status != "paid")
+        .order_by(*order, Payment.id.asc())
+    )
+    pagination = db.paginate(query, page=page, per_page=per_page, error_out=False)
+    rows = []
+    for payment in pagination.items:
+        days = (today - payment.due_date).days
+        tenant = payment.contract.tenant if payment.contract is not None else None
+        rows.append({
+            "payment": payment,
+            "tenant": getattr(tenant, "username", "-"),
+            "days": days,
+            "bucket": aging_label(days),
+            "amount": float(payment.amount or 0),
+        })
+    pagination.items = rows
+    return pagination
+
+
+def ar_aging_by_tenant(today: Optional[date] = None) -> List[dict]:
+    """Outstanding amount per tenant, split by bucket, largest balance first."""
+    today = today or date.today()
+    bucket = aging_bucket(today)
+    total = func.sum(Payment.amount)
+    query = (
+        select(
+            User.username,
+            func.count(Payment.id),
+            total,
+            *[func.coalesce(func.sum(case((bucket == name, Payment.amount), else_=0)), 0) for name in AGING_BUCKETS],
+        )
+        .select_from(Payment)
+        .outerjoin(Contract, Contract.id == Payment.contract_id)
+        .outerjoin(User, User.id == Contract.tenant_id)
+        .where(Payment.status != "paid")
+        .group_by(Contract.tenant_id, User.username)
+        .order_by(total.desc(), User.username.asc())
+    )
+    return [
+        {
+            "tenant": username or "-",
+            "count": count,
+            "total": float(amount or 0),
+            "buckets": {name: float(value or 0) for name, value in zip(AGING_BUCKETS, by_bucket)},
+        }
+        for username, count, amount, *by_bucket in db.session.execute(query)
+    ]
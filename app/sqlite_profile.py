@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from typing import Dict, Mapping
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+"""
+SQLite performance profile for tenant and master engines.
+
+Pragmas are applied on every new DBAPI connection through a ``connect`` event, so
+pooled connections always carry them. WAL lets readers proceed while a writer holds
+the lock; busy_timeout makes writers wait instead of failing with "database is locked".
+The profile is configured with ``SQLITE_PRAGMAS`` (see app/config.py).
+"""
+
+# Order matters: journal_mode must be set before any transaction starts
+PRAGMA_NAMES = ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
+
+
+def apply_sqlite_profile(engine: Engine, pragmas: Mapping[str, object], optimize_on_close: bool = True) -> Engine:
+    """Install the pragma profile on a SQLite engine (no-op for other dialects)."""
+    if engine.dialect.name != "sqlite" or getattr(engine, "_sqlite_profile_applied", False):
+        return engine
+    statements = [
+        f"PRAGMA {name}={pragmas[name]}"
+        for name in PRAGMA_NAMES
+        if pragmas.get(name) not in (None, "")
+    ]
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    if optimize_on_close:
+        @event.listens_for(engine, "close")
+        def _optimize(dbapi_connection, _record):
+            try:
+                dbapi_connection.execute("PRAGMA optimize")
+            except Exception:
+                pass
+
+    engine._sqlite_profile_applied = True  # type: ignore[attr-defined]
+    return engine
+
+
+def read_pragmas(conn) -> Dict[str, object]:
+    """Current values of the profile pragmas on an open SQLAlchemy connection."""
+    values = {}
+    for name in PRAGMA_NAMES:
+        row = conn.exec_driver_sql(f"PRAGMA {name}").first()
+        values[name] = row[0] if row is not None else None
+    return values
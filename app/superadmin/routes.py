@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import os
 import datetime
-from flask import render_template, request, redirect, url_for, flash, send_file, current_app
+from flask import render_template, request, redirect, url_for, flash, send_file, current_app, jsonify
 from flask_login import login_required, current_user
-from sqlalchemy import text
+from sqlalchemy.orm import joinedload
 
-from ..extensions import db
+from ..extensions import db, tenant_engines, company_cache
+from ..tenant_schema import provision
+from .. import company_stats
 from ..models import Company
 from ..tenant_manager import TenantManager
 from . import superadmin_bp
@@ -30,30 +32,29 @@ def superadmin_required(func):
 @login_required
 @superadmin_required
 def dashboard():
-    companies = Company.query.order_by(Company.created_at.desc()).all()
-    # Basic cross-company stats (counts) by connecting to each company's DB
-    tm = TenantManager()
-    stats = []
-    for c in companies:
-        try:
-            from sqlalchemy import create_engine
-            engine = create_engine(c.db_uri)
-            with engine.connect() as conn:
-                properties = conn.execute(text("SELECT COUNT(1) FROM properties")).scalar() if _has_table(conn, "properties") else 0
-                tenants = conn.execute(text("SELECT COUNT(1) FROM users WHERE role='tenant'" )).scalar() if _has_table(conn, "users") else 0
-                contracts = conn.execute(text("SELECT COUNT(1) FROM contracts")).scalar() if _has_table(conn, "contracts") else 0
-            stats.append({"company": c, "properties": properties, "tenants": tenants, "contracts": contracts})
-        except Exception:
-            stats.append({"company": c, "properties": 0, "tenants": 0, "contracts": 0})
-    return render_template("superadmin/dashboard.html", stats=stats)
-
-
-def _has_table(conn, table_name: str) -> bool:
-    try:
-        res = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name=:t"), {"t": table_name})
-        return res.first() is not None
-    except Exception:
-        return False
+    companies = (
+        Company.query.options(joinedload(Company.stats_snapshot))
+        .order_by(Company.created_at.desc())
+        .all()
+    )
+    # Cross-company counts come from the company_stats snapshot; stale or missing
+    # rows are refreshed concurrently in the background (see app/company_stats.py)
+    max_age = datetime.timedelta(seconds=current_app.config.get("COMPANY_STATS_MAX_AGE", 300))
+    stats, stale = company_stats.snapshot(companies, max_age)
+    if stale:
+        company_stats.refresh_in_background(current_app._get_current_object(), stale)
+    return render_template("superadmin/dashboard.html", stats=stats, refreshing=bool(stale))
+
+
+@superadmin_bp.route("/runtime-stats")
+@login_required
+@superadmin_required
+def runtime_stats():
+    """Per-worker cache/registry counters (each gunicorn worker reports its own)."""
+    return jsonify({
+        "tenant_engines": tenant_engines.stats(),
+        "company_cache": company_cache.stats(),
+    })
 
 
 @superadmin_bp.route("/companies")
@@ -81,7 +82,15 @@ def company_create():
             return render_template("superadmin/company_form.html")
 
         tm = TenantManager()
-        spec = tm.build_sqlite_uri(subdomain) if not custom_uri else None
+        try:
+            spec = tm.build_uri(
+                subdomain,
+                current_app.config.get("TENANCY_MODE", "database"),
+                current_app.config.get("TENANT_SHARED_DATABASE_URI"),
+            ) if not custom_uri else None
+        except ValueError as exc:
+            flash(str(exc), "danger")
+            return render_template("superadmin/company_form.html")
         db_uri = custom_uri or spec.uri  # type: ignore[union-attr]
 
         # Create company record in master
@@ -97,7 +106,7 @@ def company_create():
         db.session.commit()
 
         # Ensure tenant DB exists and create schema
-        _provision_tenant_db(db_uri)
+        _provision_tenant_db(c)
 
         # Redirect to setup link page for manager onboarding
         return redirect(url_for("superadmin.company_setup_link", company_id=c.id))
@@ -130,6 +139,7 @@ def company_edit(company_id: int):
         company.is_active = bool(request.form.get("is_active"))
         company.is_archived = bool(request.form.get("is_archived"))
         db.session.commit()
+        company_cache.invalidate(company_id=company.id)
         flash("Company updated", "success")
         return redirect(url_for("superadmin.companies_list"))
     return render_template("superadmin/company_form.html", company=company)
@@ -149,6 +159,10 @@ def company_export(company_id: int):
         if company.db_uri.startswith("sqlite"):  # Use VACUUM INTO export
             tm.export_sqlite(company.db_uri, out_path)
             return send_file(out_path, as_attachment=True)
+        elif tm.schema_name(company.db_uri):  # Schema-per-tenant: pg_dump of one schema
+            out_path = out_path[:-3] + ".dump"
+            tm.export_schema(company.db_uri, out_path)
+            return send_file(out_path, as_attachment=True)
         else:
             flash("Export for non-SQLite is not configured here; use CLI", "info")
             return redirect(url_for("superadmin.companies_list"))
@@ -163,30 +177,25 @@ def company_export(company_id: int):
 def company_delete(company_id: int):
     company = Company.query.get_or_404(company_id)
     db_uri = company.db_uri
+    subdomain = company.subdomain
     db.session.delete(company)
     db.session.commit()
+    company_cache.invalidate(company_id=company_id, subdomain=subdomain)
+    # Release pooled connections before removing the database file
+    tenant_engines.discard(subdomain)
     # Remove tenant DB if SQLite
     try:
         tm = TenantManager()
         if db_uri.startswith("sqlite"): 
             tm.delete_sqlite(db_uri)
+        elif tm.schema_name(db_uri):
+            tm.drop_schema(db_uri)
         flash("Company and database deleted", "success")
     except Exception:
         flash("Company deleted, but database file could not be removed", "warning")
     return redirect(url_for("superadmin.companies_list"))
 
 
-def _provision_tenant_db(db_uri: str) -> None:
-    """Create schema in a new tenant DB by temporarily binding engine to ORM."""
-    from sqlalchemy import create_engine
-    engine = create_engine(db_uri, pool_pre_ping=True)
-    # Temporarily bind db default engine to the tenant engine, then create_all
-    from ..extensions import db as tenant_db
-    engines = tenant_db.engines  # type: ignore[attr-defined]
-    previous_default = engines.get(None)
-    engines[None] = engine
-    try:
-        tenant_db.create_all()
-    finally:
-        if previous_default is not None:
-            engines[None] = previous_default
+def _provision_tenant_db(company: Company) -> None:
+    """Create a new tenant DB (cloned from the SQLite template when possible)."""
+    provision(company)
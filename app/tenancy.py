@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import Engine
+
+
+"""
+Request-scoped tenant routing.
+
+The active tenant engine is stored on ``flask.g`` (one per app/request context), never
+on the process-global ``db.engines`` mapping. Concurrent requests in threaded or gevent
+workers therefore each see their own tenant, and anything resolving the default bind
+(``db.session``, ``db.engine``, ``db.create_all(bind_key=None)``, Alembic) follows it.
+"""
+
+
+def current_tenant_engine() -> Optional[Engine]:
+    if not has_app_context():
+        return None
+    return g.get("tenant_engine")
+
+
+def bind_tenant(engine: Optional[Engine]) -> None:
+    """Route the default bind to ``engine`` for the rest of the current app context."""
+    g.tenant_engine = engine
+
+
+@contextmanager
+def tenant_bound(engine: Engine) -> Iterator[Engine]:
+    """Temporarily route the default bind to ``engine`` (CLI, login, provisioning)."""
+    previous = g.get("tenant_engine")
+    g.tenant_engine = engine
+    try:
+        yield engine
+    finally:
+        g.tenant_engine = previous
+
+
+class _TenantEngines(Mapping):
+    """Read-only view of the app engines with the default (None) key replaced."""
+
+    def __init__(self, engines: Mapping, tenant_engine: Engine) -> None:
+        self._engines = engines
+        self._tenant_engine = tenant_engine
+
+    def __getitem__(self, key):
+        if key is None:
+            return self._tenant_engine
+        return self._engines[key]
+
+    def __iter__(self):
+        return iter(self._engines)
+
+    def __len__(self) -> int:
+        return len(self._engines)
+
+
+class TenantSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy extension whose default bind resolves to the request's tenant engine."""
+
+    @property
+    def engines(self) -> Mapping:
+        engines = super().engines
+        tenant_engine = current_tenant_engine()
+        if tenant_engine is None:
+            return engines
+        return _TenantEngines(engines, tenant_engine)
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+from .sqlite_profile import apply_sqlite_profile
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _EngineEntry:
+    uri: str
+    engine: Engine
+    last_used: float
+    hibernated: bool = False
+    # Schema-per-tenant entries are views (execution_options) of a shared engine
+    shared: bool = False
+
+
+class TenantEngineRegistry:
+    """
+    Bounded, process-wide registry of per-company engines.
+
+    - One engine per tenant key (the company subdomain), created on first use
+    - Least recently used engines are disposed and dropped once ``max_size`` is exceeded
+    - Engines idle for longer than ``idle_timeout`` seconds are hibernated: their pool is
+      disposed (closing its connections) but the entry stays, and the pool reopens lazily
+    - At most ``max_connections`` pooled connections stay open across all tenants; the
+      least recently used idle pools are hibernated to get back under the cap
+    - A daemon reaper thread (``start_reaper``) applies both rules every ``reaper_interval``
+    - Counters and per-tenant open-connection counts are exposed through ``stats()``
+
+    Schema-per-tenant mode: a URI carrying a ``tenant_schema`` query parameter (see
+    ``TenantManager.build_schema_uri``) maps to one engine shared by every tenant of
+    that database. Each tenant gets ``shared.execution_options(tenant_schema=...)`` and
+    ``search_path`` is switched on checkout, so all tenants use a single pool. Shared
+    pools are never hibernated or capped per tenant.
+    """
+
+    def __init__(self, max_size: int = 64, idle_timeout: float = 1800.0,
+                 max_connections: int = 0, reaper_interval: float = 0) -> None:
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.reaper_interval = reaper_interval
+        self._entries: "OrderedDict[str, _EngineEntry]" = OrderedDict()
+        self._shared: dict = {}
+        self._lock = threading.RLock()
+        self._reaper: Optional[threading.Thread] = None
+        self._reaper_pid: Optional[int] = None
+        self._stop = threading.Event()
+        self.sqlite_pragmas: dict = {}
+        self.sqlite_optimize_on_close = True
+        self.shared_pool_size = 10
+        self.shared_max_overflow = 20
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hibernations = 0
+        self.wakeups = 0
+
+    def init_app(self, app) -> None:
+        self.max_size = int(app.config.get("TENANT_ENGINE_MAX_SIZE", self.max_size))
+        self.idle_timeout = float(app.config.get("TENANT_ENGINE_IDLE_TIMEOUT", self.idle_timeout))
+        self.max_connections = int(app.config.get("TENANT_ENGINE_MAX_CONNECTIONS", self.max_connections))
+        self.reaper_interval = float(app.config.get("TENANT_ENGINE_REAPER_INTERVAL", self.reaper_interval))
+        self.sqlite_pragmas = dict(app.config.get("SQLITE_PRAGMAS") or {})
+        self.sqlite_optimize_on_close = bool(app.config.get("SQLITE_OPTIMIZE_ON_CLOSE", True))
+        self.shared_pool_size = int(app.config.get("TENANT_SHARED_POOL_SIZE", self.shared_pool_size))
+        self.shared_max_overflow = int(app.config.get("TENANT_SHARED_MAX_OVERFLOW", self.shared_max_overflow))
+        app.extensions["tenant_engines"] = self
+
+    def get(self, key: str, uri: str) -> Engine:
+        """Return the engine for ``key``, creating it (and evicting others) if needed."""
+        now = time.monotonic()
+        if self.reaper_interval > 0 and self._reaper_pid != os.getpid():
+            # First use, or first use after a fork (threads do not survive fork)
+            self.start_reaper()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.uri == uri:
+                entry.last_used = now
+                if entry.hibernated:
+                    entry.hibernated = False
+                    self.wakeups += 1
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.engine
+            if entry is not None:
+                # The company's DB URI changed; drop the stale engine
+                self._dispose(self._entries.pop(key))
+            self.misses += 1
+            engine, shared = self._create_engine(uri)
+            self._entries[key] = _EngineEntry(uri=uri, engine=engine, last_used=now, shared=shared)
+            while len(self._entries) > max(self.max_size, 1):
+                _, oldest = self._entries.popitem(last=False)
+                self._dispose(oldest)
+                self.evictions += 1
+            return engine
+
+    def for_company(self, company) -> Engine:
+        return self.get(company.subdomain, company.db_uri)
+
+    def keys(self) -> List[str]:
+        """Keys (company subdomains) with an engine in this process, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    def discard(self, key: str) -> None:
+        """Dispose and forget the engine for ``key`` (e.g. before deleting its DB)."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._dispose(entry)
+
+    def dispose_all(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            shared = list(self._shared.values())
+            self._shared.clear()
+        for entry in entries:
+            self._dispose(entry)
+        for engine in shared:
+            engine.dispose()
+
+    def reset_after_fork(self) -> None:
+        """Drop pools inherited from a parent process without closing its connections.
+
+        Call in a freshly forked worker: ``dispose(close=False)`` gives every engine a new
+        pool while leaving the parent's sockets and file handles alone. Entries (and their
+        schema memo) are kept; the reaper is restarted on next ``get``.
+        """
+        self._lock = threading.RLock()
+        self._reaper = None
+        self._reaper_pid = None
+        for entry in self._entries.values():
+            if entry.shared:
+                continue
+            try:
+                entry.engine.dispose(close=False)
+            except Exception:
+                pass
+            entry.hibernated = True
+        for engine in self._shared.values():
+            engine.dispose(close=False)
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """Hibernate idle engines and enforce the connection cap; returns engines hibernated."""
+        now = time.monotonic() if now is None else now
+        hibernated = 0
+        with self._lock:
+            entries = list(self._entries.values())
+        if self.idle_timeout > 0:
+            for entry in entries:
+                if entry.shared or entry.hibernated or now - entry.last_used <= self.idle_timeout:
+                    continue
+                if self._open_connections(entry.engine)[1] == 0:
+                    hibernated += self._hibernate(entry)
+        if self.max_connections > 0:
+            total = sum(self._open_connections(e.engine)[0] for e in entries)
+            # entries are in LRU order: least recently used first
+            for entry in entries:
+                if total <= self.max_connections:
+                    break
+                if entry.shared:
+                    continue
+                opened, checked_out = self._open_connections(entry.engine)
+                if opened == 0 or checked_out:
+                    continue
+                hibernated += self._hibernate(entry)
+                total -= opened
+        return hibernated
+
+    def start_reaper(self) -> None:
+        """Run ``reap`` every ``reaper_interval`` seconds on a daemon thread (once per process)."""
+        with self._lock:
+            if self.reaper_interval <= 0 or self._reaper_pid == os.getpid():
+                return
+            self._reaper_pid = os.getpid()
+            self._stop = threading.Event()
+            stop = self._stop
+            self._reaper = threading.Thread(
+                target=self._run_reaper, args=(stop,), name="tenant-engine-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    def stop_reaper(self) -> None:
+        self._stop.set()
+        self._reaper_pid = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = list(self._entries.items())
+            shared = list(self._shared.items())
+            stats = {
+                "size": len(entries),
+                "max_size": self.max_size,
+                "idle_timeout": self.idle_timeout,
+                "max_connections": self.max_connections,
+                "reaper_interval": self.reaper_interval,
+                "reaper_running": self._reaper_pid == os.getpid(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hibernations": self.hibernations,
+                "wakeups": self.wakeups,
+            }
+        now = time.monotonic()
+        tenants = {}
+        for key, entry in entries:
+            opened, checked_out = (0, 0) if entry.shared else self._open_connections(entry.engine)
+            tenants[key] = {
+                "open": opened,
+                "checked_out": checked_out,
+                "hibernated": entry.hibernated,
+                "shared": entry.shared,
+                "idle_seconds": round(now - entry.last_used, 1),
+            }
+        pools = {}
+        for url, engine in shared:
+            opened, checked_out = self._open_connections(engine)
+            pools[make_url(url).render_as_string(hide_password=True)] = {"open": opened, "checked_out": checked_out}
+        stats["open_connections"] = sum(t["open"] for t in tenants.values()) + sum(p["open"] for p in pools.values())
+        stats["tenants"] = tenants
+        stats["shared_pools"] = pools
+        return stats
+
+    # --- internals ---
+
+    def _run_reaper(self, stop: threading.Event) -> None:
+        while not stop.wait(self.reaper_interval):
+            try:
+                self.reap()
+            except Exception:
+                logger.exception("Tenant engine reaper failed")
+
+    def _hibernate(self, entry: _EngineEntry) -> int:
+        if entry.shared:
+            return 0
+        with self._lock:
+            counted = not entry.hibernated
+            entry.hibernated = True
+            if counted:
+                self.hibernations += 1
+        # Closes the pooled connections; the engine builds a fresh pool on next checkout
+        entry.engine.dispose()
+        return int(counted)
+
+    @staticmethod
+    def _open_connections(engine: Engine) -> tuple:
+        """``(open, checked_out)`` DBAPI connections held by the engine's pool."""
+        pool = engine.pool
+        try:
+            checked_out = pool.checkedout()
+            return pool.checkedin() + checked_out, checked_out
+        except AttributeError:  # pools without counters (NullPool, StaticPool)
+            return 0, 0
+
+    def _create_engine(self, uri: str) -> tuple:
+        """Return ``(engine, shared)`` for ``uri``."""
+        url = make_url(uri)
+        schema = url.query.get("tenant_schema")
+        if schema:
+            return self._shared_engine(url.difference_update_query(["tenant_schema"])).execution_options(
+                tenant_schema=schema
+            ), True
+        engine = create_engine(uri, pool_pre_ping=True)
+        if self.sqlite_pragmas:
+            apply_sqlite_profile(engine, self.sqlite_pragmas, self.sqlite_optimize_on_close)
+        return engine, False
+
+    def _shared_engine(self, url) -> Engine:
+        key = url.render_as_string(hide_password=False)
+        engine = self._shared.get(key)
+        if engine is None:
+            engine = create_engine(
+                url,
+                pool_pre_ping=True,
+                pool_size=self.shared_pool_size,
+                max_overflow=self.shared_max_overflow,
+            )
+            install_search_path(engine)
+            self._shared[key] = engine
+        return engine
+
+    @staticmethod
+    def _dispose(entry: Optional[_EngineEntry]) -> None:
+        if entry is None or entry.shared:
+            return
+        try:
+            entry.engine.dispose()
+        except Exception:
+            pass
+
+
+def install_search_path(engine: Engine) -> None:
+    """Point each checked-out connection at the ``tenant_schema`` of the engine it came from.
+
+    ``SET`` is transactional in PostgreSQL, so it is committed on the raw DBAPI connection
+    before any ORM work starts; the applied schema is remembered on the pooled connection
+    and only re-sent when a connection moves to another tenant.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _fresh_connection(_dbapi_connection, record):
+        record.info.pop("tenant_search_path", None)
+
+    @event.listens_for(engine, "engine_connect")
+    def _set_search_path(conn):
+        schema = conn.get_execution_options().get("tenant_schema") or "public"
+        info = conn.connection.info
+        if info.get("tenant_search_path") == schema:
+            return
+        # Only the tenant schema: with ``public`` appended, checkfirst DDL would see its tables
+        quoted = conn.dialect.identifier_preparer.quote_identifier(schema)
+        dbapi_connection = conn.connection.dbapi_connection
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"SET search_path TO {quoted}")
+        finally:
+            cursor.close()
+        dbapi_connection.commit()
+        info["tenant_search_path"] = schema
+
+
+def tenant_schema_of(engine: Engine) -> Optional[str]:
+    """The PostgreSQL schema a schema-per-tenant engine is bound to (None otherwise)."""
+    return engine.get_execution_options().get("tenant_schema")
@@ -1,11 +1,28 @@
 from __future__ import annotations
 
+import glob
 import os
+import re
+import shutil
+import subprocess
+import uuid
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Optional
 
 from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, make_url
+
+
+def _tmp_name(path: str) -> str:
+    # Unique per call: worker processes and the threads inside each one build side by side
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
 
 @dataclass
@@ -21,6 +38,8 @@ class TenantManager:
     - Build database URI for a company (SQLite by default; supports external URIs)
     - Create/ensure database
     - Export and delete database (SQLite optimized); for others, delegate.
+    - Clone new SQLite tenants from a pre-built template kept per migration head
+    - Schema-per-tenant PostgreSQL: create/export/drop a company's schema in a shared DB
     """
 
     def __init__(self, base_dir: Optional[str] = None) -> None:
@@ -32,22 +51,142 @@ class TenantManager:
         db_path = os.path.abspath(os.path.join(self.base_dir, db_filename))
         return CompanyDatabaseSpec(name=db_filename, uri=f"sqlite:///{db_path}")
 
+    def build_schema_uri(self, subdomain: str, shared_uri: str) -> CompanyDatabaseSpec:
+        """URI of a company schema inside the shared PostgreSQL database (``TENANCY_MODE=schema``)."""
+        schema = "tenant_" + re.sub(r"[^a-z0-9_]", "_", subdomain.lower())
+        url = make_url(shared_uri).update_query_dict({"tenant_schema": schema})
+        return CompanyDatabaseSpec(name=schema, uri=url.render_as_string(hide_password=False))
+
+    def build_uri(self, subdomain: str, mode: str = "database", shared_uri: Optional[str] = None) -> CompanyDatabaseSpec:
+        if mode == "schema":
+            if not shared_uri:
+                raise ValueError("TENANCY_MODE=schema requires TENANT_SHARED_DATABASE_URI")
+            return self.build_schema_uri(subdomain, shared_uri)
+        return self.build_sqlite_uri(subdomain)
+
+    @staticmethod
+    def schema_name(uri: str) -> Optional[str]:
+        if uri.startswith("sqlite"):
+            return None
+        return make_url(uri).query.get("tenant_schema")
+
     def ensure_created(self, uri: str) -> Engine:
         engine = create_engine(uri, pool_pre_ping=True)
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         return engine
 
+    def sqlite_path(self, uri: str) -> Optional[str]:
+        if not uri.startswith("sqlite:///"):
+            return None
+        path = uri.replace("sqlite:///", "", 1).split("?", 1)[0]
+        return path if path and path != ":memory:" else None
+
+    def template_path(self, revision: str) -> str:
+        return os.path.join(self.base_dir, "_templates", f"tenant-{revision}.db")
+
+    def ensure_sqlite_template(self, revision: str, build: Callable[[Engine], None]) -> str:
+        """Return the template for ``revision``, building it with ``build(engine)`` if missing.
+
+        The template is built in a private temp file and moved into place atomically, so
+        concurrent workers never copy a half-built file. Templates for older revisions are
+        removed once the new one exists.
+        """
+        path = self.template_path(revision)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = _tmp_name(path)
+        # Plain engine (rollback journal): the template stays a single self-contained file
+        engine = create_engine(f"sqlite:///{tmp_path}")
+        try:
+            try:
+                build(engine)
+            finally:
+                engine.dispose()
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+        for stale in glob.glob(os.path.join(os.path.dirname(path), "tenant-*.db")):
+            if stale != path:
+                _remove_quietly(stale)
+        return path
+
+    def clone_sqlite(self, template: str, uri: str) -> bool:
+        """Copy ``template`` to the SQLite file behind ``uri``; never overwrites an existing DB."""
+        path = self.sqlite_path(uri)
+        if path is None or os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = _tmp_name(path)
+        try:
+            shutil.copyfile(template, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+        return True
+
     def export_sqlite(self, uri: str, out_file: str) -> str:
         os.makedirs(os.path.dirname(out_file), exist_ok=True)
         engine = create_engine(uri)
-        with engine.begin() as conn:
-            # VACUUM INTO works for SQLite >= 3.27
-            conn.execute(text("VACUUM INTO :out"), {"out": out_file})
+        try:
+            with engine.begin() as conn:
+                # VACUUM INTO works for SQLite >= 3.27
+                conn.execute(text("VACUUM INTO :out"), {"out": out_file})
+        finally:
+            engine.dispose()
+        return out_file
+
+    def ensure_schema_created(self, uri: str) -> None:
+        schema = self.schema_name(uri)
+        engine = self._server_engine(uri)
+        try:
+            with engine.begin() as conn:
+                quoted = conn.dialect.identifier_preparer.quote_identifier(schema)
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {quoted}"))
+        finally:
+            engine.dispose()
+
+    def export_schema(self, uri: str, out_file: str) -> str:
+        """Dump one company schema with ``pg_dump`` (custom format, restorable with pg_restore)."""
+        os.makedirs(os.path.dirname(out_file) or ".", exist_ok=True)
+        url = make_url(uri)
+        env = dict(os.environ)
+        if url.password:
+            env["PGPASSWORD"] = url.password
+        cmd = ["pg_dump", "--format=custom", f"--schema={self.schema_name(uri)}", f"--file={out_file}"]
+        if url.host:
+            cmd.append(f"--host={url.host}")
+        if url.port:
+            cmd.append(f"--port={url.port}")
+        if url.username:
+            cmd.append(f"--username={url.username}")
+        cmd.append(url.database)
+        subprocess.run(cmd, check=True, env=env, capture_output=True)
         return out_file
 
+    def drop_schema(self, uri: str) -> None:
+        schema = self.schema_name(uri)
+        engine = self._server_engine(uri)
+        try:
+            with engine.begin() as conn:
+                quoted = conn.dialect.identifier_preparer.quote_identifier(schema)
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {quoted} CASCADE"))
+        finally:
+            engine.dispose()
+
     def delete_sqlite(self, uri: str) -> None:
-        if uri.startswith("sqlite:///"):
-            path = uri.replace("sqlite:///", "", 1)
-            if os.path.exists(path):
-                os.remove(path)
+        path = self.sqlite_path(uri)
+        if path is not None:
+            # WAL mode keeps -wal/-shm side files next to the database
+            for candidate in (path, f"{path}-wal", f"{path}-shm"):
+                if os.path.exists(candidate):
+                    os.remove(candidate)
+
+    def _server_engine(self, uri: str) -> Engine:
+        """Short-lived engine on the shared database itself (``tenant_schema`` stripped)."""
+        if not self.schema_name(uri):
+            raise ValueError("Not a schema-per-tenant URI")
+        return create_engine(make_url(uri).difference_update_query(["tenant_schema"]))
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy.engine import Engine
+
+
+"""
+Fleet-wide tenant migrations.
+
+``migrate_all`` upgrades every tenant DB listed in the Company registry to the alembic
+head. Tenants are handled in a process pool; each worker builds its own app once and
+runs Flask-Migrate's ``upgrade`` with the tenant engine bound through ``tenant_bound``,
+so ``migrations/env.py`` (which uses ``db.engine``) targets that tenant.
+
+Per-tenant result statuses:
+    current        already at head (only ``alembic_version`` was read)
+    upgraded       migrations applied (``pending`` revisions)
+    initialized    empty DB: tables created and stamped at head
+    unversioned    tables exist but no ``alembic_version``; use ``stamp_unversioned``
+    pending        dry run: ``pending`` revisions would be applied
+    failed         see ``error``
+"""
+
+_worker_app = None
+
+
+def _init_worker() -> None:
+    global _worker_app
+    from . import create_app
+
+    _worker_app = create_app()
+
+
+def read_revision(engine: Engine) -> tuple:
+    """Return ``(revision, has_users_table)`` for a tenant DB without migrating anything."""
+    from .tenant_schema import inspect_state
+
+    state = inspect_state(engine)
+    return state.revision, state.has_table("users")
+
+
+def pending_revisions(script, current: Optional[str], head: str) -> List[str]:
+    """Revision ids between ``current`` (exclusive) and ``head``, oldest first."""
+    if current == head:
+        return []
+    revisions = [rev.revision for rev in script.iterate_revisions(head, current)]
+    return [rev for rev in reversed(revisions) if rev != current]
+
+
+def migrate_tenant(subdomain: str, db_uri: str, dry_run: bool = False,
+                   stamp_unversioned: Optional[str] = None) -> dict:
+    """Bring one tenant DB to head. Must run inside an app context."""
+    from alembic.script import ScriptDirectory
+    from flask_migrate import upgrade
+
+    from .extensions import tenant_engines
+    from .tenancy import tenant_bound
+    from .tenant_schema import head_revision, initialize, migrations_directory, stamp
+
+    started = time.perf_counter()
+    result = {"subdomain": subdomain, "status": "failed", "from": None, "to": None, "pending": 0, "error": None}
+    engine = tenant_engines.get(subdomain, db_uri)
+    try:
+        directory = migrations_directory()
+        script = ScriptDirectory(directory)
+        head = head_revision()
+        result["to"] = head
+        current, has_users = read_revision(engine)
+        result["from"] = current
+        if current is None and has_users:
+            if not stamp_unversioned:
+                result["status"] = "unversioned"
+                return result
+            current = stamp_unversioned
+            if not dry_run:
+                stamp(engine, stamp_unversioned)
+        if current is None:
+            result["pending"] = len(pending_revisions(script, None, head))
+            if dry_run:
+                result["status"] = "pending"
+            else:
+                initialize(engine, head)
+                result["status"] = "initialized"
+            return result
+        pending = pending_revisions(script, current, head)
+        result["pending"] = len(pending)
+        if not pending:
+            result["status"] = "current"
+        elif dry_run:
+            result["status"] = "pending"
+        else:
+            with tenant_bound(engine):
+                upgrade(directory=directory, revision="head")
+            result["status"] = "upgraded"
+    except (Exception, SystemExit) as exc:  # alembic reports some failures through SystemExit
+        result["status"] = "failed"
+        result["error"] = str(exc) or exc.__class__.__name__
+    finally:
+        tenant_engines.discard(subdomain)
+        result["duration"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _run_in_worker(subdomain: str, db_uri: str, dry_run: bool, stamp_unversioned: Optional[str]) -> dict:
+    with _worker_app.app_context():
+        return migrate_tenant(subdomain, db_uri, dry_run, stamp_unversioned)
+
+
+def migrate_all(companies: Iterable, workers: int = 4, dry_run: bool = False,
+                stamp_unversioned: Optional[str] = None,
+                on_result: Optional[Callable[[dict], None]] = None) -> dict:
+    """Migrate ``companies`` in a process pool and return a JSON-serializable summary.
+
+    Workers are spawned (not forked) so they never share engines or sockets with the
+    calling process. ``on_result`` is called in the parent as each tenant finishes.
+    """
+    from .tenant_schema import head_revision
+
+    targets = [(c.subdomain, c.db_uri) for c in companies]
+    started = time.perf_counter()
+    results: List[dict] = []
+    if targets:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=max(1, min(workers, len(targets))),
+            mp_context=ctx,
+            initializer=_init_worker,
+        ) as pool:
+            futures = {
+                pool.submit(_run_in_worker, sub, uri, dry_run, stamp_unversioned): sub
+                for sub, uri in targets
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    result = {"subdomain": futures[future], "status": "failed", "from": None, "to": None,
+                              "pending": 0, "error": str(exc), "duration": None}
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+    counts: dict = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {
+        "head": head_revision(),
+        "dry_run": dry_run,
+        "total": len(results),
+        "counts": counts,
+        "pending_revisions": sum(r["pending"] for r in results if r["status"] == "pending"),
+        "duration": round(time.perf_counter() - started, 3),
+        "failed": {r["subdomain"]: r["error"] for r in results if r["status"] == "failed"},
+        "tenants": sorted(results, key=lambda r: r["subdomain"]),
+    }
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import insert, inspect as sa_inspect, select
+from sqlalchemy.engine import Engine
+
+from .tenant_engines import tenant_schema_of
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SchemaState:
+    """What a worker verified about a tenant DB on first contact."""
+
+    revision: Optional[str]
+    tables: FrozenSet[str]
+
+    def has_table(self, name: str) -> bool:
+        return name in self.tables
+
+
+_states: "weakref.WeakKeyDictionary[Engine, SchemaState]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_heads: dict = {}
+
+
+def migrations_directory() -> str:
+    directory = "migrations"
+    if has_app_context():
+        migrate_ext = current_app.extensions.get("migrate")
+        directory = getattr(migrate_ext, "directory", None) or directory
+        if not os.path.isabs(directory):
+            directory = os.path.join(os.path.dirname(current_app.root_path), directory)
+    return os.path.abspath(directory)
+
+
+def head_revision() -> Optional[str]:
+    """Alembic head of ``migrations/versions`` (read from disk once per process)."""
+    directory = migrations_directory()
+    if directory not in _heads:
+        try:
+            from alembic.script import ScriptDirectory
+
+            _heads[directory] = ScriptDirectory(directory).get_current_head()
+        except Exception:
+            _heads[directory] = None
+    return _heads[directory]
+
+
+def schema_state(engine: Engine) -> Optional[SchemaState]:
+    """Return the cached state for ``engine`` without touching the database."""
+    return _states.get(engine)
+
+
+def forget(engine: Engine) -> None:
+    with _lock:
+        _states.pop(engine, None)
+
+
+def ensure_schema(engine: Engine) -> SchemaState:
+    """Verify a tenant DB once per engine and worker, creating the schema if missing.
+
+    The first call reads the table list and the ``alembic_version`` revision. A DB
+    without a ``users`` table is treated as brand new: all tenant tables are created and
+    it is stamped at the current head. Later calls return the memoized state.
+    """
+    state = _states.get(engine)
+    if state is not None:
+        return state
+    with _lock:
+        state = _states.get(engine)
+        if state is not None:
+            return state
+        state = inspect_state(engine)
+        head = head_revision()
+        if not state.has_table("users"):
+            initialize(engine, head)
+            state = inspect_state(engine)
+        elif head is not None and state.revision != head:
+            logger.warning(
+                "Tenant DB %s is at revision %s, head is %s; run migrations",
+                engine.url.render_as_string(hide_password=True),
+                state.revision,
+                head,
+            )
+        _states[engine] = state
+        return state
+
+
+def initialize(engine: Engine, revision: Optional[str]) -> None:
+    """Create all tenant tables, stamp ``revision`` and seed the default chart of accounts."""
+    from .extensions import db
+    from .models import Account, DEFAULT_ACCOUNTS
+
+    db.metadatas[None].create_all(bind=engine)
+    if revision is not None:
+        stamp(engine, revision)
+    accounts = Account.__table__
+    with engine.begin() as conn:
+        existing = set(conn.execute(select(accounts.c.code)).scalars())
+        rows = [
+            {"code": code, "name": name, "type": acc_type}
+            for code, name, acc_type in DEFAULT_ACCOUNTS.values()
+            if code not in existing
+        ]
+        if rows:
+            conn.execute(insert(accounts), rows)
+
+
+def provision(company) -> Engine:
+    """Create the database of a new company and return its (verified) engine.
+
+    SQLite tenants are copied from the golden template of the current migration head
+    (see ``TenantManager.ensure_sqlite_template``) instead of replaying every DDL
+    statement; schema-per-tenant URIs get their PostgreSQL schema created first. Other
+    backends, existing files and ``TENANT_TEMPLATE_ENABLED=False`` fall back to
+    ``ensure_schema``.
+    """
+    from .extensions import tenant_engines
+    from .tenant_manager import TenantManager
+
+    head = head_revision()
+    tm = TenantManager()
+    if tm.schema_name(company.db_uri):
+        tm.ensure_schema_created(company.db_uri)
+    elif (
+        head is not None
+        and current_app.config.get("TENANT_TEMPLATE_ENABLED", True)
+        and tm.sqlite_path(company.db_uri) is not None
+    ):
+        template = tm.ensure_sqlite_template(head, lambda engine: initialize(engine, head))
+        if tm.clone_sqlite(template, company.db_uri):
+            # Drop any engine opened on the path before the file existed
+            tenant_engines.discard(company.subdomain)
+    engine = tenant_engines.for_company(company)
+    ensure_schema(engine)
+    return engine
+
+
+def stamp(engine: Engine, revision: str) -> None:
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory(migrations_directory())
+    with engine.begin() as conn:
+        MigrationContext.configure(conn).stamp(script, revision)
+
+
+def inspect_state(engine: Engine) -> SchemaState:
+    """Read the table list and alembic revision of a tenant DB (uncached)."""
+    with engine.connect() as conn:
+        # The dialect's default schema is fixed at first connect; name the tenant's explicitly
+        tables = frozenset(sa_inspect(conn).get_table_names(schema=tenant_schema_of(engine)))
+        revision = None
+        if "alembic_version" in tables:
+            from alembic.migration import MigrationContext
+
+            revision = MigrationContext.configure(conn).get_current_revision()
+    return SchemaState(revision=revision, tables=tables)
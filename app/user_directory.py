@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select
+
+from .extensions import db, tenant_engines
+from .models import Company, User, UserDirectory
+
+
+"""
+Global user directory (master bind).
+
+Maps each tenant user's username to the company whose database holds it, so login
+can open exactly one tenant engine instead of probing every company. The phone the
+tenant row stores is kept alongside; it is not a login credential. Writers
+that create tenant users call ``record_user`` before committing.
+"""
+
+
+def record_user(company_id: int, username: str, phone: Optional[str] = None) -> UserDirectory:
+    """Add or refresh the directory entry for a tenant user (caller commits)."""
+    entry = UserDirectory.query.filter_by(company_id=company_id, username=username).first()
+    if entry is None:
+        entry = UserDirectory(company_id=company_id, username=username)
+        db.session.add(entry)
+    entry.phone = phone or None
+    return entry
+
+
+def companies_for_login(username: str) -> List[Company]:
+    """Active companies whose directory lists ``username``."""
+    return (
+        Company.query.join(UserDirectory, UserDirectory.company_id == Company.id)
+        .filter(
+            Company.is_active.is_(True),
+            Company.is_archived.is_(False),
+            UserDirectory.username == username,
+        )
+        .order_by(Company.created_at.asc())
+        .distinct()
+        .all()
+    )
+
+
+def is_empty() -> bool:
+    return UserDirectory.query.first() is None
+
+
+def mark_login(company_id: int, username: str, phone: Optional[str] = None) -> None:
+    """Record a successful login (also self-heals entries missing from the directory)."""
+    record_user(company_id, username, phone).last_login_at = datetime.utcnow()
+
+
+def _read_tenant_users(company_id: int, subdomain: str, db_uri: str) -> tuple:
+    users = User.__table__
+    engine = tenant_engines.get(subdomain, db_uri)
+    with engine.connect() as conn:
+        rows = conn.execute(select(users.c.username, users.c.phone)).all()
+    return company_id, [(r.username, r.phone) for r in rows]
+
+
+def backfill(companies: Iterable[Company], max_workers: int = 8) -> dict:
+    """Rebuild directory entries from the tenant DBs, reading tenants in parallel.
+
+    Returns ``{"companies": n, "users": n, "failed": {subdomain: error}}``.
+    """
+    targets = [(c.id, c.subdomain, c.db_uri) for c in companies]
+    summary = {"companies": 0, "users": 0, "failed": {}}
+    subdomains = {cid: sub for cid, sub, _ in targets}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(_read_tenant_users, *t): t[0] for t in targets}
+        for future in as_completed(futures):
+            try:
+                company_id, rows = future.result()
+            except Exception as exc:
+                summary["failed"][subdomains[futures[future]]] = str(exc)
+                continue
+            existing = {e.username: e for e in UserDirectory.query.filter_by(company_id=company_id)}
+            seen = set()
+            for username, phone in rows:
+                seen.add(username)
+                entry = existing.get(username)
+                if entry is None:
+                    db.session.add(UserDirectory(company_id=company_id, username=username, phone=phone or None))
+                else:
+                    entry.phone = phone or None
+            for username, entry in existing.items():
+                if username not in seen:
+                    db.session.delete(entry)
+            db.session.commit()
+            summary["companies"] += 1
+            summary["users"] += len(rows)
+    return summary
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import List
+
+from flask import Flask
+from sqlalchemy import func
+
+from .extensions import db, tenant_engines, company_cache
+from .tenant_schema import ensure_schema
+
+
+"""
+Worker warm-up.
+
+Moves first-request costs to worker boot: tenant engine creation and the schema check
+done by ``bind_tenant_database``, Company cache misses, Jinja template compilation and
+Babel catalog loading. Enabled with ``create_app(warm_up=True)`` or ``WARMUP_ENABLED``;
+gunicorn workers run it from the hooks in ``gunicorn.conf.py``.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def reset_after_fork(app: Flask = None) -> None:
+    """Make engines inherited from the parent process safe to use in a forked worker."""
+    tenant_engines.reset_after_fork()
+    if app is None:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def recent_companies(limit: int) -> List:
+    """Active companies ordered by most recent login recorded in the user directory."""
+    from .models import Company, UserDirectory
+
+    last_login = (
+        db.session.query(UserDirectory.company_id, func.max(UserDirectory.last_login_at).label("last_login"))
+        .group_by(UserDirectory.company_id)
+        .subquery()
+    )
+    return (
+        Company.query.outerjoin(last_login, last_login.c.company_id == Company.id)
+        .filter(Company.is_active.is_(True), Company.is_archived.is_(False))
+        .order_by(last_login.c.last_login.is_(None), last_login.c.last_login.desc(), Company.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def warm_up(app: Flask, companies: int = None) -> dict:
+    """Preload engines, Company cache, templates and translations; returns a summary."""
+    started = time.perf_counter()
+    limit = app.config.get("WARMUP_COMPANIES", 20) if companies is None else companies
+    summary = {"companies": 0, "failed": [], "templates": 0, "locales": 0}
+    with app.app_context():
+        try:
+            targets = recent_companies(limit) if limit > 0 else []
+        except Exception:
+            logger.exception("Warm-up could not read the company registry")
+            targets = []
+        for company in targets:
+            record = company_cache.put(company)
+            try:
+                engine = tenant_engines.for_company(record)
+                ensure_schema(engine)
+                with engine.connect():
+                    pass
+                summary["companies"] += 1
+            except Exception as exc:
+                summary["failed"].append(f"{company.subdomain}: {exc}")
+        db.session.remove()
+
+        for name in app.jinja_env.list_templates(extensions=("html", "htm", "txt")):
+            try:
+                app.jinja_env.get_template(name)
+                summary["templates"] += 1
+            except Exception:
+                logger.warning("Warm-up could not compile template %s", name)
+
+    from flask_babel import force_locale, get_translations
+
+    with app.test_request_context():
+        for locale in app.config.get("LANGUAGES", {}):
+            with force_locale(locale):
+                get_translations()
+            summary["locales"] += 1
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info("Worker warm-up done: %s", summary)
+    return summary
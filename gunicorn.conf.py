@@ -0,0 +1,28 @@
+"""
+Gunicorn settings: ``gunicorn -c gunicorn.conf.py run:app``
+
+Worker hooks keep engines fork-safe and, with ``WARMUP_ENABLED=1``, warm each worker
+up before it accepts requests (see app/warmup.py).
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+
+def post_fork(server, worker):
+    # With preload_app the app (and any engine it opened) was built in the master
+    from app.warmup import reset_after_fork
+
+    reset_after_fork(worker.app.wsgi() if server.cfg.preload_app else None)
+
+
+def post_worker_init(worker):
+    app = worker.wsgi
+    if getattr(app, "config", {}).get("WARMUP_ENABLED"):
+        from app.warmup import warm_up
+
+        summary = warm_up(app)
+        worker.log.info("Warm-up: %s", summary)
@@ -0,0 +1,33 @@
+"""add data versions
+
+Revision ID: 5b8d3f0e6a21
+Revises: c4e1a9d27b53
+Create Date: 2026-10-17 10:02:17.301845
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8d3f0e6a21'
+down_revision = 'c4e1a9d27b53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_versions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(
+        sa.table('data_versions', sa.column('id'), sa.column('version')),
+        [{'id': 1, 'version': 0}],
+    )
+
+
+def downgrade():
+    op.drop_table('data_versions')
@@ -0,0 +1,48 @@
+"""add fiscal periods
+
+Revision ID: a9c3e6d47f12
+Revises: e2a7c5b91f04
+Create Date: 2026-10-17 14:05:37.281904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e6d47f12'
+down_revision = 'e2a7c5b91f04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('fiscal_periods',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('closed_at', sa.DateTime(), nullable=False),
+    sa.Column('closed_by', sa.String(length=120), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('fiscal_periods', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_fiscal_periods_month'), ['month'], unique=True)
+
+    op.create_table('period_closing_balances',
+    sa.Column('period_id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('debits', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('credits', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['period_id'], ['fiscal_periods.id'], ),
+    sa.PrimaryKeyConstraint('period_id', 'account_id')
+    )
+
+
+def downgrade():
+    op.drop_table('period_closing_balances')
+    with op.batch_alter_table('fiscal_periods', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_fiscal_periods_month'))
+
+    op.drop_table('fiscal_periods')
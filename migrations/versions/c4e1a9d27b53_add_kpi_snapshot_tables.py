@@ -0,0 +1,94 @@
+"""add kpi snapshot tables
+
+Revision ID: c4e1a9d27b53
+Revises: 398c4f4050cb
+Create Date: 2026-10-17 09:12:41.508219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e1a9d27b53'
+down_revision = '398c4f4050cb'
+branch_labels = None
+depends_on = None
+
+
+def _month(column, dialect_name):
+    if dialect_name == 'sqlite':
+        return f"strftime('%Y-%m', {column})"
+    if dialect_name in ('mysql', 'mariadb'):
+        return f"date_format({column}, '%Y-%m')"
+    return f"to_char({column}, 'YYYY-MM')"
+
+
+def upgrade():
+    op.create_table('tenant_kpis',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('monthly_rollups',
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('income', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('expenses', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('month')
+    )
+
+    # Backfill from the existing rows (same definitions as app/kpis.py:compute)
+    bind = op.get_bind()
+    dialect_name = bind.dialect.name
+    # Built with Core so ``key`` (reserved on MySQL/MariaDB) is quoted per dialect
+    kpis = sa.table('tenant_kpis', sa.column('key'), sa.column('value'), sa.column('updated_at'))
+    payments = sa.table('payments', sa.column('amount'), sa.column('status'))
+    expenses = sa.table('expenses', sa.column('amount'))
+    contracts = sa.table('contracts', sa.column('id'), sa.column('status'))
+    paid = payments.c.status == 'paid'
+
+    def total(value):
+        return sa.func.coalesce(sa.func.sum(value), 0)
+
+    def row(key, value, table):
+        return sa.select(sa.literal(key), value, sa.func.current_timestamp()).select_from(table)
+
+    op.execute(sa.insert(kpis).from_select(['key', 'value', 'updated_at'], sa.union_all(
+        row('total_income', total(sa.case((paid, payments.c.amount), else_=0)), payments),
+        row('paid_count', total(sa.case((paid, 1), else_=0)), payments),
+        row('unpaid_count', total(sa.case((paid, 0), else_=1)), payments),
+        row('total_expenses', total(expenses.c.amount), expenses),
+        row('contracts_total', sa.func.count(contracts.c.id), contracts),
+        row('contracts_active', total(sa.case((contracts.c.status == 'active', 1), else_=0)), contracts),
+    )))
+
+    for table, prefix in (('maintenance_requests', 'maint_'), ('complaints', 'comp_')):
+        rows = bind.execute(sa.text(f"SELECT status, COUNT(id) FROM {table} GROUP BY status")).fetchall()
+        counts = {}
+        for status, count in rows:
+            key = f"{prefix}{status or 'new'}"
+            counts[key] = counts.get(key, 0) + count
+        if counts:
+            op.bulk_insert(kpis, [{'key': key, 'value': value} for key, value in counts.items()])
+
+    now = 'CURRENT_TIMESTAMP'
+    income_month = _month('COALESCE(paid_date, due_date)', dialect_name)
+    expense_month = _month('spent_at', dialect_name)
+    op.execute(f"""
+        INSERT INTO monthly_rollups (month, income, expenses, updated_at)
+        SELECT month, SUM(income), SUM(expenses), {now} FROM (
+            SELECT {income_month} AS month, amount AS income, 0 AS expenses
+            FROM payments WHERE status = 'paid' AND COALESCE(paid_date, due_date) IS NOT NULL
+            UNION ALL
+            SELECT {expense_month} AS month, 0 AS income, amount AS expenses
+            FROM expenses WHERE spent_at IS NOT NULL
+        ) AS movements
+        GROUP BY month
+    """)
+
+
+def downgrade():
+    op.drop_table('monthly_rollups')
+    op.drop_table('tenant_kpis')
@@ -0,0 +1,26 @@
+"""index posting outbox source
+
+Revision ID: c8d1f4a2e7b9
+Revises: b4e9d2a71c36
+Create Date: 2026-10-17 23:41:08.215734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8d1f4a2e7b9'
+down_revision = 'b4e9d2a71c36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('posting_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_posting_outbox_source', ['source_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('posting_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_posting_outbox_source')
@@ -0,0 +1,45 @@
+"""unique journal entry source
+
+Revision ID: d71f0b3a8c45
+Revises: a9c3e6d47f12
+Create Date: 2026-10-17 16:42:09.735118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd71f0b3a8c45'
+down_revision = 'a9c3e6d47f12'
+branch_labels = None
+depends_on = None
+
+SOURCES = "source IN ('invoice', 'payment', 'expense')"
+
+
+def upgrade():
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(
+        f"SELECT source, source_id, COUNT(*) FROM journal_entries WHERE {SOURCES} "
+        "GROUP BY source, source_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        listed = ", ".join(f"{source} #{source_id} ({count}x)" for source, source_id, count in duplicates[:20])
+        raise RuntimeError(
+            f"journal_entries has {len(duplicates)} duplicated postings ({listed}); "
+            "remove the extra entries and their lines, then rerun the migration"
+        )
+
+    # Partial index (reversals may repeat); MySQL has none, so it only gets a plain index
+    unique = bind.dialect.name not in ('mysql', 'mariadb')
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.create_index(
+            'uq_journal_entries_source', ['source', 'source_id'], unique=unique,
+            sqlite_where=sa.text(SOURCES), postgresql_where=sa.text(SOURCES),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.drop_index('uq_journal_entries_source')
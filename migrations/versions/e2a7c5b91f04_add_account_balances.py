@@ -0,0 +1,54 @@
+"""add account balances
+
+Revision ID: e2a7c5b91f04
+Revises: 5b8d3f0e6a21
+Create Date: 2026-10-17 11:20:53.614027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7c5b91f04'
+down_revision = '5b8d3f0e6a21'
+branch_labels = None
+depends_on = None
+
+
+def _month(column, dialect_name):
+    if dialect_name == 'sqlite':
+        return f"strftime('%Y-%m', {column})"
+    if dialect_name in ('mysql', 'mariadb'):
+        return f"date_format({column}, '%Y-%m')"
+    return f"to_char({column}, 'YYYY-MM')"
+
+
+def upgrade():
+    op.create_table('account_balances',
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('debits', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('credits', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('account_id', 'month')
+    )
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_journal_entries_date'), ['date'], unique=False)
+
+    # Backfill from the existing journal (same definition as app/accounting.py:compute)
+    month = _month('journal_entries.date', op.get_bind().dialect.name)
+    op.execute(f"""
+        INSERT INTO account_balances (account_id, month, debits, credits, updated_at)
+        SELECT journal_lines.account_id, {month}, SUM(journal_lines.debit), SUM(journal_lines.credit), CURRENT_TIMESTAMP
+        FROM journal_lines JOIN journal_entries ON journal_entries.id = journal_lines.entry_id
+        GROUP BY journal_lines.account_id, {month}
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_journal_entries_date'))
+
+    op.drop_table('account_balances')
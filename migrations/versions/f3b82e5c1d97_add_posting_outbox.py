@@ -0,0 +1,42 @@
+"""add posting outbox
+
+Revision ID: f3b82e5c1d97
+Revises: d71f0b3a8c45
+Create Date: 2026-10-17 18:03:26.410552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b82e5c1d97'
+down_revision = 'd71f0b3a8c45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('posting_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=30), nullable=False),
+    sa.Column('source_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('claim', sa.String(length=32), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('posting_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_posting_outbox_status_available', ['status', 'available_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('posting_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_posting_outbox_status_available')
+
+    op.drop_table('posting_outbox')
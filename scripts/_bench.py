@@ -0,0 +1,91 @@
+"""Shared setup for the ``scripts/bench_*.py`` benchmarks.
+
+Every benchmark runs the app in-process on throwaway databases under a temporary
+directory: it provisions companies with ``flask tenant-create`` and signs in as the
+company admin through the setup link, like a real first login. ``--root`` points
+a benchmark at another checkout (for instance a ``git worktree`` of the commit
+before a change), so before/after numbers come from the same script.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Optional
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def parser(description: str) -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--root", default=REPO_ROOT, help="Checkout to benchmark (default: this one)")
+    p.add_argument("--workdir", default=None, help="Directory for the databases (default: a new temp dir)")
+    return p
+
+
+def build_app(root: str, workdir: Optional[str] = None, **env: str):
+    """Create the app of checkout ``root`` with master/tenant databases in ``workdir``.
+
+    ``env`` is applied before the app is imported, because ``Config`` reads the
+    environment at import time. Background threads and the shared tenant template
+    are switched off so a run leaves nothing behind outside ``workdir``.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_")
+    settings = {
+        "MASTER_DATABASE_URI": f"sqlite:///{workdir}/master.db",
+        "TENANT_DEFAULT_DATABASE_URI": f"sqlite:///{workdir}/default.db",
+        "COMPANY_DB_DIR": os.path.join(workdir, "companies"),
+        "TENANT_ENGINE_REAPER_INTERVAL": "0",
+        "TENANT_TEMPLATE_ENABLED": "0",
+        "POSTING_WORKER_ENABLED": "0",
+    }
+    settings.update(env)
+    os.environ.update(settings)
+    sys.path.insert(0, os.path.abspath(root))
+
+    from app import create_app
+
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["BENCH_WORKDIR"] = workdir
+    return app
+
+
+def create_company(app, subdomain: str, db_uri: Optional[str] = None) -> int:
+    """Provision a company through the CLI and return its id."""
+    from app.models import Company
+
+    args = ["tenant-create", "--name", subdomain.title(), "--subdomain", subdomain]
+    if db_uri is None and "TENANCY_MODE" not in os.environ:
+        db_uri = f"sqlite:///{app.config['BENCH_WORKDIR']}/{subdomain}.db"
+    if db_uri:
+        args += ["--db-uri", db_uri]
+    result = app.test_cli_runner().invoke(args=args)
+    if result.exit_code != 0:
+        raise SystemExit(f"tenant-create {subdomain} failed: {result.output}")
+    with app.app_context():
+        return Company.query.filter_by(subdomain=subdomain).one().id
+
+
+def signed_in_client(app, company_id: int, username: str = "boss", password: str = "pw"):
+    """A test client logged in as the company admin created through the setup link."""
+    from itsdangerous import URLSafeTimedSerializer
+
+    token = URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="company-setup").dumps(company_id)
+    client = app.test_client()
+    client.post(f"/setup/{token}", data={
+        "username": username, "password": password, "password2": password, "phone": f"9{company_id:04d}",
+    })
+    response = client.post("/login", data={"username": username, "password": password})
+    if response.status_code != 302:
+        raise SystemExit(f"login as {username} failed with {response.status_code}")
+    return client
+
+
+def timed(fn, *args, **kwargs):
+    """``(result, seconds)`` of one call."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
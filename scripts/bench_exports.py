@@ -0,0 +1,131 @@
+"""Peak memory and time of one Excel export request on a large tenant.
+
+Bulk-loads ``--rows`` payments (every other one with an invoice) and expenses into
+one SQLite tenant, then downloads one export and reports the peak growth of RSS
+and of anonymous memory (``RssAnon``: the Python heap, without SQLite's mmap'd
+pages) during the request. Linux only (reads ``/proc/self/status``). Compare two
+checkouts, e.g.::
+
+    git worktree add /tmp/before <commit>^
+    python scripts/bench_exports.py --root /tmp/before --rows 100000 --export payments
+    python scripts/bench_exports.py --rows 100000 --export payments
+
+``--digest`` prints a SHA-1 of the sheet's cell values to check that two checkouts
+export the same data (``--sort-rows`` ignores the order of rows with equal dates).
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import io
+import random
+import resource
+import sqlite3
+import threading
+import time
+
+from _bench import build_app, create_company, parser, signed_in_client
+
+EXPORTS = {
+    "payments": "/accountant/export/excel",
+    "invoices": "/accountant/invoices/export.xlsx",
+    "expenses": "/accountant/expenses/export.xlsx",
+}
+
+
+def _status_kb(field: str) -> int:
+    with open("/proc/self/status") as fh:
+        return int(fh.read().split(f"{field}:")[1].split()[0])
+
+
+def _seed(path: str, rows: int) -> None:
+    random.seed(1)
+    base = datetime.date(2020, 1, 1)
+    now = datetime.datetime.utcnow().isoformat(" ")
+    con = sqlite3.connect(path)
+    con.execute("INSERT INTO users (username, password_hash, role, created_at) VALUES ('tenant', 'x', 'tenant', ?)", (now,))
+    con.execute("INSERT INTO properties (title, price, status, property_type, created_at) VALUES ('P1', 800, 'occupied', 'apartment', ?)", (now,))
+    tenant_id = con.execute("SELECT id FROM users WHERE username = 'tenant'").fetchone()[0]
+    con.execute(
+        "INSERT INTO contracts (property_id, tenant_id, start_date, end_date, rent_amount, status, created_at)"
+        " VALUES (1, ?, '2020-01-01', '2030-12-31', 800, 'active', ?)", (tenant_id, now),
+    )
+
+    def payment(i):
+        due = base + datetime.timedelta(days=i % 2000)
+        paid = i % 3 != 0
+        return (random.randint(100, 2000), due.isoformat(), due.isoformat() if paid else None,
+                "cash" if i % 2 else None, "paid" if paid else "unpaid", now)
+
+    con.executemany(
+        "INSERT INTO payments (contract_id, amount, due_date, paid_date, method, status, created_at) VALUES (1, ?, ?, ?, ?, ?, ?)",
+        (payment(i) for i in range(rows)),
+    )
+    con.executemany(
+        "INSERT INTO invoices (payment_id, file_path, created_at) VALUES (?, ?, ?)",
+        ((i, f"invoices/invoice_{i}.pdf", now) for i in range(1, rows + 1, 2)),
+    )
+    con.executemany(
+        "INSERT INTO expenses (description, amount, category, vendor, spent_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"expense {i}", random.randint(10, 500), "repairs" if i % 2 else None, "ACME" if i % 3 else None,
+          (base + datetime.timedelta(days=i % 2000)).isoformat(), now) for i in range(rows)),
+    )
+    con.commit()
+    con.close()
+
+
+def _digest(body: bytes, sort_rows: bool) -> str:
+    import openpyxl
+
+    sheet = openpyxl.load_workbook(io.BytesIO(body), read_only=True).worksheets[0]
+    rows = list(sheet.iter_rows(values_only=True))
+    if sort_rows:
+        rows = rows[:1] + sorted(rows[1:], key=repr)
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(repr(row).encode())
+    return f"{sheet.title} {digest.hexdigest()}"
+
+
+def main() -> None:
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--export", choices=sorted(EXPORTS), default="payments")
+    p.add_argument("--digest", action="store_true")
+    p.add_argument("--sort-rows", action="store_true")
+    args = p.parse_args()
+
+    app = build_app(args.root, args.workdir)
+    client = signed_in_client(app, create_company(app, "acme"))
+    endpoint = EXPORTS[args.export]
+    client.get(endpoint)  # imports and caches, on the empty tenant
+    _seed(f"{app.config['BENCH_WORKDIR']}/acme.db", args.rows)
+
+    rss_before = _status_kb("VmRSS")
+    anon_before = anon_peak = _status_kb("RssAnon")
+    done = threading.Event()
+
+    def sample():
+        nonlocal anon_peak
+        while not done.is_set():
+            anon_peak = max(anon_peak, _status_kb("RssAnon"))
+            time.sleep(0.02)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    response = client.get(endpoint)
+    body = response.get_data()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+
+    print(f"{args.root} {args.export} rows={args.rows}: status {response.status_code}, {len(body) / 1e6:.1f} MB file")
+    print(f"  peak RSS +{(rss_peak - rss_before) / 1024:.0f} MB, anon +{(anon_peak - anon_before) / 1024:.0f} MB, {elapsed:.1f} s")
+    if args.digest:
+        print(f"  sheet {_digest(body, args.sort_rows)}")
+
+
+if __name__ == "__main__":
+    main()
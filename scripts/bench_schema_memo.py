@@ -0,0 +1,38 @@
+"""Request throughput of the per-request tenant hooks (schema readiness memo).
+
+Signs in to one SQLite tenant and times ``/set-lang/en``: the language switch does
+no work of its own, so the time is the ``before_request`` hooks (company lookup,
+tenant binding, schema check) plus the redirect. Compare two checkouts, e.g.::
+
+    git worktree add /tmp/before <commit>^
+    python scripts/bench_schema_memo.py --root /tmp/before
+    python scripts/bench_schema_memo.py
+"""
+from __future__ import annotations
+
+import statistics
+
+from _bench import build_app, create_company, parser, signed_in_client, timed
+
+
+def main() -> None:
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--runs", type=int, default=5)
+    args = p.parse_args()
+
+    app = build_app(args.root, args.workdir)
+    client = signed_in_client(app, create_company(app, "acme"))
+    for _ in range(50):
+        client.get("/set-lang/en")
+
+    rates = []
+    for _ in range(args.runs):
+        _, seconds = timed(lambda: [client.get("/set-lang/en") for _ in range(args.requests)])
+        rates.append(args.requests / seconds)
+    print(f"{args.root}: {args.requests} requests x {args.runs} runs")
+    print(f"  req/s min {min(rates):.0f}  median {statistics.median(rates):.0f}  max {max(rates):.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Server connections and request latency of database- vs schema-per-tenant PostgreSQL.
+
+Provisions ``--tenants`` companies on the PostgreSQL server at ``--database-url``,
+either one database each (``--mode database``; the URL's user needs CREATEDB) or one
+schema each inside that database (``--mode schema``, ``TENANCY_MODE=schema``). Then
+``--threads`` clients per tenant request the accountant dashboard round-robin. It
+reports latency percentiles and the peak number of server connections the run held
+open (sampled from ``pg_stat_activity``). Run once per mode; ``Config`` reads the
+tenancy mode at import time::
+
+    python scripts/bench_schema_tenancy.py --database-url postgresql://u:p@host/bench --mode database
+    python scripts/bench_schema_tenancy.py --database-url postgresql://u:p@host/bench --mode schema
+
+Everything it creates (databases ``bench_<tag>_*`` or schemas ``tenant_bench_<tag>_*``)
+is dropped at the end unless ``--keep`` is given.
+"""
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, make_url, text
+
+from _bench import build_app, create_company, parser, signed_in_client
+
+
+def _server_connections(monitor, user: str) -> int:
+    with monitor.connect() as conn:
+        return conn.execute(
+            text("SELECT count(*) FROM pg_stat_activity WHERE usename = :user AND pid <> pg_backend_pid()"),
+            {"user": user},
+        ).scalar_one()
+
+
+def main() -> None:
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument("--database-url", required=True, help="PostgreSQL URL (psycopg2) of an existing database")
+    p.add_argument("--mode", choices=("database", "schema"), required=True)
+    p.add_argument("--tenants", type=int, default=20)
+    p.add_argument("--threads", type=int, default=4)
+    p.add_argument("--requests", type=int, default=50, help="Requests per tenant and thread")
+    p.add_argument("--keep", action="store_true", help="Leave the tenant databases/schemas in place")
+    args = p.parse_args()
+
+    url = make_url(args.database_url)
+    tag = uuid.uuid4().hex[:6]
+    subdomains = [f"bench_{tag}_{n}" for n in range(args.tenants)]
+    env = {"TENANCY_MODE": "schema", "TENANT_SHARED_DATABASE_URI": args.database_url} if args.mode == "schema" else {}
+    app = build_app(args.root, args.workdir, **env)
+    # The app package comes from --root, so it is importable only from here on
+    from app.extensions import tenant_engines
+    from app.models import Company
+    from app.tenant_manager import TenantManager
+
+    admin = create_engine(url, isolation_level="AUTOCOMMIT")
+    monitor = create_engine(url, pool_size=1, max_overflow=0)
+    try:
+        ids = {}
+        for sub in subdomains:
+            db_uri = None
+            if args.mode == "database":
+                with admin.connect() as conn:
+                    conn.execute(text(f'CREATE DATABASE "{sub}"'))
+                db_uri = url.set(database=sub).render_as_string(hide_password=False)
+            ids[sub] = create_company(app, sub, db_uri)
+        clients = [
+            {sub: signed_in_client(app, ids[sub], username=f"boss_{sub}") for sub in subdomains}
+            for _ in range(args.threads)
+        ]
+        baseline = _server_connections(monitor, url.username)
+
+        peak = [0]
+        done = threading.Event()
+
+        def sample():
+            while not done.is_set():
+                peak[0] = max(peak[0], _server_connections(monitor, url.username) - baseline)
+                time.sleep(0.05)
+
+        def browse(by_tenant):
+            latencies = []
+            for _ in range(args.requests):
+                for client in by_tenant.values():
+                    start = time.perf_counter()
+                    response = client.get("/accountant/")
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        raise SystemExit(f"/accountant/ returned {response.status_code}")
+            return latencies
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            latencies = [value for chunk in pool.map(browse, clients) for value in chunk]
+        elapsed = time.perf_counter() - start
+        done.set()
+        sampler.join()
+        held = _server_connections(monitor, url.username) - baseline
+
+        ms = sorted(value * 1000 for value in latencies)
+        print(f"mode={args.mode} tenants={args.tenants} threads={args.threads} requests={len(ms)}")
+        print(f"  throughput {len(ms) / elapsed:.0f} req/s")
+        print(f"  latency ms p50 {statistics.median(ms):.1f}  p95 {ms[int(len(ms) * 0.95) - 1]:.1f}  max {ms[-1]:.1f}")
+        print(f"  server connections: peak {peak[0]}, still pooled after the run {held}")
+    finally:
+        tenant_engines.dispose_all()
+        if not args.keep:
+            if args.mode == "schema":
+                with app.app_context():
+                    for company in Company.query.filter(Company.subdomain.in_(subdomains)):
+                        TenantManager().drop_schema(company.db_uri)
+            else:
+                with admin.connect() as conn:
+                    for sub in subdomains:
+                        conn.execute(text(f'DROP DATABASE IF EXISTS "{sub}"'))
+        admin.dispose()
+        monitor.dispose()
+
+
+if __name__ == "__main__":
+    main()
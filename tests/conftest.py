@@ -0,0 +1,104 @@
+"""Shared fixtures: an app on throwaway SQLite master/tenant databases."""
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+import pytest
+from itsdangerous import URLSafeTimedSerializer
+from sqlalchemy import event
+
+from app import create_app
+from app.config import Config
+from app.extensions import company_cache, db, tenant_engines
+from app.models import Company
+from app.tenancy import tenant_bound
+
+
+@pytest.fixture()
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SECRET_KEY = "test-secret"
+        MASTER_DATABASE_URI = f"sqlite:///{tmp_path}/master.db"
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path}/default.db"
+        SQLALCHEMY_BINDS = {}
+        WTF_CSRF_ENABLED = False
+        # No background threads and nothing written into companies/_templates
+        TENANT_ENGINE_REAPER_INTERVAL = 0
+        TENANT_TEMPLATE_ENABLED = False
+        POSTING_WORKER_ENABLED = False
+
+    app = create_app(TestConfig)
+    app.config["DB_DIR"] = str(tmp_path)
+    yield app
+    # The registries are process-wide; the next test gets fresh databases
+    tenant_engines.dispose_all()
+    company_cache.clear()
+
+
+@pytest.fixture()
+def make_tenant(app):
+    """``make_tenant("acme")`` provisions a company database and returns the company id."""
+
+    def make(subdomain: str) -> int:
+        uri = f"sqlite:///{app.config['DB_DIR']}/{subdomain}.db"
+        result = app.test_cli_runner().invoke(
+            args=["tenant-create", "--name", subdomain.title(), "--subdomain", subdomain, "--db-uri", uri]
+        )
+        assert result.exit_code == 0, result.output
+        with app.app_context():
+            return Company.query.filter_by(subdomain=subdomain).one().id
+
+    return make
+
+
+@pytest.fixture()
+def in_tenant(app):
+    """``with in_tenant("acme"):`` runs ORM code against that company's database."""
+
+    @contextmanager
+    def bound(subdomain: str):
+        with app.app_context():
+            company = Company.query.filter_by(subdomain=subdomain).one()
+            with tenant_bound(tenant_engines.for_company(company)):
+                try:
+                    yield
+                finally:
+                    db.session.remove()
+
+    return bound
+
+
+@pytest.fixture()
+def login(app):
+    """``login(client, company_id)`` creates the company admin through setup and signs in."""
+
+    def sign_in(client, company_id: int, username: str = "boss", password: str = "pw") -> None:
+        token = URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="company-setup").dumps(company_id)
+        client.post(f"/setup/{token}", data={
+            "username": username, "password": password, "password2": password, "phone": "900",
+        })
+        response = client.post("/login", data={"username": username, "password": password})
+        assert response.status_code == 302, response.data
+
+    return sign_in
+
+
+@pytest.fixture()
+def count_statements():
+    """``with count_statements(engine) as statements:`` collects the SQL sent on ``engine``."""
+
+    @contextmanager
+    def counting(engine):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    return counting
@@ -0,0 +1,7 @@
+def test_login_accepts_the_username_only(app, make_tenant, login):
+    company_id = make_tenant("acme")
+    login(app.test_client(), company_id, username="boss", password="pw")  # setup stores phone "900"
+
+    response = app.test_client().post("/login", data={"username": "900", "password": "pw"})
+    assert response.status_code == 200
+    assert b"Invalid credentials" in response.data
@@ -0,0 +1,33 @@
+import threading
+import time
+
+from app import company_stats
+from app.models import Company
+
+
+def test_a_hung_tenant_times_out_alone(app, make_tenant, monkeypatch):
+    ids = {name: make_tenant(name) for name in ("alpha", "beta", "gamma")}
+    release = threading.Event()
+    collect = company_stats.collect
+
+    def hang_on_alpha(subdomain, db_uri):
+        if subdomain == "alpha":
+            release.wait(30)
+        return collect(subdomain, db_uri)
+
+    monkeypatch.setattr(company_stats, "collect", hang_on_alpha)
+    try:
+        with app.app_context():
+            companies = Company.query.order_by(Company.id).all()
+            start = time.monotonic()
+            # One worker: beta and gamma only start once alpha has been given up on
+            results = company_stats.refresh(companies, max_workers=1, timeout=0.5)
+            elapsed = time.monotonic() - start
+    finally:
+        release.set()
+
+    assert results[ids["alpha"]] == {"error": "timeout"}
+    assert "error" not in results[ids["beta"]]
+    assert "error" not in results[ids["gamma"]]
+    assert elapsed < 2
+    assert all(t.daemon for t in threading.enumerate() if t.name == "company-stats")
@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+
+from app.extensions import db
+from app.models import Complaint, Contract, Expense, Invoice, MaintenanceRequest, Payment, Property, User
+
+# Statements a signed-in GET /accountant/ may send to the tenant DB: the user load,
+# the data-version read behind the ETag, the payments listing, KPI metrics, monthly
+# series, recent properties and recent contracts
+QUERY_BUDGET = 7
+
+
+def _seed(contracts=8):
+    today = date.today()
+    tenant = User(username="t1", role="tenant")
+    tenant.set_password("x")
+    db.session.add(tenant)
+    db.session.flush()
+    for n in range(contracts):
+        prop = Property(title=f"P{n}", price=500 + n, status="occupied" if n % 2 else "available")
+        db.session.add(prop)
+        db.session.flush()
+        contract = Contract(property_id=prop.id, tenant_id=tenant.id, start_date=today - timedelta(days=90),
+                            end_date=today + timedelta(days=270), rent_amount=500 + n)
+        db.session.add(contract)
+        db.session.flush()
+        for k in range(4):
+            due = today + timedelta(days=30 * (k - 2))
+            paid = k < 2
+            payment = Payment(contract_id=contract.id, amount=500 + n, due_date=due,
+                              paid_date=due if paid else None, status="paid" if paid else "unpaid")
+            db.session.add(payment)
+            db.session.flush()
+            if paid:
+                db.session.add(Invoice(payment_id=payment.id, file_path=f"invoices/{payment.id}.pdf"))
+        db.session.add(MaintenanceRequest(tenant_id=tenant.id, property_id=prop.id, title="tap", description="leak"))
+        db.session.add(Complaint(tenant_id=tenant.id, subject="noise", description="late music"))
+        db.session.add(Expense(description="repairs", amount=40 + n, spent_at=today - timedelta(days=n)))
+    db.session.commit()
+
+
+def test_accountant_dashboard_stays_within_query_budget(app, make_tenant, in_tenant, login, count_statements):
+    company_id = make_tenant("acme")
+    client = app.test_client()
+    login(client, company_id)
+    with in_tenant("acme"):
+        _seed()
+        engine = db.engines[None]
+    # First request warms the schema and template caches
+    client.get("/accountant/")
+    with count_statements(engine) as statements:
+        response = client.get("/accountant/")
+    assert response.status_code == 200
+    assert b"P7" in response.data
+    assert len(statements) <= QUERY_BUDGET, statements
@@ -0,0 +1,74 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import kpis
+from app.extensions import db
+from app.models import Contract, Expense, Payment, Property, User
+
+
+def _snapshot_drift():
+    conn = db.session.connection(bind_arguments={"mapper": Payment.__mapper__})
+    return kpis.diff(kpis.compute(conn), kpis.read(conn))
+
+
+@pytest.fixture()
+def acme(make_tenant, in_tenant):
+    make_tenant("acme")
+    with in_tenant("acme"):
+        tenant = User(username="t1", role="tenant")
+        tenant.set_password("x")
+        prop = Property(title="P1", price=800)
+        db.session.add_all([tenant, prop])
+        db.session.flush()
+        contract = Contract(property_id=prop.id, tenant_id=tenant.id, start_date=date(2026, 1, 1),
+                            end_date=date(2026, 12, 31), rent_amount=800)
+        db.session.add(contract)
+        db.session.flush()
+        db.session.add(Payment(contract_id=contract.id, amount=800, due_date=date(2026, 3, 1),
+                               paid_date=date(2026, 3, 2), status="paid"))
+        db.session.commit()
+    return "acme"
+
+
+def test_snapshot_follows_orm_writes(acme, in_tenant):
+    with in_tenant(acme):
+        payment = Payment.query.one()
+        payment.amount = 950
+        db.session.add(Expense(description="paint", amount=120, spent_at=date(2026, 3, 5)))
+        db.session.commit()
+        assert _snapshot_drift() == {}
+        conn = db.session.connection()
+        totals, months = kpis.read(conn)
+        assert totals["total_income"] == Decimal("950.00")
+        assert months[("2026-03", "expenses")] == Decimal("120.00")
+
+
+def test_failed_flush_does_not_leak_deltas_into_next_flush(acme, in_tenant):
+    with in_tenant(acme):
+        payment = Payment.query.one()
+        # The update's "old value" delta is captured before the flush, then the
+        # invalid insert aborts the flush and the session rolls back
+        payment.amount = 1000
+        db.session.add(Payment(contract_id=payment.contract_id, amount=None, due_date=date(2026, 4, 1)))
+        with pytest.raises(IntegrityError):
+            db.session.flush()
+        db.session.rollback()
+
+        db.session.add(Expense(description="paint", amount=50, spent_at=date(2026, 3, 5)))
+        db.session.commit()
+        assert _snapshot_drift() == {}
+
+
+def test_rollback_discards_captured_deltas(acme, in_tenant):
+    with in_tenant(acme):
+        payment = Payment.query.one()
+        payment.status = "unpaid"
+        db.session.flush()
+        db.session.rollback()
+
+        db.session.add(Expense(description="paint", amount=50, spent_at=date(2026, 3, 5)))
+        db.session.commit()
+        assert _snapshot_drift() == {}
@@ -0,0 +1,134 @@
+from datetime import date
+
+from sqlalchemy import func, select, text, update
+
+from app import bulk_payments, posting
+from app.accounting import default_account_ids
+from app.extensions import db, tenant_engines
+from app.models import Contract, JournalEntry, JournalLine, Payment, PostingTask, Property, User
+from app.posting import PostingWorker
+
+
+def _payment(status: str = "unpaid") -> Payment:
+    tenant = User(username="t1", role="tenant")
+    tenant.set_password("x")
+    prop = Property(title="P1", price=800)
+    db.session.add_all([tenant, prop])
+    db.session.flush()
+    contract = Contract(property_id=prop.id, tenant_id=tenant.id, start_date=date(2026, 1, 1),
+                        end_date=date(2026, 12, 31), rent_amount=800)
+    db.session.add(contract)
+    db.session.flush()
+    payment = Payment(contract_id=contract.id, amount=800, due_date=date(2026, 3, 1), status=status)
+    db.session.add(payment)
+    db.session.commit()
+    return payment
+
+
+def _mark(payment: Payment, status: str) -> None:
+    # What /accountant/payments/<id>/mark does
+    payment.status = status
+    if status == "paid":
+        payment.paid_date = date(2026, 3, 2)
+    posting.enqueue("payment" if status == "paid" else "payment_reverse", payment.id)
+    db.session.commit()
+
+
+def _cash_balance() -> float:
+    cash = default_account_ids()["cash"]
+    return float(db.session.execute(
+        select(func.coalesce(func.sum(JournalLine.debit - JournalLine.credit), 0)).where(JournalLine.account_id == cash)
+    ).scalar_one())
+
+
+def _sources() -> list:
+    return db.session.execute(select(JournalEntry.source).order_by(JournalEntry.id)).scalars().all()
+
+
+def test_worker_sweeps_only_tenants_this_process_has_served(app, make_tenant):
+    ids = {name: make_tenant(name) for name in ("alpha", "beta", "gamma")}
+    tenant_engines.discard("beta")
+    tenant_engines.discard("gamma")
+    worker = PostingWorker()
+    worker.init_app(app)
+
+    assert worker._swept_companies() == [ids["alpha"]]
+
+
+def test_reversal_waits_for_the_receipt_another_worker_holds(make_tenant, in_tenant):
+    make_tenant("acme")
+    with in_tenant("acme"):
+        payment = _payment()
+        _mark(payment, "paid")
+        held = posting._claim(10, 120)  # a first worker holds the receipt...
+        assert [task.kind for task in held] == ["payment"]
+        _mark(payment, "unpaid")
+        assert posting.drain() == {"done": 0, "retried": 0, "failed": 0}  # ...so a second one waits
+
+        for task in held:
+            posting._complete(task)
+        db.session.commit()
+        assert posting.drain()["done"] == 1
+        assert set(db.session.execute(select(PostingTask.status)).scalars()) == {"done"}
+        assert _cash_balance() == 0
+
+
+def test_receipt_and_reversal_follow_the_current_status(make_tenant, in_tenant):
+    make_tenant("acme")
+    with in_tenant("acme"):
+        payment = _payment()
+        _mark(payment, "paid")
+        posting.drain_tenant()
+        _mark(payment, "unpaid")
+        posting.drain_tenant()
+        assert _sources() == ["payment", "payment_reverse"]
+        assert _cash_balance() == 0
+
+
+def test_bulk_mark_paid_after_a_queued_reversal_keeps_the_receipt(make_tenant, in_tenant):
+    make_tenant("acme")
+    with in_tenant("acme"):
+        payment = _payment()
+        _mark(payment, "paid")
+        _mark(payment, "unpaid")
+        result = bulk_payments.mark_paid(payment_ids=[payment.id], today=date(2026, 3, 5))
+        assert (result.updated, result.posted, result.queued) == (1, 0, 1)
+        assert _sources() == []  # nothing is posted until the outbox drains
+
+        assert posting.drain_tenant()["done"] == 3
+        assert db.session.get(Payment, payment.id).status == "paid"
+        assert _sources() == ["payment"]
+        assert _cash_balance() == 800
+
+
+def test_tasks_held_back_by_a_failed_one_are_not_reported_due(make_tenant, in_tenant):
+    make_tenant("acme")
+    with in_tenant("acme"):
+        posting.enqueue("payment", 7)
+        posting.enqueue("payment_reverse", 7)
+        db.session.commit()
+        receipt = db.session.execute(select(PostingTask).filter_by(kind="payment")).scalar_one()
+        receipt.status = "failed"
+        db.session.commit()
+
+        assert posting.drain_tenant()["next_in"] is None
+
+        assert posting.retry_failed() == 1
+        assert posting.drain_tenant()["done"] == 2
+
+
+def test_retried_bulk_mark_paid_posts_each_receipt_once(make_tenant, in_tenant, monkeypatch):
+    make_tenant("acme")
+    monkeypatch.setattr(posting, "has_outbox", lambda: False)
+    with in_tenant("acme"):
+        payment = _payment()
+        # As on MySQL, where (source, source_id) is a plain index
+        db.session.execute(text("DROP INDEX uq_journal_entries_source"))
+        db.session.commit()
+        for _ in range(2):
+            bulk_payments.mark_paid(payment_ids=[payment.id], today=date(2026, 3, 5))
+            db.session.execute(update(Payment.__table__).values(status="unpaid"))
+            db.session.commit()
+
+        assert _sources() == ["payment"]
+        assert _cash_balance() == 800
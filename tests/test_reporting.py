@@ -0,0 +1,123 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app import reporting
+from app.extensions import db
+from app.models import Contract, Expense, MonthlyRollup, Payment, Property, User
+from app.reporting import month_bucket, month_key, monthly_series
+from app.tenant_schema import SchemaState
+
+TODAY = date(2026, 6, 15)
+
+
+@pytest.fixture()
+def ledger(make_tenant, in_tenant):
+    make_tenant("acme")
+    with in_tenant("acme"):
+        tenant = User(username="t1", role="tenant")
+        tenant.set_password("x")
+        prop = Property(title="P1", price=700)
+        db.session.add_all([tenant, prop])
+        db.session.flush()
+        contract = Contract(property_id=prop.id, tenant_id=tenant.id, start_date=date(2025, 1, 1),
+                            end_date=date(2026, 12, 31), rent_amount=700)
+        db.session.add(contract)
+        db.session.flush()
+        payments = [
+            # (amount, due, paid, status)
+            ("700.00", date(2025, 6, 1), date(2025, 6, 30), "paid"),   # before the window
+            ("700.00", date(2025, 7, 1), date(2025, 7, 3), "paid"),    # first month of the window
+            ("700.00", date(2025, 8, 1), date(2025, 9, 2), "paid"),    # counted in its paid month
+            ("650.50", date(2025, 9, 1), None, "paid"),                # no paid date: due month
+            ("700.00", date(2026, 1, 1), date(2025, 12, 31), "paid"),  # paid early, across a year
+            ("700.00", date(2026, 5, 1), date(2026, 5, 31), "paid"),
+            ("700.00", date(2026, 6, 1), date(2026, 6, 15), "paid"),   # current month
+            ("700.00", date(2026, 6, 1), None, "unpaid"),
+            ("700.00", date(2026, 7, 1), date(2026, 7, 1), "paid"),    # after the window
+        ]
+        for amount, due, paid, status in payments:
+            db.session.add(Payment(contract_id=contract.id, amount=Decimal(amount), due_date=due,
+                                   paid_date=paid, status=status))
+        for amount, spent in [("80.00", date(2025, 6, 30)), ("120.25", date(2025, 7, 1)), ("45.00", date(2025, 9, 30)),
+                              ("300.00", date(2026, 2, 28)), ("15.75", date(2026, 2, 1)), ("60.00", date(2026, 7, 1))]:
+            db.session.add(Expense(description="repairs", amount=Decimal(amount), spent_at=spent))
+        db.session.commit()
+    return "acme"
+
+
+def _naive_series(starts):
+    """The per-month SUM queries the grouped series replaced, as the reference."""
+    income, expenses = [], []
+    for start in starts:
+        y, m = reporting.add_months(start.year, start.month, 1)
+        end = date(y, m, 1)
+        income.append(float(db.session.scalar(
+            select(func.coalesce(func.sum(Payment.amount), 0)).where(
+                Payment.status == "paid",
+                or_(
+                    and_(Payment.paid_date.is_not(None), Payment.paid_date >= start, Payment.paid_date < end),
+                    and_(Payment.paid_date.is_(None), Payment.due_date >= start, Payment.due_date < end),
+                ),
+            )
+        )))
+        expenses.append(float(db.session.scalar(
+            select(func.coalesce(func.sum(Expense.amount), 0)).where(Expense.spent_at >= start, Expense.spent_at < end)
+        )))
+    return income, expenses
+
+
+def test_grouped_series_matches_per_month_sums_in_one_query(ledger, in_tenant, monkeypatch, count_statements):
+    with in_tenant(ledger):
+        engine = db.engines[None]
+        state = reporting.schema_state(engine)
+        # A tenant without the rollup snapshot takes the GROUP BY path
+        monkeypatch.setattr(reporting, "schema_state", lambda engine: SchemaState(
+            revision=state.revision, tables=state.tables - {MonthlyRollup.__tablename__}
+        ))
+        with count_statements(engine) as statements:
+            series = monthly_series(12, TODAY)
+        assert len(statements) == 1
+        assert "GROUP BY" in statements[0]
+
+        income, expenses = _naive_series(reporting.month_starts(12, TODAY))
+    assert series["labels"][0] == "2025-07" and series["labels"][-1] == "2026-06"
+    assert series["income"] == income
+    assert series["expenses"] == expenses
+    assert series["profit"] == [round(i - e, 2) for i, e in zip(income, expenses)]
+    assert dict(zip(series["labels"], series["income"]))["2025-12"] == 700.0
+    assert dict(zip(series["labels"], series["expenses"]))["2026-02"] == 315.75
+
+
+def test_rollup_series_matches_grouped_series(ledger, in_tenant, count_statements):
+    with in_tenant(ledger):
+        engine = db.engines[None]
+        assert reporting.schema_state(engine).has_table(MonthlyRollup.__tablename__)
+        with count_statements(engine) as statements:
+            series = monthly_series(12, TODAY)
+        assert len(statements) == 1
+        income, expenses = _naive_series(reporting.month_starts(12, TODAY))
+    assert series["income"] == income
+    assert series["expenses"] == expenses
+
+
+@pytest.mark.parametrize("dialect, expected", [
+    (sqlite.dialect(), "strftime('%Y-%m', payments.due_date)"),
+    (postgresql.dialect(), "to_char(payments.due_date, 'YYYY-MM')"),
+    (mysql.dialect(), "date_format(payments.due_date, '%Y-%m')"),
+])
+def test_month_bucket_renders_per_dialect(dialect, expected):
+    expr = month_bucket(Payment.due_date, dialect.name)
+    sql = str(expr.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    assert sql.replace("%%", "%") == expected
+
+
+def test_month_bucket_agrees_with_month_key(ledger, in_tenant):
+    with in_tenant(ledger):
+        rows = db.session.execute(select(Expense.spent_at, month_bucket(Expense.spent_at, "sqlite"))).all()
+    assert rows
+    for spent_at, bucket in rows:
+        assert bucket == month_key(spent_at)
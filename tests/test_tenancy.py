@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+
+from app.extensions import db, tenant_engines
+from app.models import Company, Property
+from app.tenancy import current_tenant_engine, tenant_bound
+from app.tenant_manager import TenantManager
+
+ROUNDS = 40
+
+
+def _run_threads(targets):
+    errors = []
+
+    def guard(fn, *args):
+        try:
+            fn(*args)
+        except BaseException as exc:  # surfaced in the main thread below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=guard, args=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert not any(thread.is_alive() for thread in threads)
+    if errors:
+        raise errors[0]
+
+
+def test_threads_bound_to_different_tenants_never_share_rows(app, make_tenant):
+    names = ("alpha", "beta")
+    for name in names:
+        make_tenant(name)
+    with app.app_context():
+        engines = {
+            name: tenant_engines.for_company(Company.query.filter_by(subdomain=name).one()) for name in names
+        }
+    barrier = threading.Barrier(len(names) * 2)
+
+    def work(name, worker):
+        engine = engines[name]
+        with app.app_context(), tenant_bound(engine):
+            barrier.wait()
+            try:
+                for i in range(ROUNDS):
+                    assert current_tenant_engine() is engine
+                    assert db.engines[None] is engine
+                    db.session.add(Property(title=f"{name}-{worker}-{i}", price=1))
+                    db.session.commit()
+                    titles = db.session.scalars(db.select(Property.title)).all()
+                    assert titles and all(title.startswith(f"{name}-") for title in titles), titles
+            finally:
+                db.session.remove()
+
+    _run_threads([(work, name, worker) for name in names for worker in range(2)])
+
+    for name in names:
+        path = engines[name].url.database
+        with sqlite3.connect(path) as conn:
+            titles = [row[0] for row in conn.execute("SELECT title FROM properties")]
+        assert len(titles) == ROUNDS * 2
+        assert all(title.startswith(f"{name}-") for title in titles)
+
+
+def test_concurrent_requests_render_their_own_tenant(app, make_tenant, in_tenant, login):
+    names = ("alpha", "beta")
+    clients = {}
+    for name in names:
+        company_id = make_tenant(name)
+        with in_tenant(name):
+            db.session.add(Property(title=f"{name}-only-listing", price=1))
+            db.session.commit()
+        client = app.test_client()
+        login(client, company_id, username=f"{name}-boss")
+        clients[name] = client
+    barrier = threading.Barrier(len(names))
+
+    def browse(name):
+        other = next(n for n in names if n != name)
+        barrier.wait()
+        for _ in range(ROUNDS):
+            body = clients[name].get("/accountant/properties").get_data(as_text=True)
+            assert f"{name}-only-listing" in body
+            assert f"{other}-only-listing" not in body
+
+    _run_threads([(browse, name) for name in names])
+
+
+def test_threads_building_the_template_use_their_own_temp_files(tmp_path):
+    manager = TenantManager(str(tmp_path))
+    both_building = threading.Barrier(2, timeout=10)
+
+    def build(engine):
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE marker (id INTEGER)")
+        both_building.wait()
+
+    _run_threads([(manager.ensure_sqlite_template, "head", build) for _ in range(2)])
+    template = manager.template_path("head")
+    assert sqlite3.connect(template).execute("SELECT count(*) FROM marker").fetchone() == (0,)
+    assert sorted(p.name for p in (tmp_path / "_templates").iterdir()) == ["tenant-head.db"]